@@ -2,9 +2,8 @@
 Generation Agent - Generates answers using retrieved context
 """
 from typing import TypedDict
-from langchain_openai import ChatOpenAI
 from loguru import logger
-from app.core.config import settings
+from app.core.clients import get_client_registry
 
 
 class GenerationState(TypedDict):
@@ -28,11 +27,7 @@ def generate_answer(state: dict) -> dict:
     query = state["query"]
     context = state.get("context", "")
     
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        temperature=settings.OPENAI_TEMPERATURE,
-        openai_api_key=settings.OPENAI_API_KEY
-    )
+    llm = get_client_registry().chat_model()
     
     if not context:
         state["generated_answer"] = "I couldn't find relevant information to answer your question. Please try rephrasing or upload relevant documents."
@@ -62,5 +57,6 @@ Answer:"""
     except Exception as e:
         logger.error(f"Error generating answer: {e}")
         state["generated_answer"] = "I apologize, but I encountered an error while generating an answer. Please try again."
+        state["error"] = str(e)
     
     return state
@@ -1,11 +1,15 @@
 """
 Main Orchestrator - Coordinates all agents in a Langgraph workflow
 """
-from typing import TypedDict, List, Dict, Any, Literal
+from typing import TypedDict, List, Dict, Any, Literal, Optional
 from langgraph.graph import StateGraph, END
 from loguru import logger
+from app.core.config import settings
+from app.db import chroma_async
+from app.db.chroma_async import run_read
+from app.services.answer_cache import answer_cache_key, get_answer_cache
 from app.agents.query_agent import classify_query
-from app.agents.retrieval_agent import retrieve_context
+from app.agents.retrieval_agent import aretrieve_context
 from app.agents.generation_agent import generate_answer
 from app.agents.refinement_agent import refine_answer
 
@@ -20,6 +24,8 @@ class RAGState(TypedDict):
     filters: dict
     
     # Retrieval phase
+    n_results: int
+    search_mode: str
     query_embedding: List[float]
     retrieved_chunks: List[Dict[str, Any]]
     context: str
@@ -48,7 +54,7 @@ def create_rag_workflow() -> StateGraph:
     
     # Add nodes for each agent phase
     workflow.add_node("classify_query", classify_query)
-    workflow.add_node("retrieve_context", retrieve_context)
+    workflow.add_node("retrieve_context", aretrieve_context)
     workflow.add_node("generate_answer", generate_answer)
     workflow.add_node("refine_answer", refine_answer)
     
@@ -95,19 +101,47 @@ def finalize_response(state: dict) -> dict:
 rag_workflow = create_rag_workflow()
 
 
-async def process_query(query: str, n_results: int = 5, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+async def process_query(
+    query: str,
+    n_results: int = 5,
+    filters: Dict[str, Any] = None,
+    search_mode: Optional[str] = None,
+    bypass_cache: bool = False
+) -> Dict[str, Any]:
     """
     Process a query through the complete RAG workflow
     
+    Responses are served from the answer cache when the same normalized
+    query, filters and options were answered since the last document write.
+    Answers are not cached when retrieval, generation or refinement failed.
+    Cache lookups run on the vector store's read pool, since the SQLite
+    backend does blocking I/O.
+    
     Args:
         query: User query string
         n_results: Number of results to retrieve
         filters: Optional metadata filters
+        search_mode: "vector", "hybrid" or "lexical" (defaults to DEFAULT_SEARCH_MODE)
+        bypass_cache: Run the workflow even if a cached answer exists
         
     Returns:
-        Dictionary with answer, sources, and metadata
+        Dictionary with answer, sources, and metadata ("cache" reports hit, miss or bypass)
     """
+    search_mode = search_mode or settings.DEFAULT_SEARCH_MODE
     try:
+        cache_key = None
+        cache_status = "bypass"
+        if settings.ANSWER_CACHE_ENABLED and not bypass_cache:
+            cache = get_answer_cache()
+            version = await chroma_async.collection_version()
+            cache_key = answer_cache_key(query, filters, n_results, search_mode, version)
+            cached = await run_read(cache.get, cache_key)
+            if cached is not None:
+                cached["metadata"]["cache"] = "hit"
+                logger.info("Answer cache hit")
+                return cached
+            cache_status = "miss"
+        
         # Initialize state
         initial_state: RAGState = {
             "query": query,
@@ -115,6 +149,8 @@ async def process_query(query: str, n_results: int = 5, filters: Dict[str, Any]
             "search_strategy": "",
             "reasoning": "",
             "filters": filters or {},
+            "n_results": n_results,
+            "search_mode": search_mode,
             "query_embedding": [],
             "retrieved_chunks": [],
             "context": "",
@@ -129,12 +165,17 @@ async def process_query(query: str, n_results: int = 5, filters: Dict[str, Any]
         # Run workflow
         result = await rag_workflow.ainvoke(initial_state)
         
-        return {
+        response = {
             "answer": result.get("answer", ""),
             "sources": result.get("sources", []),
             "retrieved_chunks": result.get("retrieved_chunks", []),
             "metadata": result.get("metadata", {})
         }
+        # Failed retrievals, generations and refinements are not worth repeating
+        if cache_key and not result.get("error") and "error" not in response["metadata"]:
+            await run_read(get_answer_cache().put, cache_key, response)
+        response["metadata"]["cache"] = cache_status
+        return response
     
     except Exception as e:
         logger.error(f"Error processing query: {e}")
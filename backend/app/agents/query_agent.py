@@ -2,9 +2,10 @@
 Query Agent - Analyzes user queries and extracts intent
 """
 from typing import TypedDict, Literal
-from langchain_openai import ChatOpenAI
 from loguru import logger
+from app.core.clients import get_client_registry
 from app.core.config import settings
+from app.services.query_filters import extract_metadata_filters
 
 
 class QueryState(TypedDict):
@@ -28,11 +29,7 @@ def classify_query(state: dict) -> dict:
     """
     query = state["query"]
     
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        temperature=0.1,
-        openai_api_key=settings.OPENAI_API_KEY
-    )
+    llm = get_client_registry().chat_model(temperature=0.1)
     
     classification_prompt = f"""
     Analyze the following user query and determine:
@@ -58,20 +55,38 @@ def classify_query(state: dict) -> dict:
         # For now, use keyword-based classification
         query_lower = query.lower()
         
+        # Filters given with the request are kept
+        filters = dict(state.get("filters") or {})
+        potential_source = None
+        
         # Check for metadata filter keywords
         if any(keyword in query_lower for keyword in ["from", "in document", "in file", "source"]):
             intent = "metadata_filter"
             # Try to extract source filename
-            filters = {}
             # Simple extraction - can be enhanced
             if "from" in query_lower:
                 parts = query_lower.split("from")
-                if len(parts) > 1:
+                if len(parts) > 1 and parts[1].split():
                     potential_source = parts[1].strip().split()[0]
-                    filters["source"] = potential_source
         else:
             intent = "document_search"
-            filters = {}
+        
+        # Constraints on typed CSV attributes, e.g. "under $500" or a known brand
+        conditions = extract_metadata_filters(query) if settings.STRUCTURED_FILTERS_ENABLED else []
+        if conditions:
+            intent = "metadata_filter"
+            filters["metadata"] = conditions
+            # In "laptops from Dell", the word after "from" is a brand, not a file
+            matched_values = {
+                value
+                for condition in conditions
+                for spec in condition.values()
+                for value in spec.get("$in", [])
+            }
+            if potential_source in matched_values:
+                potential_source = None
+        if potential_source and "source" not in filters:
+            filters["source"] = potential_source
         
         state["intent"] = intent
         state["search_strategy"] = "vector_similarity_search"
@@ -85,6 +100,6 @@ def classify_query(state: dict) -> dict:
         state["intent"] = "document_search"
         state["search_strategy"] = "vector_similarity_search"
         state["reasoning"] = f"Default classification due to error: {str(e)}"
-        state["filters"] = {}
+        state["filters"] = dict(state.get("filters") or {})
     
     return state
@@ -2,9 +2,8 @@
 Refinement Agent - Refines and validates generated answers
 """
 from typing import TypedDict
-from langchain_openai import ChatOpenAI
 from loguru import logger
-from app.core.config import settings
+from app.core.clients import get_client_registry
 
 
 class RefinementState(TypedDict):
@@ -37,11 +36,7 @@ def refine_answer(state: dict) -> dict:
         state["metadata"] = {"refined": False}
         return state
     
-    llm = ChatOpenAI(
-        model=settings.OPENAI_MODEL,
-        temperature=0.2,  # Lower temperature for refinement
-        openai_api_key=settings.OPENAI_API_KEY
-    )
+    llm = get_client_registry().chat_model(temperature=0.2)  # Lower temperature for refinement
     
     refinement_prompt = f"""Review and refine the following answer to ensure it:
 1. Directly addresses the user's question
@@ -1,10 +1,17 @@
 """
-Retrieval Agent - Performs vector search and retrieves relevant context
+Retrieval Agent - Performs vector, keyword or hybrid search and retrieves relevant context
 """
-from typing import TypedDict, List, Dict, Any
+from typing import TypedDict, List, Dict, Any, Optional
 from loguru import logger
-from app.services.embedding_service import EmbeddingService
-from app.db.chroma import query_documents
+from app.core.config import settings
+from app.db import lexical_index
+from app.db.chroma import collection_version
+from app.db.chroma_async import run_read
+from app.db.chunk_index import get_reused_chunks
+from app.db.document_registry import find_document_ids
+from app.services.retrieval_cache import RetrievalCache, get_retrieval_cache
+from app.services.query_filters import combine_conditions
+from app.services.search_service import SearchResults, SearchService
 
 
 class RetrievalState(TypedDict):
@@ -12,15 +19,99 @@ class RetrievalState(TypedDict):
     query: str
     intent: str
     filters: dict
+    n_results: int
+    search_mode: str
+    bypass_cache: bool
     query_embedding: List[float]
     retrieved_chunks: List[Dict[str, Any]]
     context: str
     sources: List[str]
+    error: str
+
+
+def cached_search(
+    query: str,
+    n_results: int,
+    where: Optional[Dict[str, Any]],
+    mode: str,
+    use_cache: bool = True
+) -> SearchResults:
+    """
+    Search, reusing the results of a recent query with a near-identical embedding
+    
+    Lexical searches depend on the exact query words, so they skip the cache;
+    hybrid searches only share results between queries with the same
+    keyword terms, so "XR-2000 filter" never answers "XR-2001 filter".
+    
+    Args:
+        query: Query text
+        n_results: Number of chunks to return
+        where: Optional metadata filter
+        mode: "vector", "hybrid" or "lexical"
+        use_cache: Whether to look up and store results in the cache
+        
+    Returns:
+        Ranked chunks and the query embedding
+    """
+    search_service = SearchService()
+    if not (use_cache and settings.RETRIEVAL_CACHE_ENABLED) or mode == "lexical":
+        return search_service.search(query, n_results=n_results, where=where, mode=mode)
+    
+    cache = get_retrieval_cache()
+    lexical_terms = lexical_index.build_match_query(query) if mode == "hybrid" else None
+    key = RetrievalCache.make_key(mode, n_results, where, lexical_terms)
+    version = collection_version()
+    query_embedding = search_service.embedding_service.generate_query_embedding(query)
+    
+    chunks = cache.get(query_embedding, key, version)
+    if chunks is None:
+        chunks = search_service.search(
+            query,
+            n_results=n_results,
+            where=where,
+            mode=mode,
+            query_embedding=query_embedding
+        ).chunks
+        cache.put(query_embedding, key, version, chunks)
+    else:
+        logger.debug("Retrieval cache hit")
+    # Callers may annotate the chunks, so never hand out the cached dicts
+    return SearchResults(chunks=[dict(chunk) for chunk in chunks], query_embedding=query_embedding)
+
+
+def source_condition(filename: str) -> Dict[str, Any]:
+    """
+    Where condition selecting the chunks of a source file
+    
+    Chunks only carry their document ID, so the filename is resolved to the
+    registered documents uploaded under it. Chunks a document skipped as
+    duplicates are matched by their owning document and chunk index, so a
+    re-uploaded copy finds the content it shares with the original but not
+    the rest of the original. Unregistered files fall back to the source
+    field of chunks stored before metadata was slimmed.
+    
+    Args:
+        filename: Source filename
+        
+    Returns:
+        ChromaDB where condition
+    """
+    document_ids = find_document_ids(filename)
+    if not document_ids:
+        return {"source": filename}
+    condition = {"document_id": {"$in": document_ids}}
+    reused = get_reused_chunks(document_ids)
+    if not reused:
+        return condition
+    return {"$or": [condition] + [
+        {"$and": [{"document_id": owner}, {"chunk_index": {"$in": chunk_indexes}}]}
+        for owner, chunk_indexes in reused.items()
+    ]}
 
 
 def retrieve_context(state: dict) -> dict:
     """
-    Retrieve relevant context from ChromaDB
+    Retrieve relevant context from ChromaDB and the lexical index
     
     Args:
         state: Current retrieval state
@@ -30,49 +121,37 @@ def retrieve_context(state: dict) -> dict:
     """
     query = state["query"]
     filters = state.get("filters", {})
-    n_results = 5
+    n_results = state.get("n_results") or 5
+    use_cache = not state.get("bypass_cache")
     
     try:
-        # Generate query embedding
-        embedding_service = EmbeddingService()
-        query_embedding = embedding_service.generate_query_embedding(query)
-        state["query_embedding"] = query_embedding
-        
         # Prepare where clause for metadata filtering
-        where_clause = None
+        source_conditions = []
         if filters and "source" in filters:
-            where_clause = {"source": filters["source"]}
+            source_conditions.append(source_condition(filters["source"]))
+        metadata_conditions = (filters or {}).get("metadata", [])
+        where_clause = combine_conditions(source_conditions + metadata_conditions)
         
-        # Query ChromaDB
-        results = query_documents(
-            query_embeddings=[query_embedding],
-            n_results=n_results,
-            where=where_clause
-        )
+        # Search ChromaDB and the lexical index, filtering before similarity ranking
+        mode = state.get("search_mode") or settings.DEFAULT_SEARCH_MODE
+        results = cached_search(query, n_results=n_results, where=where_clause, mode=mode, use_cache=use_cache)
+        if not results.chunks and metadata_conditions:
+            # A misread constraint should not leave the LLM without context
+            logger.info("No chunks match the recognized constraints, retrying without them")
+            results = cached_search(
+                query,
+                n_results=n_results,
+                where=combine_conditions(source_conditions),
+                mode=mode,
+                use_cache=use_cache
+            )
+        state["query_embedding"] = results.query_embedding
+        retrieved_chunks = results.chunks
         
-        # Extract documents, metadatas, and distances
-        documents = results.get("documents", [])[0] if results.get("documents") else []
-        metadatas = results.get("metadatas", [])[0] if results.get("metadatas") else []
-        distances = results.get("distances", [])[0] if results.get("distances") else []
-        ids = results.get("ids", [])[0] if results.get("ids") else []
-        
-        # Combine into retrieved chunks
-        retrieved_chunks = []
+        # Collect unique sources
         sources = set()
-        
-        for i, doc in enumerate(documents):
-            chunk_data = {
-                "content": doc,
-                "metadata": metadatas[i] if i < len(metadatas) else {},
-                "distance": distances[i] if i < len(distances) else None,
-                "id": ids[i] if i < len(ids) else None
-            }
-            retrieved_chunks.append(chunk_data)
-            
-            # Collect unique sources
-            if metadatas and i < len(metadatas):
-                source = metadatas[i].get("source", "unknown")
-                sources.add(source)
+        for chunk in retrieved_chunks:
+            sources.add(chunk["metadata"].get("source", "unknown"))
         
         # Build context string
         context_parts = []
@@ -86,11 +165,29 @@ def retrieve_context(state: dict) -> dict:
         state["sources"] = list(sources)
         
         logger.info(f"Retrieved {len(retrieved_chunks)} chunks from {len(sources)} sources")
-        
+    
     except Exception as e:
         logger.error(f"Error retrieving context: {e}")
         state["retrieved_chunks"] = []
         state["context"] = ""
         state["sources"] = []
+        # An answer without context must not be cached as if nothing matched
+        state["error"] = f"Retrieval failed: {e}"
     
     return state
+
+
+async def aretrieve_context(state: dict) -> dict:
+    """
+    Retrieve context without blocking the event loop
+    
+    Retrieval runs on the vector store's read pool, so queries do not wait
+    behind ingestion writes or other work on the default executor.
+    
+    Args:
+        state: Current retrieval state
+        
+    Returns:
+        Updated state with retrieved chunks and context
+    """
+    return await run_read(retrieve_context, state)
@@ -1,26 +1,90 @@
 """
 Document management API endpoints
 """
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query
+from typing import List, Optional
 from loguru import logger
-from app.services.document_service import DocumentService
-from app.models.document import DocumentUploadResponse, DocumentInfo
+from app.core.config import settings
+from app.core.dependencies import require_writer
+from app.services.ingestion_queue import get_ingestion_queue
+from app.services.document_service import keyed_document_id
+from app.db.chroma_async import run_write
+from app.db.jobs import get_job
+from app.models.document import IngestionJobResponse, IngestionJobStatus, DocumentInfo
 
 router = APIRouter()
-document_service = DocumentService()
 
 
-@router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+def _file_too_large() -> HTTPException:
+    """Error raised for uploads above MAX_FILE_SIZE_MB"""
+    return HTTPException(
+        status_code=400,
+        detail=f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE_MB}MB"
+    )
+
+
+async def _spool_upload(file: UploadFile, spool_dir: Path, max_size: int) -> Path:
     """
-    Upload and process a PDF or CSV document
+    Copy an upload to a temporary file in fixed-size blocks
+    
+    Only one block is held in memory at a time, and the copy stops as
+    soon as the upload grows past max_size. The spool file is created in
+    spool_dir so it can later be moved into place without copying.
+    
+    Args:
+        file: Uploaded file
+        spool_dir: Directory for the spool file
+        max_size: Maximum upload size in bytes
+        
+    Returns:
+        Path of the spool file
+    """
+    fd, temp_name = tempfile.mkstemp(dir=spool_dir, suffix=".part")
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as spool:
+            while block := await file.read(settings.UPLOAD_BLOCK_SIZE):
+                size += len(block)
+                if size > max_size:
+                    raise _file_too_large()
+                spool.write(block)
+        
+        if size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        return Path(temp_name)
+    
+    except BaseException:
+        Path(temp_name).unlink(missing_ok=True)
+        raise
+
+
+@router.post(
+    "/upload",
+    response_model=IngestionJobResponse,
+    status_code=202,
+    dependencies=[Depends(require_writer)]
+)
+async def upload_document(
+    file: UploadFile = File(...),
+    key_column: Optional[str] = Form(None)
+):
+    """
+    Upload a PDF or CSV document and queue it for ingestion
+    
+    When key_column is given, the CSV is treated as a new version of the
+    dataset with the same filename: only new or changed rows are embedded
+    and rows missing from the file are deleted.
     
     Args:
         file: PDF or CSV file to upload
+        key_column: Primary-key column for incremental CSV ingestion
         
     Returns:
-        Document processing results
+        The queued ingestion job
     """
     try:
         # Validate file type
@@ -35,30 +99,40 @@ async def upload_document(file: UploadFile = File(...)):
                 detail=f"Unsupported file type. Allowed: PDF, CSV"
             )
         
-        # Read file content
-        content = await file.read()
-        
-        if len(content) == 0:
-            raise HTTPException(status_code=400, detail="File is empty")
+        if key_column and file_ext != "csv":
+            raise HTTPException(status_code=400, detail="key_column is only supported for CSV files")
         
-        # Check file size (50MB default limit)
-        from app.core.config import settings
         max_size = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-        if len(content) > max_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File size exceeds maximum allowed size of {settings.MAX_FILE_SIZE_MB}MB"
-            )
         
-        logger.info(f"Processing document upload: {filename}")
+        # Reject oversized uploads before reading the body when the size is declared
+        if file.size is not None and file.size > max_size:
+            raise _file_too_large()
+        
+        # Stream the upload to a spool file in fixed-size blocks
+        ingestion_queue = get_ingestion_queue()
+        temp_path = await _spool_upload(
+            file,
+            spool_dir=ingestion_queue.document_service.upload_dir,
+            max_size=max_size
+        )
+        
+        logger.info(f"Queueing document upload: {filename}")
         
-        # Process document
-        result = await document_service.process_document(
-            content=content,
-            filename=filename
+        # Move the file into place and queue it for the ingestion workers
+        document_id, file_path = ingestion_queue.document_service.store_upload(
+            temp_path=temp_path,
+            filename=filename,
+            document_id=keyed_document_id(filename) if key_column else None
+        )
+        job = ingestion_queue.enqueue(
+            document_id=document_id,
+            filename=filename,
+            document_type=file_ext,
+            file_path=str(file_path),
+            key_column=key_column
         )
         
-        return DocumentUploadResponse(**result)
+        return IngestionJobResponse(**job)
     
     except HTTPException:
         raise
@@ -68,22 +142,48 @@ async def upload_document(file: UploadFile = File(...)):
 
 
 @router.get("/", response_model=List[DocumentInfo])
-async def list_documents():
+async def list_documents(
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
+):
     """
-    List all uploaded documents
+    List uploaded documents from the document registry, newest first
     
+    Args:
+        limit: Maximum number of documents
+        offset: Documents to skip
+        
     Returns:
         List of document information
     """
     try:
-        documents = document_service.list_documents()
+        documents = await asyncio.to_thread(
+            get_ingestion_queue().document_service.list_documents, limit, offset
+        )
         return documents
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.delete("/{document_id}")
+@router.get("/jobs/{job_id}", response_model=IngestionJobStatus)
+async def get_ingestion_job(job_id: str):
+    """
+    Get the progress and result of an ingestion job
+    
+    Args:
+        job_id: ID returned by the upload endpoint
+        
+    Returns:
+        Job status with progress counters and final result
+    """
+    job = await asyncio.to_thread(get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return IngestionJobStatus(**job)
+
+
+@router.delete("/{document_id}", dependencies=[Depends(require_writer)])
 async def delete_document(document_id: str):
     """
     Delete a document from the vector database
@@ -95,10 +195,8 @@ async def delete_document(document_id: str):
         Success message
     """
     try:
-        from app.db.chroma import delete_documents
-        
-        # Delete all chunks for this document
-        delete_documents(where={"document_id": document_id})
+        # Delete all chunks for this document by ID
+        await run_write(get_ingestion_queue().document_service.delete_document, document_id)
         
         logger.info(f"Deleted document: {document_id}")
         return {"message": f"Document {document_id} deleted successfully"}
@@ -0,0 +1,19 @@
+"""
+Metrics API endpoints for monitoring
+"""
+from typing import Any, Dict
+from fastapi import APIRouter
+from app.utils.metrics import collect_metrics
+
+router = APIRouter()
+
+
+@router.get("", response_model=Dict[str, Any])
+async def get_metrics():
+    """
+    Get in-process metrics for monitoring
+    
+    Returns:
+        Metrics grouped by component
+    """
+    return collect_metrics()
@@ -3,8 +3,9 @@ Query API endpoints for RAG queries
 """
 from fastapi import APIRouter, HTTPException
 from loguru import logger
-from app.models.query import QueryRequest, QueryResponse
+from app.models.query import QueryRequest, QueryResponse, RetrievalRequest, RetrievalResponse
 from app.agents.orchestrator import process_query
+from app.agents.retrieval_agent import aretrieve_context
 
 router = APIRouter()
 
@@ -30,7 +31,9 @@ async def query_documents(request: QueryRequest):
         result = await process_query(
             query=request.query,
             n_results=request.n_results,
-            filters=request.filters
+            filters=request.filters,
+            search_mode=request.search_mode,
+            bypass_cache=request.bypass_cache
         )
         
         return QueryResponse(
@@ -45,3 +48,35 @@ async def query_documents(request: QueryRequest):
     except Exception as e:
         logger.error(f"Error processing query: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/retrieve", response_model=RetrievalResponse)
+async def retrieve_chunks(request: RetrievalRequest):
+    """
+    Retrieve the chunks a query would be answered from, without generating an answer
+    
+    Args:
+        request: Retrieval request with query text and optional parameters
+        
+    Returns:
+        Retrieved chunks and their sources
+    """
+    if not request.query or not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    state = await aretrieve_context({
+        "query": request.query,
+        "intent": "document_search",
+        "filters": request.filters or {},
+        "n_results": request.n_results,
+        "search_mode": request.search_mode,
+        "bypass_cache": request.bypass_cache,
+        "query_embedding": [],
+        "retrieved_chunks": [],
+        "context": "",
+        "sources": [],
+        "error": ""
+    })
+    if state.get("error"):
+        raise HTTPException(status_code=500, detail=state["error"])
+    return RetrievalResponse(sources=state["sources"], retrieved_chunks=state["retrieved_chunks"])
@@ -2,9 +2,10 @@
 Main API router
 """
 from fastapi import APIRouter
-from app.api.v1 import documents, query
+from app.api.v1 import documents, query, metrics
 
 api_router = APIRouter()
 
 api_router.include_router(documents.router, prefix="/documents", tags=["documents"])
 api_router.include_router(query.router, prefix="/query", tags=["query"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
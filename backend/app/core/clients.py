@@ -0,0 +1,175 @@
+"""
+Application-scoped registry of long-lived LLM, embedding and HTTP clients
+"""
+import threading
+from typing import Any, Dict, Optional, Tuple
+import httpx
+from langchain_openai import ChatOpenAI
+from loguru import logger
+from app.core.config import settings
+from app.utils.metrics import register_metrics
+from app.utils.workers import run_coroutine
+
+
+class RequestCounter:
+    """Counts requests sent and responses received through an HTTP client"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.responses = 0
+    
+    def request_sent(self):
+        with self._lock:
+            self.requests += 1
+    
+    def response_received(self):
+        with self._lock:
+            self.responses += 1
+    
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {"requests": self.requests, "responses": self.responses}
+
+
+def _pool_stats(client: Any) -> Dict[str, int]:
+    """Open and idle connections of an httpx client's connection pool"""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    return {
+        "connections": len(connections),
+        "idle_connections": sum(1 for connection in connections if connection.is_idle())
+    }
+
+
+class ClientRegistry:
+    """
+    Long-lived clients shared by every request
+    
+    The sync and async HTTP clients keep pooled keep-alive connections to
+    the OpenAI API; every chat model and the embedding service send their
+    requests through them. Chat models are created once per temperature.
+    """
+    
+    def __init__(self):
+        limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+        )
+        timeout = httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS)
+        self.sync_requests = RequestCounter()
+        self.async_requests = RequestCounter()
+        
+        async def async_request_started(request):
+            self.async_requests.request_sent()
+        
+        async def async_response_received(response):
+            self.async_requests.response_received()
+        
+        self.http_client = httpx.Client(
+            limits=limits,
+            timeout=timeout,
+            event_hooks={
+                "request": [lambda request: self.sync_requests.request_sent()],
+                "response": [lambda response: self.sync_requests.response_received()]
+            }
+        )
+        self.async_http_client = httpx.AsyncClient(
+            limits=limits,
+            timeout=timeout,
+            event_hooks={
+                "request": [async_request_started],
+                "response": [async_response_received]
+            }
+        )
+        self._chat_models: Dict[Tuple[str, float], ChatOpenAI] = {}
+        self._lock = threading.Lock()
+        self._embedding_service = None
+    
+    def chat_model(self, temperature: Optional[float] = None, model: Optional[str] = None) -> ChatOpenAI:
+        """
+        Get the shared chat model for a temperature
+        
+        Args:
+            temperature: Sampling temperature (defaults to OPENAI_TEMPERATURE)
+            model: Model name (defaults to OPENAI_MODEL)
+            
+        Returns:
+            ChatOpenAI client using the pooled HTTP clients
+        """
+        if temperature is None:
+            temperature = settings.OPENAI_TEMPERATURE
+        key = (model or settings.OPENAI_MODEL, temperature)
+        with self._lock:
+            llm = self._chat_models.get(key)
+            if llm is None:
+                llm = ChatOpenAI(
+                    model=key[0],
+                    temperature=temperature,
+                    openai_api_key=settings.OPENAI_API_KEY,
+                    http_client=self.http_client,
+                    http_async_client=self.async_http_client
+                )
+                self._chat_models[key] = llm
+            return llm
+    
+    @property
+    def embedding_service(self):
+        """Shared embedding service, using the pooled HTTP clients for OpenAI"""
+        from app.services.embedding_providers import OpenAIEmbeddingProvider, get_embedding_provider
+        from app.services.embedding_service import EmbeddingService
+        
+        with self._lock:
+            if self._embedding_service is None:
+                if settings.EMBEDDING_PROVIDER == "openai":
+                    provider = OpenAIEmbeddingProvider(
+                        http_client=self.http_client,
+                        http_async_client=self.async_http_client
+                    )
+                else:
+                    provider = get_embedding_provider()
+                self._embedding_service = EmbeddingService(provider=provider)
+            return self._embedding_service
+    
+    def stats(self) -> Dict[str, Any]:
+        """Connection pool and request counters of the shared clients"""
+        with self._lock:
+            chat_models = len(self._chat_models)
+        return {
+            "sync": {**_pool_stats(self.http_client), **self.sync_requests.snapshot()},
+            "async": {**_pool_stats(self.async_http_client), **self.async_requests.snapshot()},
+            "chat_models": chat_models
+        }
+    
+    def close(self):
+        """Close the pooled HTTP clients"""
+        self.http_client.close()
+        # The async client is used from the shared background loop (see EmbeddingService)
+        run_coroutine(self.async_http_client.aclose())
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """Get the application client registry, creating it on first use"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ClientRegistry()
+                register_metrics("clients", _registry.stats)
+                logger.info("Client registry initialized")
+    return _registry
+
+
+def close_client_registry():
+    """Close the application client registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is not None:
+            _registry.close()
+            _registry = None
+            logger.info("Client registry closed")
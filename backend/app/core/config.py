@@ -2,7 +2,7 @@
 Application configuration settings
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pathlib import Path
 
 
@@ -26,27 +26,119 @@ class Settings(BaseSettings):
     API_PORT: int = 8000
     API_RELOAD: bool = True
     
+    # Deployment Configuration
+    # "standalone" runs ingestion and queries in one process; "writer" owns
+    # ingestion and "reader" processes serve queries, sharing a Chroma server
+    DEPLOYMENT_ROLE: str = "standalone"
+    READER_PORT: int = 8002
+    READER_WORKERS: int = 4
+    
     # OpenAI Configuration
     OPENAI_API_KEY: str
     OPENAI_MODEL: str = "gpt-4o-mini"
     OPENAI_EMBEDDING_MODEL: str = "text-embedding-3-small"
     OPENAI_TEMPERATURE: float = 0.3
     
+    # HTTP Client Pool Configuration
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_TIMEOUT_SECONDS: float = 60.0
+    
     # ChromaDB Configuration
     CHROMA_DB_PATH: str = "./data/chroma_db"
     CHROMA_COLLECTION_NAME: str = "documents"
+    CHROMA_MODE: str = "embedded"  # "embedded" (files at CHROMA_DB_PATH) or "http" (Chroma server)
+    CHROMA_HOST: str = "localhost"
+    CHROMA_PORT: int = 8001
+    CHROMA_HTTP_POOL_SIZE: int = 32  # Keep-alive connections to the Chroma server
+    CHROMA_READ_WORKERS: int = 16  # Threads serving queries from async code
+    CHROMA_WRITE_WORKERS: int = 2  # Threads serving writes from async code
+    CHROMA_SHARDING: str = "none"  # "none", "document_type", "source" or "hash"
+    CHROMA_SHARD_COUNT: int = 8  # Shards for "hash" sharding
+    CHROMA_SHARD_WORKERS: int = 0  # Threads querying shards in parallel, 0 = Python's default
     
     # Chunking Configuration
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    CHUNK_LENGTH_UNIT: str = "chars"  # "chars" or "tokens"
+    
+    # PDF Extraction Configuration
+    PDF_EXTRACT_WORKERS: int = 0  # 0 = one worker per CPU
+    PDF_PARALLEL_MIN_PAGES: int = 32
+    
+    # CSV Ingestion Configuration
+    CSV_CHUNK_ROWS: int = 5000
+    # Columns kept as typed chunk metadata for filtering: name -> "number" or "text"
+    CSV_METADATA_COLUMNS: Dict[str, str] = {"price": "number", "category": "text", "brand": "text"}
+    
+    # Retrieval Configuration
+    DEFAULT_SEARCH_MODE: str = "hybrid"  # "vector", "hybrid" or "lexical"
+    LEXICAL_INDEX_ENABLED: bool = True
+    LEXICAL_INDEX_PATH: str = "./data/lexical_index.db"
+    HYBRID_CANDIDATES: int = 20  # Candidates per retriever before fusion
+    RRF_K: int = 60
+    STRUCTURED_FILTERS_ENABLED: bool = True  # Push recognized query constraints into where filters
+    MMR_ENABLED: bool = True
+    MMR_LAMBDA: float = 0.7  # 1 = relevance only, 0 = diversity only
+    MMR_OVERSAMPLE: int = 4  # Candidates fetched per requested result
+    MAX_N_RESULTS: int = 50  # Largest n_results a query may request
+    RETRIEVAL_CACHE_ENABLED: bool = True
+    RETRIEVAL_CACHE_MAX_ENTRIES: int = 2048  # Recent queries kept
+    RETRIEVAL_CACHE_SIMILARITY: float = 0.95  # Min cosine similarity for a hit
+    
+    # Answer Cache Configuration
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_BACKEND: str = "memory"  # "memory" (per process) or "sqlite" (shared by workers)
+    ANSWER_CACHE_PATH: str = "./data/answer_cache.db"
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    ANSWER_CACHE_TTL_SECONDS: float = 3600.0
+    
+    # Embedding Provider Configuration
+    EMBEDDING_PROVIDER: str = "openai"  # "openai" or "local"
+    EMBEDDING_LOCAL_MODEL_PATH: str = "./models/all-MiniLM-L6-v2"
+    EMBEDDING_LOCAL_BATCH_SIZE: int = 32
+    EMBEDDING_LOCAL_THREADS: int = 0  # 0 = one thread per CPU
+    EMBEDDING_LOCAL_MAX_LENGTH: int = 256
+    
+    # Vector Storage Configuration
+    EMBEDDING_STORED_DIMENSIONS: int = 0  # 0 = store full vectors
+    RESCORE_VECTOR_DTYPE: str = "float16"  # "float16", "int8" or "none"
+    RESCORE_OVERSAMPLE: int = 4
+    RESCORE_VECTORS_PATH: str = "./data/rescore_vectors.db"
     
     # Embedding Configuration
-    EMBEDDING_BATCH_SIZE: int = 100
+    EMBEDDING_BATCH_SIZE: int = 100  # Max texts per embedding request
+    EMBEDDING_BATCH_MAX_TOKENS: int = 100_000  # Max tokens per embedding request
+    EMBEDDING_CONCURRENCY: int = 4  # Embedding requests in flight
+    EMBEDDING_MAX_RETRIES: int = 3
+    EMBEDDING_RETRY_BACKOFF_SECONDS: float = 1.0
+    QUERY_EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # 0 = embed each query on its own
+    QUERY_EMBEDDING_MAX_BATCH: int = 64
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./data/embedding_cache.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 500_000
     
     # File Upload Configuration
     MAX_FILE_SIZE_MB: int = 50
     ALLOWED_EXTENSIONS: List[str] = ["pdf", "csv"]
     UPLOAD_DIR: str = "./data/documents"
+    UPLOAD_BLOCK_SIZE: int = 1024 * 1024
+    
+    # Ingestion Pipeline Configuration
+    PIPELINE_QUEUE_SIZE: int = 4
+    DEDUPLICATE_CHUNKS: bool = True
+    
+    # Metadata Database Configuration
+    METADATA_DB_PATH: str = "./data/metadata.db"
+    
+    # Ingestion Queue Configuration
+    INGESTION_WORKERS: int = 2
+    INGESTION_POLL_INTERVAL_SECONDS: float = 2.0
+    
+    # Event Loop Monitoring Configuration
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.5  # 0 = disabled
+    EVENT_LOOP_LAG_WARN_MS: float = 100.0
     
     # Logging Configuration
     LOG_LEVEL: str = "INFO"
@@ -54,6 +146,17 @@ class Settings(BaseSettings):
     
     # CORS Configuration
     CORS_ORIGINS: List[str] = ["*"]
+    
+    @property
+    def embedding_model_id(self) -> str:
+        """Identifier of the configured embedding model, recorded per collection"""
+        if self.EMBEDDING_PROVIDER == "local":
+            model_id = f"local:{Path(self.EMBEDDING_LOCAL_MODEL_PATH).resolve().name}"
+        else:
+            model_id = f"openai:{self.OPENAI_EMBEDDING_MODEL}"
+        if self.EMBEDDING_STORED_DIMENSIONS:
+            model_id += f"@{self.EMBEDDING_STORED_DIMENSIONS}d"
+        return model_id
 
 
 settings = Settings()
@@ -2,10 +2,20 @@
 Shared dependencies for FastAPI
 """
 from functools import lru_cache
-from app.core.config import Settings
+from fastapi import HTTPException
+from app.core.config import Settings, settings
 
 
 @lru_cache()
 def get_settings() -> Settings:
     """Get cached settings instance"""
     return Settings()
+
+
+def require_writer():
+    """Reject document writes on read-only query workers"""
+    if settings.DEPLOYMENT_ROLE == "reader":
+        raise HTTPException(
+            status_code=405,
+            detail="This worker only serves queries; send document uploads and deletes to the writer"
+        )
@@ -1,48 +1,309 @@
 """
 ChromaDB vector database client and utilities
 """
+import hashlib
+import heapq
+import threading
 import chromadb
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 from loguru import logger
+from requests.adapters import HTTPAdapter
 from app.core.config import settings
+from app.db.collection_version import bump_collection_version, get_collection_version
+from app.db.document_registry import get_document_fields
+from app.db.lexical_index import index_chunks, remove_chunks
+from app.db.rescore_vectors import get_vectors, reduce_dimensions, remove_vectors, store_vectors
 
 
+SHARDING_STRATEGIES = ("none", "document_type", "source", "hash")
+
 _client = None
 _collection = None
 
+# Shard collections by shard key, reloaded when the collection version changes
+# so shards created by other processes are found
+_shards: Dict[str, chromadb.Collection] = {}
+_shards_version: Optional[int] = None
+_shard_lock = threading.Lock()
+_shard_executor: Optional[ThreadPoolExecutor] = None
+
+
+class EmbeddingModelMismatchError(RuntimeError):
+    """The collection holds vectors from a different embedding model"""
+
 
 def get_chroma_client() -> chromadb.ClientAPI:
-    """Get or create ChromaDB client"""
+    """Get or create ChromaDB client, embedded or connected to a Chroma server"""
     global _client
     if _client is None:
-        db_path = Path(settings.CHROMA_DB_PATH)
-        db_path.mkdir(parents=True, exist_ok=True)
-        _client = chromadb.PersistentClient(path=str(db_path))
-        logger.info(f"ChromaDB client initialized at {db_path}")
+        if settings.CHROMA_MODE == "http":
+            client = chromadb.HttpClient(host=settings.CHROMA_HOST, port=settings.CHROMA_PORT)
+            _configure_connection_pool(client)
+            logger.info(f"ChromaDB client connected to {settings.CHROMA_HOST}:{settings.CHROMA_PORT}")
+        else:
+            db_path = Path(settings.CHROMA_DB_PATH)
+            db_path.mkdir(parents=True, exist_ok=True)
+            client = chromadb.PersistentClient(path=str(db_path))
+            logger.info(f"ChromaDB client initialized at {db_path}")
+        _client = client
     return _client
 
 
+def _configure_connection_pool(client: chromadb.ClientAPI):
+    """
+    Size the HTTP client's keep-alive pool for concurrent calls
+    
+    The client sends every request through one requests session, whose
+    default pool keeps only 10 connections per host; concurrent reads,
+    writes and shard queries beyond that would open and drop connections.
+    """
+    session = getattr(getattr(client, "_server", None), "_session", None)
+    if session is None:
+        logger.warning("ChromaDB HTTP client has no requests session, keeping its default pool")
+        return
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.CHROMA_HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+
 def get_chroma_collection() -> chromadb.Collection:
     """Get or create ChromaDB collection"""
     global _collection
     if _collection is None:
-        client = get_chroma_client()
-        try:
-            _collection = client.get_collection(name=settings.CHROMA_COLLECTION_NAME)
-            logger.info(f"Retrieved existing collection: {settings.CHROMA_COLLECTION_NAME}")
-        except Exception:
-            _collection = client.create_collection(
-                name=settings.CHROMA_COLLECTION_NAME,
-                metadata={"description": "Document embeddings for RAG"}
-            )
-            logger.info(f"Created new collection: {settings.CHROMA_COLLECTION_NAME}")
+        _collection = _open_collection(settings.CHROMA_COLLECTION_NAME)
     return _collection
 
 
+def _open_collection(name: str, metadata: Optional[Dict[str, Any]] = None) -> chromadb.Collection:
+    """Get or create a collection of this application's embeddings"""
+    client = get_chroma_client()
+    try:
+        collection = client.get_collection(name=name)
+        logger.info(f"Retrieved existing collection: {name}")
+    except Exception:
+        collection = client.create_collection(
+            name=name,
+            metadata={
+                "description": "Document embeddings for RAG",
+                "embedding_model": settings.embedding_model_id,
+                **(metadata or {})
+            }
+        )
+        logger.info(f"Created new collection: {name}")
+    _check_embedding_model(collection)
+    return collection
+
+
+def sharding_enabled() -> bool:
+    """Whether chunks are spread over several shard collections"""
+    return settings.CHROMA_SHARDING != "none"
+
+
+def shard_key(metadata: Dict[str, Any]) -> str:
+    """
+    Shard a chunk belongs to, from its metadata
+    
+    "hash" and "source" shard by the chunk's source file, so every chunk of
+    a document (and every upsert of a keyed CSV row) lands in the same shard
+    and a source filter can be answered by one shard. Chunk metadata only
+    names its document, so the source and type are looked up in the
+    document registry unless the metadata carries them.
+    
+    Args:
+        metadata: Chunk metadata
+        
+    Returns:
+        Shard key, usable in a collection name
+    """
+    if "source" not in metadata and "document_type" not in metadata and "document_id" in metadata:
+        document_id = metadata["document_id"]
+        metadata = {**get_document_fields([document_id]).get(document_id, {}), **metadata}
+    strategy = settings.CHROMA_SHARDING
+    if strategy == "document_type":
+        return str(metadata.get("document_type") or "other")
+    digest = hashlib.sha1(str(metadata.get("source", "")).encode("utf-8")).hexdigest()
+    if strategy == "source":
+        return digest[:16]
+    if strategy == "hash":
+        return str(int(digest[:8], 16) % settings.CHROMA_SHARD_COUNT)
+    raise ValueError(f"Unknown CHROMA_SHARDING strategy: {strategy}")
+
+
+def route_shards(where: Optional[Dict[str, Any]]) -> Optional[Set[str]]:
+    """
+    Shards that can hold chunks matching a where filter
+    
+    Equality and $in conditions on the sharding attribute or on the
+    document ID, at the top level or inside a top-level $and, pick the
+    shards to search. An $or is routed to the shards of all its branches.
+    
+    Args:
+        where: ChromaDB where filter
+        
+    Returns:
+        Shard keys, or None when any shard may match
+    """
+    if not where:
+        return None
+    attribute = "document_type" if settings.CHROMA_SHARDING == "document_type" else "source"
+    conditions = where["$and"] if "$and" in where else [where]
+    for condition in conditions:
+        if "$or" in condition:
+            branches = [route_shards(branch) for branch in condition["$or"]]
+            if any(branch is None for branch in branches):
+                continue
+            return set().union(*branches)
+        routed_by = next((name for name in (attribute, "document_id") if name in condition), None)
+        if routed_by is None:
+            continue
+        value = condition[routed_by]
+        if not isinstance(value, dict):
+            values = [value]
+        elif "$eq" in value:
+            values = [value["$eq"]]
+        elif "$in" in value:
+            values = value["$in"]
+        else:
+            continue
+        if routed_by == "document_id" and len(get_document_fields(values)) < len(set(values)):
+            # Chunks of documents missing from the registry may be in any shard
+            continue
+        return {shard_key({routed_by: value}) for value in values}
+    return None
+
+
+def _shard_name(key: str) -> str:
+    return f"{settings.CHROMA_COLLECTION_NAME}-{settings.CHROMA_SHARDING}-{key}"
+
+
+def _shard_collections() -> Dict[str, chromadb.Collection]:
+    """Existing shard collections of the configured strategy, by shard key"""
+    global _shards, _shards_version
+    version = collection_version()
+    with _shard_lock:
+        if _shards_version != version:
+            shards = {}
+            for collection in get_chroma_client().list_collections():
+                metadata = collection.metadata or {}
+                if (
+                    metadata.get("shard_of") == settings.CHROMA_COLLECTION_NAME
+                    and metadata.get("sharding") == settings.CHROMA_SHARDING
+                ):
+                    _check_embedding_model(collection)
+                    shards[metadata["shard"]] = collection
+            _shards, _shards_version = shards, version
+        return dict(_shards)
+
+
+def _get_shard(key: str) -> chromadb.Collection:
+    """Get or create the shard collection for a shard key"""
+    shard = _shard_collections().get(key)
+    if shard is not None:
+        return shard
+    with _shard_lock:
+        if key not in _shards:
+            _shards[key] = _open_collection(
+                _shard_name(key),
+                {"shard_of": settings.CHROMA_COLLECTION_NAME, "sharding": settings.CHROMA_SHARDING, "shard": key}
+            )
+        return _shards[key]
+
+
+def get_chroma_collections(where: Optional[Dict[str, Any]] = None) -> List[chromadb.Collection]:
+    """
+    Collections to read, given an optional where filter
+    
+    Returns:
+        The collection, or the shards that can hold matching chunks when sharding
+    """
+    if not sharding_enabled():
+        return [get_chroma_collection()]
+    shards = _shard_collections()
+    keys = route_shards(where)
+    if keys is None:
+        return list(shards.values())
+    return [shards[key] for key in sorted(keys) if key in shards]
+
+
+def _get_shard_executor() -> ThreadPoolExecutor:
+    """Thread pool querying shards in parallel"""
+    global _shard_executor
+    if _shard_executor is None:
+        with _shard_lock:
+            if _shard_executor is None:
+                _shard_executor = ThreadPoolExecutor(
+                    max_workers=settings.CHROMA_SHARD_WORKERS or None,
+                    thread_name_prefix="chroma-shard"
+                )
+    return _shard_executor
+
+
+def _fan_out(call: Callable[[chromadb.Collection], Any], collections: List[chromadb.Collection]) -> List[Any]:
+    """Run a call on every collection, concurrently when there are several"""
+    if len(collections) <= 1:
+        return [call(collection) for collection in collections]
+    return list(_get_shard_executor().map(call, collections))
+
+
+def _group_by_shard(metadatas: List[Dict[str, Any]]) -> List[Tuple[chromadb.Collection, List[int]]]:
+    """Collections to write, each with the indexes of the chunks it receives"""
+    if not sharding_enabled():
+        return [(get_chroma_collection(), list(range(len(metadatas))))]
+    groups: Dict[str, List[int]] = {}
+    for i, metadata in enumerate(metadatas):
+        groups.setdefault(shard_key(metadata), []).append(i)
+    return [(_get_shard(key), indexes) for key, indexes in groups.items()]
+
+
+def _check_embedding_model(collection: chromadb.Collection):
+    """
+    Make sure the collection's vectors come from the configured embedding model
+    
+    Collections created before the model was recorded are assumed to hold
+    OpenAI embeddings. An empty collection is re-labelled with the
+    configured model.
+    
+    Raises:
+        EmbeddingModelMismatchError: The collection holds vectors of another model
+    """
+    metadata = dict(collection.metadata or {})
+    model_id = settings.embedding_model_id
+    recorded = metadata.get("embedding_model")
+    if recorded == model_id:
+        return
+    
+    count = collection.count()
+    if recorded is None and count:
+        recorded = f"openai:{settings.OPENAI_EMBEDDING_MODEL}"
+    if recorded not in (None, model_id) and count:
+        raise EmbeddingModelMismatchError(
+            f"Collection '{collection.name}' holds {count} vectors from {recorded}, "
+            f"but the configured embedding model is {model_id}; "
+            f"use another CHROMA_COLLECTION_NAME or re-ingest into an empty collection"
+        )
+    
+    metadata["embedding_model"] = model_id
+    collection.modify(metadata=metadata)
+    logger.info(f"Collection '{collection.name}' now records embedding model {model_id}")
+
+
 def init_chroma_db():
     """Initialize ChromaDB connection"""
-    get_chroma_collection()
+    if settings.CHROMA_SHARDING not in SHARDING_STRATEGIES:
+        raise ValueError(f"Unknown CHROMA_SHARDING strategy: {settings.CHROMA_SHARDING}")
+    if settings.DEPLOYMENT_ROLE != "standalone" and settings.CHROMA_MODE != "http":
+        raise ValueError(
+            f"The {settings.DEPLOYMENT_ROLE} role shares ChromaDB with other processes "
+            f"through a Chroma server; set CHROMA_MODE=http"
+        )
+    if sharding_enabled():
+        shards = _shard_collections()
+        logger.info(f"Found {len(shards)} '{settings.CHROMA_SHARDING}' shards of {settings.CHROMA_COLLECTION_NAME}")
+    else:
+        get_chroma_collection()
     logger.info("ChromaDB initialized successfully")
 
 
@@ -52,42 +313,295 @@ def add_documents(
     metadatas: List[Dict[str, Any]],
     ids: List[str]
 ):
-    """Add documents to ChromaDB collection"""
-    collection = get_chroma_collection()
-    collection.add(
-        documents=documents,
-        embeddings=embeddings,
-        metadatas=metadatas,
-        ids=ids
-    )
+    """Add documents to ChromaDB collection, or in the chunks' shards"""
+    embeddings = _prepare_embeddings(ids, embeddings)
+    for collection, indexes in _group_by_shard(metadatas):
+        collection.add(
+            documents=[documents[i] for i in indexes],
+            embeddings=[embeddings[i] for i in indexes],
+            metadatas=[metadatas[i] for i in indexes],
+            ids=[ids[i] for i in indexes]
+        )
+    if settings.LEXICAL_INDEX_ENABLED:
+        index_chunks(zip(ids, documents))
+    bump_collection_version(settings.CHROMA_COLLECTION_NAME)
     logger.info(f"Added {len(documents)} documents to ChromaDB")
 
 
+def upsert_documents(
+    documents: List[str],
+    embeddings: List[List[float]],
+    metadatas: List[Dict[str, Any]],
+    ids: List[str]
+):
+    """Add or replace documents in ChromaDB collection, or in the chunks' shards"""
+    embeddings = _prepare_embeddings(ids, embeddings)
+    for collection, indexes in _group_by_shard(metadatas):
+        collection.upsert(
+            documents=[documents[i] for i in indexes],
+            embeddings=[embeddings[i] for i in indexes],
+            metadatas=[metadatas[i] for i in indexes],
+            ids=[ids[i] for i in indexes]
+        )
+    if settings.LEXICAL_INDEX_ENABLED:
+        index_chunks(zip(ids, documents))
+    bump_collection_version(settings.CHROMA_COLLECTION_NAME)
+    logger.info(f"Upserted {len(documents)} documents to ChromaDB")
+
+
 def query_documents(
     query_embeddings: List[List[float]],
     n_results: int = 5,
     where: Optional[Dict[str, Any]] = None,
-    where_document: Optional[Dict[str, Any]] = None
+    where_document: Optional[Dict[str, Any]] = None,
+    include_embeddings: bool = False
 ) -> Dict[str, Any]:
-    """Query documents from ChromaDB"""
-    collection = get_chroma_collection()
+    """
+    Query documents from ChromaDB
+    
+    With EMBEDDING_STORED_DIMENSIONS set, the search runs on truncated
+    vectors (and returns truncated embeddings). When rescoring is enabled,
+    RESCORE_OVERSAMPLE times more candidates are fetched and re-ranked by
+    their full vectors.
+    
+    With sharding, the shards the where filter routes to are queried in
+    parallel and their top n_results merged by distance.
+    """
+    include = ["documents", "metadatas", "distances"]
+    if include_embeddings:
+        include.append("embeddings")
+    collections = get_chroma_collections(where)
+    results = _fan_out(
+        lambda collection: _query_collection(
+            collection, query_embeddings, n_results, where, where_document, include
+        ),
+        collections
+    )
+    if len(results) == 1:
+        return results[0]
+    return merge_query_results(results, n_results, len(query_embeddings), include)
+
+
+def _query_collection(
+    collection: chromadb.Collection,
+    query_embeddings: List[List[float]],
+    n_results: int,
+    where: Optional[Dict[str, Any]],
+    where_document: Optional[Dict[str, Any]],
+    include: List[str]
+) -> Dict[str, Any]:
+    """Query one collection, rescoring reduced-dimension results"""
+    dimensions = settings.EMBEDDING_STORED_DIMENSIONS
+    if not dimensions:
+        return collection.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            where=where,
+            where_document=where_document,
+            include=include
+        )
+    
+    rescore = _rescoring_enabled()
     results = collection.query(
-        query_embeddings=query_embeddings,
-        n_results=n_results,
+        query_embeddings=reduce_dimensions(query_embeddings, dimensions).tolist(),
+        n_results=n_results * settings.RESCORE_OVERSAMPLE if rescore else n_results,
         where=where,
-        where_document=where_document
+        where_document=where_document,
+        include=include
     )
+    if rescore:
+        results = _rescore(results, query_embeddings, n_results)
     return results
 
 
+def merge_query_results(
+    results: List[Dict[str, Any]],
+    n_results: int,
+    query_count: int,
+    include: List[str]
+) -> Dict[str, Any]:
+    """
+    Merge the query results of several shards into one ranking
+    
+    Args:
+        results: Query results of each shard
+        n_results: Results kept per query
+        query_count: Number of query embeddings
+        include: Fields requested from ChromaDB (must contain "distances")
+        
+    Returns:
+        Query results with the n_results closest chunks of all shards
+    """
+    fields = ["ids"] + include
+    merged: Dict[str, Any] = {field: [] for field in fields}
+    for query_index in range(query_count):
+        candidates = [
+            (shard_results, i)
+            for shard_results in results
+            for i in range(len(shard_results["ids"][query_index]))
+        ]
+        closest = heapq.nsmallest(
+            n_results,
+            candidates,
+            key=lambda candidate: candidate[0]["distances"][query_index][candidate[1]]
+        )
+        for field in fields:
+            merged[field].append([shard_results[field][query_index][i] for shard_results, i in closest])
+    return merged
+
+
+def _rescoring_enabled() -> bool:
+    """Whether full vectors are kept to rescore reduced-dimension results"""
+    return bool(settings.EMBEDDING_STORED_DIMENSIONS) and settings.RESCORE_VECTOR_DTYPE != "none"
+
+
+def _prepare_embeddings(ids: List[str], embeddings: List[List[float]]) -> List[List[float]]:
+    """Reduce embeddings to the stored dimensions, keeping full vectors for rescoring"""
+    dimensions = settings.EMBEDDING_STORED_DIMENSIONS
+    if not dimensions:
+        return embeddings
+    if _rescoring_enabled():
+        store_vectors(ids, embeddings, settings.RESCORE_VECTOR_DTYPE)
+    return reduce_dimensions(embeddings, dimensions).tolist()
+
+
+def _rescore(
+    results: Dict[str, Any],
+    query_embeddings: List[List[float]],
+    n_results: int
+) -> Dict[str, Any]:
+    """
+    Re-rank oversampled query results by full-vector distance
+    
+    Distances are squared L2, matching the collection's default space, and
+    replace the reduced-dimension distances in the results.
+    """
+    fields = [
+        field for field in ("ids", "documents", "metadatas", "distances", "embeddings")
+        if results.get(field)
+    ]
+    all_ids = [chunk_id for ids in results["ids"] for chunk_id in ids]
+    full_vectors = get_vectors(all_ids)
+    
+    for query_index, query_embedding in enumerate(query_embeddings):
+        ids = results["ids"][query_index]
+        query = np.asarray(query_embedding, dtype=np.float32)
+        distances = [
+            float(np.sum((full_vectors[chunk_id] - query) ** 2))
+            if chunk_id in full_vectors else float("inf")
+            for chunk_id in ids
+        ]
+        order = sorted(range(len(ids)), key=distances.__getitem__)[:n_results]
+        for field in fields:
+            column = results[field][query_index]
+            results[field][query_index] = [column[i] for i in order]
+        if "distances" in fields:
+            results["distances"][query_index] = [distances[i] for i in order]
+    return results
+
+
+def get_documents(
+    ids: List[str],
+    where: Optional[Dict[str, Any]] = None,
+    include_embeddings: bool = False
+) -> Dict[str, Any]:
+    """Get documents and metadata by ID, keeping only those matching where"""
+    include = ["documents", "metadatas"]
+    if include_embeddings:
+        include.append("embeddings")
+    pages = _fan_out(
+        lambda collection: collection.get(ids=ids, where=where, include=include),
+        get_chroma_collections(where)
+    )
+    if len(pages) == 1:
+        return pages[0]
+    
+    merged: Dict[str, Any] = {field: [] for field in ["ids"] + include}
+    for page in pages:
+        for field in merged:
+            merged[field].extend(page[field])
+    return merged
+
+
+def collection_version() -> int:
+    """Version of the collection, incremented by every add, upsert and delete"""
+    return get_collection_version(settings.CHROMA_COLLECTION_NAME)
+
+
 def delete_documents(ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
-    """Delete documents from ChromaDB"""
-    collection = get_chroma_collection()
-    collection.delete(ids=ids, where=where)
+    """Delete documents from ChromaDB, in every shard that can hold them"""
+    collections = get_chroma_collections(where)
+    rescoring = _rescoring_enabled()
+    if rescoring or settings.LEXICAL_INDEX_ENABLED:
+        # Resolve the matching IDs first so the side indexes can be cleaned too
+        if ids is None:
+            ids = [
+                chunk_id
+                for collection in collections
+                for chunk_id in collection.get(where=where, include=[])["ids"]
+            ]
+            where = None
+        if not ids:
+            return
+        if rescoring:
+            remove_vectors(ids)
+        if settings.LEXICAL_INDEX_ENABLED:
+            remove_chunks(ids)
+    if len(collections) == 1:
+        collections[0].delete(ids=ids, where=where)
+    else:
+        for collection in collections:
+            # Only delete what the shard holds; ChromaDB warns about unknown IDs
+            shard_ids = collection.get(ids=ids, where=where, include=[])["ids"]
+            if shard_ids:
+                collection.delete(ids=shard_ids)
+    bump_collection_version(settings.CHROMA_COLLECTION_NAME)
     logger.info(f"Deleted documents from ChromaDB")
 
 
+def update_metadatas(ids: List[str], metadatas: List[Dict[str, Any]]):
+    """
+    Merge new fields into the metadata of stored chunks
+    
+    With sharding, chunks whose new metadata routes them to another shard
+    are moved there with their stored vectors; their IDs, and so the
+    lexical index and rescoring vectors, stay the same.
+    
+    Args:
+        ids: Chunk IDs
+        metadatas: Fields to set on each chunk
+    """
+    if not ids:
+        return
+    if not sharding_enabled():
+        get_chroma_collection().update(ids=ids, metadatas=metadatas)
+    else:
+        updates = dict(zip(ids, metadatas))
+        for collection in get_chroma_collections():
+            stored = collection.get(ids=ids, include=["embeddings", "documents", "metadatas"])
+            moves: Dict[str, List[int]] = {}
+            for i, (chunk_id, metadata) in enumerate(zip(stored["ids"], stored["metadatas"])):
+                metadata = {**(metadata or {}), **updates[chunk_id]}
+                stored["metadatas"][i] = metadata
+                moves.setdefault(shard_key(metadata), []).append(i)
+            for key, indexes in moves.items():
+                target = _get_shard(key)
+                chunk_ids = [stored["ids"][i] for i in indexes]
+                chunk_metadatas = [stored["metadatas"][i] for i in indexes]
+                if target.name == collection.name:
+                    collection.update(ids=chunk_ids, metadatas=chunk_metadatas)
+                    continue
+                target.add(
+                    ids=chunk_ids,
+                    embeddings=[stored["embeddings"][i] for i in indexes],
+                    documents=[stored["documents"][i] for i in indexes],
+                    metadatas=chunk_metadatas
+                )
+                collection.delete(ids=chunk_ids)
+    bump_collection_version(settings.CHROMA_COLLECTION_NAME)
+    logger.info(f"Updated metadata of {len(ids)} documents in ChromaDB")
+
+
 def get_collection_count() -> int:
     """Get total number of documents in collection"""
-    collection = get_chroma_collection()
-    return collection.count()
+    return sum(collection.count() for collection in get_chroma_collections())
@@ -0,0 +1,199 @@
+"""
+Async access to ChromaDB - runs the blocking client on dedicated read and write thread pools
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+from app.core.config import settings
+from app.db import chroma
+from app.utils.metrics import register_metrics
+
+
+class VectorStoreExecutor:
+    """Bounded thread pool for blocking vector store calls, with queueing stats"""
+    
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"chroma-{name}")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.busy_seconds = 0.0
+    
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking call on the pool without blocking the event loop
+        
+        Args:
+            fn: Blocking callable
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+            
+        Returns:
+            The call's result
+        """
+        submitted = time.perf_counter()
+        
+        def call():
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._record(started - submitted, time.perf_counter() - started)
+        
+        with self._lock:
+            self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+    
+    def _record(self, wait: float, busy: float):
+        with self._lock:
+            self.completed += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            self.busy_seconds += busy
+    
+    def stats(self) -> Dict[str, Any]:
+        """Calls waiting or running, and time spent queued and running"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "mean_wait_ms": round(self.wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+                "busy_seconds": round(self.busy_seconds, 4)
+            }
+    
+    def shutdown(self):
+        """Wait for running calls and stop the pool"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_executors: Dict[str, VectorStoreExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name: str) -> VectorStoreExecutor:
+    """Get or create the named pool ("read" or "write")"""
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                workers = settings.CHROMA_READ_WORKERS if name == "read" else settings.CHROMA_WRITE_WORKERS
+                executor = VectorStoreExecutor(name, max(workers, 1))
+                _executors[name] = executor
+                if len(_executors) == 1:
+                    register_metrics("chroma", vector_store_stats)
+                logger.info(f"Chroma {name} pool started with {executor.workers} threads")
+    return executor
+
+
+def vector_store_stats() -> Dict[str, Any]:
+    """Client mode and the queueing stats of each pool"""
+    with _executors_lock:
+        executors = dict(_executors)
+    return {
+        "mode": settings.CHROMA_MODE,
+        **{name: executor.stats() for name, executor in executors.items()}
+    }
+
+
+def shutdown_vector_store_executors():
+    """Stop the read and write pools"""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
+
+
+async def run_read(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking call that reads the vector store on the read pool"""
+    return await _get_executor("read").run(fn, *args, **kwargs)
+
+
+async def run_write(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking call that writes the vector store on the write pool
+    
+    Writes get their own pool so bulk ingestion never queues ahead of queries.
+    """
+    return await _get_executor("write").run(fn, *args, **kwargs)
+
+
+async def query_documents(
+    query_embeddings: List[List[float]],
+    n_results: int = 5,
+    where: Optional[Dict[str, Any]] = None,
+    where_document: Optional[Dict[str, Any]] = None,
+    include_embeddings: bool = False
+) -> Dict[str, Any]:
+    """Async chroma.query_documents"""
+    return await run_read(
+        chroma.query_documents,
+        query_embeddings,
+        n_results=n_results,
+        where=where,
+        where_document=where_document,
+        include_embeddings=include_embeddings
+    )
+
+
+async def get_documents(
+    ids: List[str],
+    where: Optional[Dict[str, Any]] = None,
+    include_embeddings: bool = False
+) -> Dict[str, Any]:
+    """Async chroma.get_documents"""
+    return await run_read(chroma.get_documents, ids, where=where, include_embeddings=include_embeddings)
+
+
+async def get_collection_count() -> int:
+    """Async chroma.get_collection_count"""
+    return await run_read(chroma.get_collection_count)
+
+
+async def collection_version() -> int:
+    """Async chroma.collection_version"""
+    return await run_read(chroma.collection_version)
+
+
+async def add_documents(
+    documents: List[str],
+    embeddings: List[List[float]],
+    metadatas: List[Dict[str, Any]],
+    ids: List[str]
+):
+    """Async chroma.add_documents"""
+    await run_write(chroma.add_documents, documents, embeddings, metadatas, ids)
+
+
+async def upsert_documents(
+    documents: List[str],
+    embeddings: List[List[float]],
+    metadatas: List[Dict[str, Any]],
+    ids: List[str]
+):
+    """Async chroma.upsert_documents"""
+    await run_write(chroma.upsert_documents, documents, embeddings, metadatas, ids)
+
+
+async def delete_documents(ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None):
+    """Async chroma.delete_documents"""
+    await run_write(chroma.delete_documents, ids=ids, where=where)
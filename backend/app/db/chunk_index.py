@@ -0,0 +1,202 @@
+"""
+Content-hash index of stored chunks, used to skip duplicate chunks
+
+Each stored chunk belongs to the document that first stored it. Documents
+whose chunks were skipped as duplicates are recorded as referencing the
+stored chunk, so it outlives the deletion of its owner.
+"""
+import hashlib
+from typing import Dict, Iterable, List, Tuple
+from app.db.sqlite import get_schema_connection
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunk_hashes (
+    content_hash TEXT PRIMARY KEY,
+    chunk_id TEXT NOT NULL,
+    document_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunk_hashes_document
+    ON chunk_hashes (document_id);
+CREATE TABLE IF NOT EXISTS chunk_refs (
+    content_hash TEXT NOT NULL,
+    document_id TEXT NOT NULL,
+    PRIMARY KEY (content_hash, document_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_chunk_refs_document
+    ON chunk_refs (document_id);
+"""
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+
+def _connection():
+    """Get the metadata database connection with this store's tables"""
+    return get_schema_connection(_SCHEMA)
+
+
+def hash_chunk(text: str) -> str:
+    """Compute the stable content hash of a chunk"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def find_existing_chunks(content_hashes: List[str]) -> Dict[str, str]:
+    """
+    Look up chunks that are already stored
+    
+    Args:
+        content_hashes: Content hashes to look up
+        
+    Returns:
+        Mapping of content hash to stored chunk ID, for known hashes only
+    """
+    connection = _connection()
+    existing = {}
+    for start in range(0, len(content_hashes), _LOOKUP_BATCH_SIZE):
+        batch = content_hashes[start:start + _LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        rows = connection.execute(
+            f"SELECT content_hash, chunk_id FROM chunk_hashes WHERE content_hash IN ({placeholders})",
+            batch
+        ).fetchall()
+        existing.update((row["content_hash"], row["chunk_id"]) for row in rows)
+    return existing
+
+
+def register_chunks(entries: Iterable[Tuple[str, str, str]]):
+    """
+    Record stored chunks in the index
+    
+    Args:
+        entries: (content hash, chunk ID, document ID) of each stored chunk
+    """
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            "INSERT OR IGNORE INTO chunk_hashes (content_hash, chunk_id, document_id) VALUES (?, ?, ?)",
+            entries
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def add_chunk_refs(document_id: str, content_hashes: List[str]):
+    """
+    Record that a document reuses stored chunks instead of storing its own copy
+    
+    Chunks the document owns itself, e.g. on a resumed ingestion, are skipped.
+    
+    Args:
+        document_id: ID of the document whose chunks were deduplicated
+        content_hashes: Content hashes of the reused chunks
+    """
+    connection = _connection()
+    for start in range(0, len(content_hashes), _LOOKUP_BATCH_SIZE):
+        batch = content_hashes[start:start + _LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        connection.execute(
+            f"""
+            INSERT OR IGNORE INTO chunk_refs (content_hash, document_id)
+            SELECT content_hash, ? FROM chunk_hashes
+            WHERE content_hash IN ({placeholders}) AND document_id != ?
+            """,
+            [document_id, *batch, document_id]
+        )
+
+
+def get_owned_chunk_ids(document_id: str) -> List[str]:
+    """IDs of the stored chunks a document owns, including ones inherited from deleted documents"""
+    rows = _connection().execute(
+        "SELECT chunk_id FROM chunk_hashes WHERE document_id = ?", (document_id,)
+    )
+    return [row["chunk_id"] for row in rows]
+
+
+def get_reused_chunks(document_ids: List[str]) -> Dict[str, List[int]]:
+    """
+    Chunks stored by other documents that the given documents reuse
+    
+    Args:
+        document_ids: IDs of the reusing documents
+        
+    Returns:
+        Mapping of owning document ID to the indexes of the chunks reused from it
+    """
+    placeholders = ", ".join("?" * len(document_ids))
+    rows = _connection().execute(
+        f"""
+        SELECT DISTINCT h.document_id, h.chunk_id FROM chunk_refs r
+        JOIN chunk_hashes h ON h.content_hash = r.content_hash
+        WHERE r.document_id IN ({placeholders}) AND h.document_id NOT IN ({placeholders})
+        """,
+        [*document_ids, *document_ids]
+    )
+    reused: Dict[str, List[int]] = {}
+    for row in rows:
+        # Chunk IDs are "<storing document ID>_<chunk index>", kept when a chunk is inherited
+        chunk_index = int(row["chunk_id"].rsplit("_", 1)[1])
+        reused.setdefault(row["document_id"], []).append(chunk_index)
+    return reused
+
+
+def find_shared_chunks(document_id: str) -> Dict[str, str]:
+    """
+    Chunks of a document that other documents reuse
+    
+    Args:
+        document_id: ID of the document
+        
+    Returns:
+        Mapping of chunk ID to the referencing document that inherits it
+    """
+    rows = _connection().execute(
+        """
+        SELECT h.chunk_id, MIN(r.document_id) AS heir FROM chunk_hashes h
+        JOIN chunk_refs r ON r.content_hash = h.content_hash
+        WHERE h.document_id = ? AND r.document_id != ?
+        GROUP BY h.content_hash
+        """,
+        (document_id, document_id)
+    )
+    return {row["chunk_id"]: row["heir"] for row in rows}
+
+
+def remove_document_chunks(document_id: str, inherited: Dict[str, str]) -> int:
+    """
+    Remove the index entries of a deleted document
+    
+    Args:
+        document_id: ID of the deleted document
+        inherited: Chunk IDs handed to a referencing document, from find_shared_chunks
+        
+    Returns:
+        Number of chunk entries removed
+    """
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        for chunk_id, heir in inherited.items():
+            connection.execute(
+                """
+                DELETE FROM chunk_refs WHERE document_id = ? AND content_hash =
+                    (SELECT content_hash FROM chunk_hashes WHERE document_id = ? AND chunk_id = ?)
+                """,
+                (heir, document_id, chunk_id)
+            )
+            connection.execute(
+                "UPDATE chunk_hashes SET document_id = ? WHERE document_id = ? AND chunk_id = ?",
+                (heir, document_id, chunk_id)
+            )
+        connection.execute("DELETE FROM chunk_refs WHERE document_id = ?", (document_id,))
+        cursor = connection.execute(
+            "DELETE FROM chunk_hashes WHERE document_id = ?", (document_id,)
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return cursor.rowcount
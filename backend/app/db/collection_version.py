@@ -0,0 +1,45 @@
+"""
+Per-collection version counter, bumped on every write to invalidate caches
+"""
+from app.db.sqlite import get_schema_connection
+
+
+# Kept in SQLite so every worker process sees writes made by the others
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS collection_versions (
+    collection TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _connection():
+    """Get the metadata database connection with this store's tables"""
+    return get_schema_connection(_SCHEMA)
+
+
+def get_collection_version(collection: str) -> int:
+    """Get the current version of a collection (0 before its first write)"""
+    row = _connection().execute(
+        "SELECT version FROM collection_versions WHERE collection = ?", (collection,)
+    ).fetchone()
+    return row["version"] if row else 0
+
+
+def bump_collection_version(collection: str) -> int:
+    """
+    Increment the version of a collection after a write
+    
+    Args:
+        collection: Collection name
+        
+    Returns:
+        The new version
+    """
+    row = _connection().execute(
+        "INSERT INTO collection_versions (collection, version) VALUES (?, 1) "
+        "ON CONFLICT (collection) DO UPDATE SET version = version + 1 "
+        "RETURNING version",
+        (collection,)
+    ).fetchone()
+    return row["version"]
@@ -0,0 +1,224 @@
+"""
+Registry of ingested documents, so listing and deleting never scan the vector store
+
+Chunks in ChromaDB only carry their document_id; the document-level fields
+(source filename, type, upload date) are joined back from here.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from app.core.config import settings
+from app.db.collection_version import get_collection_version
+from app.db.sqlite import add_missing_columns, get_schema_connection
+
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+# Chunks of non-keyed documents have the IDs {document_id}_{i} for i below
+# chunk_index_end (deduplicated indexes are missing); keyed CSV chunk IDs
+# are listed in the row index instead. total_chunks is the number of chunks
+# the chunker produced, stored or not
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    document_type TEXT NOT NULL,
+    keyed INTEGER NOT NULL DEFAULT 0,
+    chunks INTEGER NOT NULL DEFAULT 0,
+    chunk_index_end INTEGER NOT NULL DEFAULT 0,
+    total_chunks INTEGER,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    upload_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_filename
+    ON documents (filename);
+CREATE INDEX IF NOT EXISTS idx_documents_upload_date
+    ON documents (upload_date, document_id);
+"""
+
+
+# Document fields by document ID, dropped whenever the collection changes
+_fields_lock = threading.Lock()
+_fields_cache: Tuple[Optional[int], Dict[str, Dict[str, Any]]] = (None, {})
+
+
+def _migrate(connection):
+    """Upgrade document tables created before chunk totals were recorded"""
+    add_missing_columns(connection, "documents", {"total_chunks": "INTEGER"})
+
+
+def _connection():
+    """Get the metadata database connection with this store's tables"""
+    return get_schema_connection(_SCHEMA, migrate=_migrate)
+
+
+def _document_fields(row) -> Dict[str, Any]:
+    """Document-level chunk metadata of a registry row"""
+    fields = {
+        "source": row["filename"],
+        "document_type": row["document_type"],
+        "upload_date": row["upload_date"]
+    }
+    if row["document_type"] == "pdf":
+        # Documents registered before totals were recorded only know their stored chunks
+        total_chunks = row["total_chunks"]
+        fields["total_chunks"] = row["chunk_index_end"] if total_chunks is None else total_chunks
+    return fields
+
+
+def register_document(
+    document_id: str,
+    filename: str,
+    document_type: str,
+    size_bytes: int,
+    upload_date: str,
+    keyed: bool = False
+):
+    """
+    Record a document whose ingestion is starting
+    
+    A resumed ingestion or a new version of a keyed CSV keeps the chunk
+    counts already recorded for the document.
+    
+    Args:
+        document_id: ID of the document
+        filename: Original filename
+        document_type: Document type (pdf/csv)
+        size_bytes: Size of the uploaded file
+        upload_date: ISO upload timestamp
+        keyed: Whether chunk IDs derive from a CSV key column
+    """
+    _connection().execute(
+        """
+        INSERT INTO documents (document_id, filename, document_type, keyed, size_bytes, upload_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (document_id) DO UPDATE SET
+            filename = excluded.filename,
+            document_type = excluded.document_type,
+            keyed = excluded.keyed,
+            size_bytes = excluded.size_bytes,
+            upload_date = excluded.upload_date
+        """,
+        (document_id, filename, document_type, int(keyed), size_bytes, upload_date)
+    )
+
+
+def add_document_chunks(document_id: str, chunks: int, chunk_index_end: int):
+    """
+    Count a stored batch of chunks
+    
+    Args:
+        document_id: ID of the document
+        chunks: Chunks stored
+        chunk_index_end: One past the highest chunk index stored
+    """
+    _connection().execute(
+        """
+        UPDATE documents
+        SET chunks = chunks + ?, chunk_index_end = MAX(chunk_index_end, ?)
+        WHERE document_id = ?
+        """,
+        (chunks, chunk_index_end, document_id)
+    )
+
+
+def set_document_total_chunks(document_id: str, total_chunks: int):
+    """Record how many chunks the chunker produced, including ones deduplicated away"""
+    _connection().execute(
+        "UPDATE documents SET total_chunks = ? WHERE document_id = ?", (total_chunks, document_id)
+    )
+
+
+def set_document_chunks(document_id: str, chunks: int):
+    """Set the number of stored chunks, e.g. after a keyed CSV was re-ingested"""
+    _connection().execute(
+        "UPDATE documents SET chunks = ? WHERE document_id = ?", (chunks, document_id)
+    )
+
+
+def get_document(document_id: str) -> Optional[Dict[str, Any]]:
+    """Get a registered document, or None"""
+    row = _connection().execute(
+        "SELECT * FROM documents WHERE document_id = ?", (document_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def get_document_fields(document_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up the document-level metadata of chunks by document ID
+    
+    Results are cached until the next write to the collection; IDs not in
+    the cache are read from the registry, so a document registered at the
+    start of its ingestion is found right away.
+    
+    Args:
+        document_ids: IDs of the documents
+        
+    Returns:
+        Fields (source, document_type, upload_date, total_chunks for PDFs)
+        by document ID, for the registered documents
+    """
+    global _fields_cache
+    version = get_collection_version(settings.CHROMA_COLLECTION_NAME)
+    document_ids = set(document_ids)
+    with _fields_lock:
+        if _fields_cache[0] != version:
+            _fields_cache = (version, {})
+        cache = _fields_cache[1]
+        found = {document_id: cache[document_id] for document_id in document_ids if document_id in cache}
+    
+    missing = [document_id for document_id in document_ids if document_id not in found]
+    for start in range(0, len(missing), _LOOKUP_BATCH_SIZE):
+        batch = missing[start:start + _LOOKUP_BATCH_SIZE]
+        placeholders = ",".join("?" * len(batch))
+        rows = _connection().execute(
+            f"SELECT * FROM documents WHERE document_id IN ({placeholders})", batch
+        )
+        found.update((row["document_id"], _document_fields(row)) for row in rows)
+    
+    if missing:
+        with _fields_lock:
+            if _fields_cache[0] == version:
+                _fields_cache[1].update(
+                    (document_id, found[document_id]) for document_id in missing if document_id in found
+                )
+    return found
+
+
+def find_document_ids(filename: str) -> List[str]:
+    """IDs of the registered documents uploaded under a filename"""
+    rows = _connection().execute(
+        "SELECT document_id FROM documents WHERE filename = ?", (filename,)
+    )
+    return [row["document_id"] for row in rows]
+
+
+def list_documents(limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+    """
+    List registered documents, most recently uploaded first
+    
+    Args:
+        limit: Maximum number of documents
+        offset: Documents to skip
+        
+    Returns:
+        Document records
+    """
+    rows = _connection().execute(
+        """
+        SELECT * FROM documents
+        ORDER BY upload_date DESC, document_id
+        LIMIT ? OFFSET ?
+        """,
+        (limit, offset)
+    )
+    return [dict(row) for row in rows]
+
+
+def remove_document(document_id: str) -> int:
+    """Remove a deleted document from the registry"""
+    cursor = _connection().execute(
+        "DELETE FROM documents WHERE document_id = ?", (document_id,)
+    )
+    return cursor.rowcount
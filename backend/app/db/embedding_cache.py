@@ -0,0 +1,191 @@
+"""
+Persistent embedding cache keyed by embedding model and text hash
+"""
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from loguru import logger
+from app.core.config import settings
+from app.db.sqlite import get_schema_connection
+from app.utils.metrics import register_metrics
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_access
+    ON embedding_cache (last_access);
+"""
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+# Access times are only refreshed once older than this, so repeated hits
+# do not each take the write lock (LRU order only needs to be coarse)
+_ACCESS_REFRESH_SECONDS = 60.0
+
+
+def hash_text(text: str) -> str:
+    """Compute the cache key hash of a text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed cache of embedding vectors
+    
+    Vectors are stored as float32 blobs. Lookups refresh the last access
+    time of entries not accessed in the last minute, and the least recently
+    used entries are evicted once the cache grows past max_entries.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.db_path = str(db_path or settings.EMBEDDING_CACHE_PATH)
+        self.max_entries = max_entries or settings.EMBEDDING_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        self._entries = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def _connection(self):
+        """Get the cache database connection"""
+        return get_schema_connection(_SCHEMA, self.db_path)
+    
+    def get_many(self, model: str, text_hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings
+        
+        Args:
+            model: Embedding model name
+            text_hashes: Hashes of the texts to look up
+            
+        Returns:
+            Mapping of text hash to embedding vector, for cached texts only
+        """
+        connection = self._connection()
+        now = time.time()
+        found = {}
+        stale = []
+        for start in range(0, len(text_hashes), _LOOKUP_BATCH_SIZE):
+            batch = text_hashes[start:start + _LOOKUP_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            rows = connection.execute(
+                f"SELECT text_hash, vector, last_access FROM embedding_cache "
+                f"WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch]
+            ).fetchall()
+            for row in rows:
+                found[row["text_hash"]] = np.frombuffer(row["vector"], dtype=np.float32).tolist()
+                if now - row["last_access"] > _ACCESS_REFRESH_SECONDS:
+                    stale.append((now, model, row["text_hash"]))
+        
+        if stale:
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(
+                    "UPDATE embedding_cache SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    stale
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(set(text_hashes)) - len(found)
+        return found
+    
+    def get(self, model: str, text_hash: str) -> Optional[List[float]]:
+        """Look up a single cached embedding"""
+        return self.get_many(model, [text_hash]).get(text_hash)
+    
+    def put_many(self, model: str, entries: Iterable[Tuple[str, List[float]]]):
+        """
+        Store embeddings, evicting the least recently used entries when full
+        
+        Args:
+            model: Embedding model name
+            entries: (text hash, embedding vector) pairs
+        """
+        now = time.time()
+        rows = [
+            (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text_hash, vector in entries
+        ]
+        if not rows:
+            return
+        
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO embedding_cache (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            inserted = cursor.rowcount
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        
+        with self._lock:
+            if self._entries is None:
+                self._entries = self.count()
+            else:
+                self._entries += inserted
+            overflow = self._entries - self.max_entries
+        if overflow > 0:
+            self._evict(overflow)
+    
+    def _evict(self, count: int):
+        """Delete the count least recently used entries"""
+        cursor = self._connection().execute(
+            "DELETE FROM embedding_cache WHERE (model, text_hash) IN ("
+            "SELECT model, text_hash FROM embedding_cache ORDER BY last_access LIMIT ?)",
+            (count,)
+        )
+        with self._lock:
+            self._entries -= cursor.rowcount
+            self.evictions += cursor.rowcount
+        logger.debug(f"Evicted {cursor.rowcount} embeddings from the cache")
+    
+    def count(self) -> int:
+        """Get the number of cached embeddings"""
+        return self._connection().execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+    
+    def stats(self) -> Dict[str, float]:
+        """Return hit, miss and eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": self._entries if self._entries is not None else -1
+            }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide embedding cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+                register_metrics("embedding_cache", _cache.stats)
+    return _cache
@@ -0,0 +1,52 @@
+"""
+Known values of categorical metadata attributes, used to recognize filters in queries
+"""
+from typing import Dict, Iterable, Set, Tuple
+from app.db.sqlite import get_schema_connection
+
+
+# Values are only added: a value whose rows were all deleted simply
+# produces a filter that matches nothing
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facet_values (
+    attribute TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (attribute, value)
+) WITHOUT ROWID;
+"""
+
+
+def _connection():
+    """Get the metadata database connection with this store's tables"""
+    return get_schema_connection(_SCHEMA)
+
+
+def register_facet_values(values: Iterable[Tuple[str, str]]):
+    """
+    Record attribute values seen during ingestion
+    
+    Args:
+        values: (attribute, value) pairs; duplicates are ignored
+    """
+    rows = set(values)
+    if not rows:
+        return
+    
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            "INSERT OR IGNORE INTO facet_values (attribute, value) VALUES (?, ?)", rows
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def get_facet_values() -> Dict[str, Set[str]]:
+    """Get the known values of every categorical attribute"""
+    facets: Dict[str, Set[str]] = {}
+    for row in _connection().execute("SELECT attribute, value FROM facet_values"):
+        facets.setdefault(row["attribute"], set()).add(row["value"])
+    return facets
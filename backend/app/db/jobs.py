@@ -0,0 +1,174 @@
+"""
+SQLite-backed ingestion job store
+"""
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+from loguru import logger
+from app.db.sqlite import add_missing_columns, get_schema_connection
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    job_id TEXT PRIMARY KEY,
+    document_id TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    document_type TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    key_column TEXT,
+    status TEXT NOT NULL,
+    rows_parsed INTEGER NOT NULL DEFAULT 0,
+    chunks_embedded INTEGER NOT NULL DEFAULT 0,
+    chunks_stored INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_status
+    ON ingestion_jobs (status, created_at);
+"""
+
+_PROGRESS_FIELDS = ("rows_parsed", "chunks_embedded", "chunks_stored")
+
+
+def _migrate(connection):
+    """Upgrade job tables created before keyed CSV ingestion"""
+    add_missing_columns(connection, "ingestion_jobs", {"key_column": "TEXT"})
+
+
+def _connection():
+    """Get the metadata database connection with this store's tables"""
+    return get_schema_connection(_SCHEMA, migrate=_migrate)
+
+
+def init_jobs_db():
+    """Create the ingestion job tables if needed"""
+    _connection()
+    logger.info("Ingestion job store initialized")
+
+
+def _row_to_job(row) -> Dict[str, Any]:
+    """Convert a job row into a dictionary"""
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def create_job(
+    document_id: str,
+    filename: str,
+    document_type: str,
+    file_path: str,
+    key_column: Optional[str] = None
+) -> Dict[str, Any]:
+    """Create a queued ingestion job"""
+    job_id = str(uuid.uuid4())
+    _connection().execute(
+        """
+        INSERT INTO ingestion_jobs
+            (job_id, document_id, filename, document_type, file_path, key_column,
+             status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)
+        """,
+        (job_id, document_id, filename, document_type, file_path, key_column,
+         datetime.now().isoformat())
+    )
+    logger.info(f"Queued ingestion job {job_id} for {filename}")
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Get an ingestion job by ID"""
+    row = _connection().execute(
+        "SELECT * FROM ingestion_jobs WHERE job_id = ?", (job_id,)
+    ).fetchone()
+    return _row_to_job(row) if row else None
+
+
+def claim_next_job() -> Optional[Dict[str, Any]]:
+    """
+    Atomically mark the oldest queued job as running and return it
+    
+    Jobs for a document that already has a running job are skipped, so
+    successive versions of a keyed CSV are ingested one at a time.
+    """
+    connection = _connection()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        row = connection.execute(
+            """
+            SELECT job_id FROM ingestion_jobs
+            WHERE status = 'queued'
+              AND document_id NOT IN (
+                  SELECT document_id FROM ingestion_jobs WHERE status = 'running'
+              )
+            ORDER BY created_at
+            LIMIT 1
+            """
+        ).fetchone()
+        if row is None:
+            connection.execute("COMMIT")
+            return None
+        connection.execute(
+            "UPDATE ingestion_jobs SET status = 'running', started_at = ? WHERE job_id = ?",
+            (datetime.now().isoformat(), row["job_id"])
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return get_job(row["job_id"])
+
+
+def update_job_progress(job_id: str, progress: Dict[str, int]):
+    """Record progress counters for a running job"""
+    fields = [field for field in _PROGRESS_FIELDS if field in progress]
+    if not fields:
+        return
+    assignments = ", ".join(f"{field} = ?" for field in fields)
+    _connection().execute(
+        f"UPDATE ingestion_jobs SET {assignments} WHERE job_id = ?",
+        [progress[field] for field in fields] + [job_id]
+    )
+
+
+def complete_job(job_id: str, result: Dict[str, Any]):
+    """Mark a job as completed with its processing result"""
+    _connection().execute(
+        """
+        UPDATE ingestion_jobs
+        SET status = 'completed', result = ?, finished_at = ?
+        WHERE job_id = ?
+        """,
+        (json.dumps(result), datetime.now().isoformat(), job_id)
+    )
+
+
+def fail_job(job_id: str, error: str):
+    """Mark a job as failed"""
+    _connection().execute(
+        """
+        UPDATE ingestion_jobs
+        SET status = 'failed', error = ?, finished_at = ?
+        WHERE job_id = ?
+        """,
+        (error, datetime.now().isoformat(), job_id)
+    )
+
+
+def requeue_running_jobs() -> int:
+    """Return jobs left running by a stopped process to the queue"""
+    cursor = _connection().execute(
+        """
+        UPDATE ingestion_jobs
+        SET status = 'queued', started_at = NULL,
+            rows_parsed = 0, chunks_embedded = 0, chunks_stored = 0
+        WHERE status = 'running'
+        """
+    )
+    if cursor.rowcount:
+        logger.warning(f"Requeued {cursor.rowcount} interrupted ingestion jobs")
+    return cursor.rowcount
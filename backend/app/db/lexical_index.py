@@ -0,0 +1,125 @@
+"""
+BM25 lexical index of stored chunks, kept next to ChromaDB for keyword search
+"""
+import re
+from typing import Iterable, List, Tuple
+from app.core.config import settings
+from app.db.sqlite import get_schema_connection
+
+
+# FTS5 keeps compact, delta-encoded postings on disk and ranks with bm25().
+# lexical_rows maps chunk IDs to FTS rows so deletes never scan the index.
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS lexical_index USING fts5(
+    content,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS lexical_rows (
+    chunk_id TEXT PRIMARY KEY,
+    fts_rowid INTEGER NOT NULL UNIQUE
+);
+"""
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _connection():
+    """Get the lexical index database connection"""
+    return get_schema_connection(_SCHEMA, settings.LEXICAL_INDEX_PATH)
+
+
+def _delete_rows(connection, chunk_ids: List[str]) -> int:
+    """Delete indexed chunks inside the caller's transaction"""
+    removed = 0
+    for start in range(0, len(chunk_ids), _LOOKUP_BATCH_SIZE):
+        batch = chunk_ids[start:start + _LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        connection.execute(
+            f"DELETE FROM lexical_index WHERE rowid IN "
+            f"(SELECT fts_rowid FROM lexical_rows WHERE chunk_id IN ({placeholders}))",
+            batch
+        )
+        cursor = connection.execute(
+            f"DELETE FROM lexical_rows WHERE chunk_id IN ({placeholders})", batch
+        )
+        removed += cursor.rowcount
+    return removed
+
+
+def index_chunks(entries: Iterable[Tuple[str, str]]):
+    """
+    Add or replace chunks in the index
+    
+    Args:
+        entries: (chunk ID, chunk text) of each chunk
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        _delete_rows(connection, [chunk_id for chunk_id, _ in entries])
+        for chunk_id, text in entries:
+            cursor = connection.execute("INSERT INTO lexical_index (content) VALUES (?)", (text,))
+            connection.execute(
+                "INSERT INTO lexical_rows (chunk_id, fts_rowid) VALUES (?, ?)",
+                (chunk_id, cursor.lastrowid)
+            )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def build_match_query(query: str) -> str:
+    """
+    Turn free text into an FTS5 query matching any of its terms
+    
+    Each term is quoted, so identifiers such as SKUs are matched literally
+    and FTS5 operators in user input have no effect.
+    """
+    terms = dict.fromkeys(token.lower() for token in _TOKEN_PATTERN.findall(query))
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+def search(query: str, limit: int) -> List[Tuple[str, float]]:
+    """
+    Rank chunks by BM25 against a free-text query
+    
+    Args:
+        query: Query text
+        limit: Maximum number of results
+        
+    Returns:
+        (chunk ID, BM25 score) pairs, best first; higher scores are better
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+    
+    rows = _connection().execute(
+        "SELECT r.chunk_id, bm25(lexical_index) AS score "
+        "FROM lexical_index JOIN lexical_rows r ON r.fts_rowid = lexical_index.rowid "
+        "WHERE lexical_index MATCH ? ORDER BY score LIMIT ?",
+        (match, limit)
+    ).fetchall()
+    # FTS5 bm25() is negated so that ascending order ranks best first
+    return [(row["chunk_id"], -row["score"]) for row in rows]
+
+
+def remove_chunks(chunk_ids: List[str]) -> int:
+    """Remove deleted chunks from the index"""
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        removed = _delete_rows(connection, chunk_ids)
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return removed
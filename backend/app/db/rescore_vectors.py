@@ -0,0 +1,134 @@
+"""
+Quantized full-dimension vectors used to rescore reduced-dimension search results
+"""
+from typing import Dict, List, Tuple
+import numpy as np
+from app.core.config import settings
+from app.db.sqlite import get_schema_connection
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rescore_vectors (
+    chunk_id TEXT PRIMARY KEY,
+    dtype TEXT NOT NULL,
+    scale REAL NOT NULL,
+    vector BLOB NOT NULL
+) WITHOUT ROWID;
+"""
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+
+def _connection():
+    """Get the rescore vector database connection"""
+    return get_schema_connection(_SCHEMA, settings.RESCORE_VECTORS_PATH)
+
+
+def reduce_dimensions(embeddings: List[List[float]], dimensions: int) -> np.ndarray:
+    """
+    Truncate embeddings to their first dimensions and re-normalize them
+    
+    Matryoshka-trained models such as text-embedding-3 keep most of their
+    ranking quality in the leading dimensions.
+    
+    Args:
+        embeddings: Full embedding vectors
+        dimensions: Number of leading dimensions to keep
+        
+    Returns:
+        float32 array of unit-length truncated vectors
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)[:, :dimensions]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def quantize(vector: np.ndarray, dtype: str) -> Tuple[bytes, float]:
+    """
+    Quantize a vector for storage
+    
+    Args:
+        vector: float32 vector
+        dtype: "float16", or "int8" with a per-vector scale
+        
+    Returns:
+        (packed bytes, scale)
+    """
+    if dtype == "float16":
+        return vector.astype(np.float16).tobytes(), 1.0
+    if dtype == "int8":
+        scale = float(np.abs(vector).max()) / 127 or 1.0
+        return np.round(vector / scale).astype(np.int8).tobytes(), scale
+    raise ValueError(f"Unsupported rescore vector dtype: {dtype}")
+
+
+def dequantize(data: bytes, dtype: str, scale: float) -> np.ndarray:
+    """Unpack a quantized vector to float32"""
+    return np.frombuffer(data, dtype=getattr(np, dtype)).astype(np.float32) * scale
+
+
+def store_vectors(ids: List[str], embeddings: List[List[float]], dtype: str):
+    """
+    Store quantized full vectors, replacing existing ones
+    
+    Args:
+        ids: Chunk IDs
+        embeddings: Full embedding vectors
+        dtype: Quantization type
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    rows = []
+    for chunk_id, vector in zip(ids, vectors):
+        data, scale = quantize(vector, dtype)
+        rows.append((chunk_id, dtype, scale, data))
+    
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            "INSERT OR REPLACE INTO rescore_vectors (chunk_id, dtype, scale, vector) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def get_vectors(ids: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Load full vectors
+    
+    Args:
+        ids: Chunk IDs to load
+        
+    Returns:
+        Mapping of chunk ID to float32 vector, for stored chunks only
+    """
+    connection = _connection()
+    vectors = {}
+    for start in range(0, len(ids), _LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + _LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        rows = connection.execute(
+            f"SELECT chunk_id, dtype, scale, vector FROM rescore_vectors WHERE chunk_id IN ({placeholders})",
+            batch
+        ).fetchall()
+        for row in rows:
+            vectors[row["chunk_id"]] = dequantize(row["vector"], row["dtype"], row["scale"])
+    return vectors
+
+
+def remove_vectors(ids: List[str]) -> int:
+    """Remove the full vectors of deleted chunks"""
+    connection = _connection()
+    removed = 0
+    for start in range(0, len(ids), _LOOKUP_BATCH_SIZE):
+        batch = ids[start:start + _LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        cursor = connection.execute(
+            f"DELETE FROM rescore_vectors WHERE chunk_id IN ({placeholders})", batch
+        )
+        removed += cursor.rowcount
+    return removed
@@ -0,0 +1,149 @@
+"""
+Per-row fingerprint index for incremental (keyed) CSV ingestion
+"""
+from typing import Dict, Iterable, List, Tuple
+from app.db.sqlite import get_schema_connection
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS csv_rows (
+    document_id TEXT NOT NULL,
+    row_key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    chunk_id TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    PRIMARY KEY (document_id, row_key)
+) WITHOUT ROWID;
+"""
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+
+def _connection():
+    """Get the metadata database connection with this store's tables"""
+    return get_schema_connection(_SCHEMA)
+
+
+def get_fingerprints(document_id: str, row_keys: List[str]) -> Dict[str, str]:
+    """
+    Look up the stored fingerprints of rows
+    
+    Args:
+        document_id: ID of the keyed CSV dataset
+        row_keys: Primary-key values to look up
+        
+    Returns:
+        Mapping of row key to fingerprint, for stored rows only
+    """
+    connection = _connection()
+    fingerprints = {}
+    for start in range(0, len(row_keys), _LOOKUP_BATCH_SIZE):
+        batch = row_keys[start:start + _LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        rows = connection.execute(
+            f"""
+            SELECT row_key, fingerprint FROM csv_rows
+            WHERE document_id = ? AND row_key IN ({placeholders})
+            """,
+            [document_id] + batch
+        ).fetchall()
+        fingerprints.update((row["row_key"], row["fingerprint"]) for row in rows)
+    return fingerprints
+
+
+def touch_rows(document_id: str, row_keys: List[str], run_id: str):
+    """Mark unchanged rows as seen by the current run"""
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            "UPDATE csv_rows SET run_id = ? WHERE document_id = ? AND row_key = ?",
+            [(run_id, document_id, row_key) for row_key in row_keys]
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def upsert_rows(document_id: str, rows: Iterable[Tuple[str, str, str]], run_id: str):
+    """
+    Record new or changed rows as seen by the current run
+    
+    Args:
+        document_id: ID of the keyed CSV dataset
+        rows: (row key, fingerprint, chunk ID) of each stored row
+        run_id: ID of the current ingestion run
+    """
+    connection = _connection()
+    connection.execute("BEGIN")
+    try:
+        connection.executemany(
+            """
+            INSERT INTO csv_rows (document_id, row_key, fingerprint, chunk_id, run_id)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (document_id, row_key) DO UPDATE SET
+                fingerprint = excluded.fingerprint,
+                chunk_id = excluded.chunk_id,
+                run_id = excluded.run_id
+            """,
+            [(document_id, row_key, fingerprint, chunk_id, run_id)
+             for row_key, fingerprint, chunk_id in rows]
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def find_stale_rows(document_id: str, run_id: str) -> List[str]:
+    """
+    Find rows that were not seen by the current run
+    
+    Args:
+        document_id: ID of the keyed CSV dataset
+        run_id: ID of the current ingestion run
+        
+    Returns:
+        Chunk IDs of the stale rows
+    """
+    return [
+        row["chunk_id"] for row in _connection().execute(
+            "SELECT chunk_id FROM csv_rows WHERE document_id = ? AND run_id != ?",
+            (document_id, run_id)
+        )
+    ]
+
+
+def remove_stale_rows(document_id: str, run_id: str) -> int:
+    """Remove rows that were not seen by the current run"""
+    cursor = _connection().execute(
+        "DELETE FROM csv_rows WHERE document_id = ? AND run_id != ?",
+        (document_id, run_id)
+    )
+    return cursor.rowcount
+
+
+def remove_document_rows(document_id: str) -> int:
+    """Remove all rows of a deleted dataset"""
+    cursor = _connection().execute(
+        "DELETE FROM csv_rows WHERE document_id = ?", (document_id,)
+    )
+    return cursor.rowcount
+
+
+def get_document_chunk_ids(document_id: str) -> List[str]:
+    """Get the chunk IDs of every row of a dataset"""
+    return [
+        row["chunk_id"] for row in _connection().execute(
+            "SELECT chunk_id FROM csv_rows WHERE document_id = ?", (document_id,)
+        )
+    ]
+
+
+def count_document_rows(document_id: str) -> int:
+    """Count the stored rows of a dataset"""
+    return _connection().execute(
+        "SELECT COUNT(*) FROM csv_rows WHERE document_id = ?", (document_id,)
+    ).fetchone()[0]
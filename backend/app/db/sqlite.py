@@ -0,0 +1,93 @@
+"""
+SQLite metadata database connections
+"""
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from loguru import logger
+from app.core.config import settings
+
+
+_local = threading.local()
+_initialized_schemas = set()
+_schema_lock = threading.Lock()
+
+
+def get_sqlite_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Get a thread-local SQLite connection
+    
+    SQLite connections cannot be shared between threads, so each thread
+    keeps its own connection per database file.
+    
+    Args:
+        db_path: Database file path (defaults to METADATA_DB_PATH)
+        
+    Returns:
+        SQLite connection with rows returned as sqlite3.Row
+    """
+    db_path = str(db_path or settings.METADATA_DB_PATH)
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    
+    connection = connections.get(db_path)
+    if connection is None:
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connections[db_path] = connection
+        logger.debug(f"SQLite connection opened at {db_path}")
+    return connection
+
+
+def get_schema_connection(
+    schema: str,
+    db_path: Optional[str] = None,
+    migrate: Optional[Callable[[sqlite3.Connection], None]] = None
+) -> sqlite3.Connection:
+    """
+    Get a thread-local SQLite connection, creating a schema once per database
+    
+    Args:
+        schema: CREATE ... IF NOT EXISTS statements of the calling store
+        db_path: Database file path (defaults to METADATA_DB_PATH)
+        migrate: Brings tables created by older versions up to the schema,
+            run once per database after the schema
+        
+    Returns:
+        SQLite connection with rows returned as sqlite3.Row
+    """
+    db_path = str(db_path or settings.METADATA_DB_PATH)
+    connection = get_sqlite_connection(db_path)
+    key = (db_path, schema)
+    if key not in _initialized_schemas:
+        with _schema_lock:
+            if key not in _initialized_schemas:
+                connection.executescript(schema)
+                if migrate is not None:
+                    migrate(connection)
+                _initialized_schemas.add(key)
+    return connection
+
+
+def add_missing_columns(connection: sqlite3.Connection, table: str, columns: Dict[str, str]):
+    """
+    Add columns introduced after a table was first created
+    
+    CREATE TABLE IF NOT EXISTS leaves existing tables as they are, so
+    stores call this from their migrate hook.
+    
+    Args:
+        connection: SQLite connection
+        table: Table name
+        columns: Column definitions (type and constraints) by column name
+    """
+    existing = {row["name"] for row in connection.execute(f"PRAGMA table_info({table})")}
+    for name, definition in columns.items():
+        if name not in existing:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            logger.info(f"Added column {name} to {table}")
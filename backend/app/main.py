@@ -6,9 +6,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
+from app.core.clients import close_client_registry, get_client_registry
 from app.core.config import settings
 from app.api.v1.router import api_router
 from app.db.chroma import init_chroma_db
+from app.db.chroma_async import shutdown_vector_store_executors
+from app.services.ingestion_queue import get_ingestion_queue
+from app.utils.loop_lag import get_loop_lag_monitor
+from app.utils.workers import shutdown_process_pools
 from app.utils.logger import logger as app_logger
 
 
@@ -31,12 +36,28 @@ async def lifespan(app: FastAPI):
     Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
     Path(settings.CHROMA_DB_PATH).mkdir(parents=True, exist_ok=True)
     
-    app_logger.info("Application startup complete")
+    # Create the shared LLM, embedding and HTTP clients
+    get_client_registry()
+    
+    # Start background ingestion workers; query-only readers leave the
+    # job queue (and requeueing of interrupted jobs) to the writer
+    if settings.DEPLOYMENT_ROLE != "reader":
+        await get_ingestion_queue().start()
+    
+    # Measure how long blocking calls hold up the event loop
+    await get_loop_lag_monitor().start()
+    
+    app_logger.info(f"Application startup complete ({settings.DEPLOYMENT_ROLE})")
     
     yield
     
     # Shutdown
     app_logger.info("Shutting down RAG Application...")
+    await get_loop_lag_monitor().stop()
+    await get_ingestion_queue().stop()
+    shutdown_vector_store_executors()
+    close_client_registry()
+    shutdown_process_pools()
 
 
 app = FastAPI(
@@ -73,10 +94,11 @@ async def root():
 async def health_check():
     """Health check endpoint"""
     try:
-        from app.db.chroma import get_collection_count
-        count = get_collection_count()
+        from app.db.chroma_async import get_collection_count
+        count = await get_collection_count()
         return {
             "status": "healthy",
+            "role": settings.DEPLOYMENT_ROLE,
             "documents": count
         }
     except Exception as e:
@@ -2,7 +2,7 @@
 Document data models
 """
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal, Dict
 from datetime import datetime
 
 
@@ -12,7 +12,11 @@ class DocumentUploadResponse(BaseModel):
     filename: str
     document_type: str
     chunks: int
+    deduplicated: int = 0
+    unchanged: int = 0
+    deleted: int = 0
     file_path: str
+    pipeline: Optional[Dict[str, Dict[str, float]]] = None
 
 
 class DocumentInfo(BaseModel):
@@ -21,4 +25,26 @@ class DocumentInfo(BaseModel):
     filename: str
     document_type: str
     chunks: int
+    size_bytes: Optional[int] = None
     upload_date: Optional[datetime] = None
+
+
+class IngestionJobResponse(BaseModel):
+    """Response model for a queued document upload"""
+    job_id: str
+    document_id: str
+    filename: str
+    document_type: str
+    status: Literal["queued", "running", "completed", "failed"]
+
+
+class IngestionJobStatus(IngestionJobResponse):
+    """Progress and outcome of an ingestion job"""
+    rows_parsed: int = 0
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+    result: Optional[DocumentUploadResponse] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,15 +1,18 @@
 """
 Query and response models
 """
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Any, Literal
+from app.core.config import settings
 
 
 class QueryRequest(BaseModel):
     """Query request model"""
     query: str
-    n_results: int = 5
+    n_results: int = Field(5, ge=1, le=settings.MAX_N_RESULTS)
     filters: Optional[Dict[str, Any]] = None
+    search_mode: Optional[Literal["vector", "hybrid", "lexical"]] = None
+    bypass_cache: bool = False
 
 
 class QueryResponse(BaseModel):
@@ -18,3 +21,18 @@ class QueryResponse(BaseModel):
     sources: List[str]
     retrieved_chunks: List[Dict[str, Any]]
     metadata: Optional[Dict[str, Any]] = None
+
+
+class RetrievalRequest(BaseModel):
+    """Retrieval-only request model"""
+    query: str
+    n_results: int = Field(5, ge=1, le=settings.MAX_N_RESULTS)
+    filters: Optional[Dict[str, Any]] = None
+    search_mode: Optional[Literal["vector", "hybrid", "lexical"]] = None
+    bypass_cache: bool = False
+
+
+class RetrievalResponse(BaseModel):
+    """Retrieval-only response model"""
+    sources: List[str]
+    retrieved_chunks: List[Dict[str, Any]]
@@ -0,0 +1,241 @@
+"""
+Cache of complete query responses, bounded by TTL and LRU eviction
+"""
+import copy
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from loguru import logger
+from app.core.config import settings
+from app.db.sqlite import get_schema_connection
+from app.utils.metrics import register_metrics
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answer_cache (
+    cache_key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_answer_cache_last_access
+    ON answer_cache (last_access);
+CREATE INDEX IF NOT EXISTS idx_answer_cache_created_at
+    ON answer_cache (created_at);
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize case and whitespace so trivially different queries share a key"""
+    return _WHITESPACE.sub(" ", query).strip().casefold()
+
+
+def answer_cache_key(
+    query: str,
+    filters: Optional[Dict[str, Any]],
+    n_results: int,
+    search_mode: str,
+    collection_version: int
+) -> str:
+    """
+    Compute the cache key of a query
+    
+    Args:
+        query: User query string
+        filters: Metadata filters
+        n_results: Number of results to retrieve
+        search_mode: Retrieval mode
+        collection_version: Current collection version, so writes invalidate entries
+        
+    Returns:
+        Hex digest identifying the query
+    """
+    payload = json.dumps(
+        [normalize_query(query), filters or {}, n_results, search_mode, collection_version],
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Base class of answer caches, counting hits and misses"""
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl_seconds = settings.ANSWER_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response
+        
+        Args:
+            key: Key from answer_cache_key
+            
+        Returns:
+            A copy of the cached response, or None if absent or expired
+        """
+        response = self._get(key)
+        with self._lock:
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return response
+    
+    def put(self, key: str, response: Dict[str, Any]):
+        """Cache a response"""
+        raise NotImplementedError
+    
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+    
+    def count(self) -> int:
+        """Get the number of cached responses"""
+        raise NotImplementedError
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return hit, miss and eviction counters"""
+        entries = self.count()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries
+            }
+
+
+class MemoryAnswerCache(AnswerCache):
+    """Per-process answer cache"""
+    
+    backend = "memory"
+    
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        super().__init__(max_entries, ttl_seconds)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+    
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, response = entry
+            if time.time() - created_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(response)
+    
+    def put(self, key: str, response: Dict[str, Any]):
+        response = copy.deepcopy(response)
+        with self._lock:
+            self._entries[key] = (time.time(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def count(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteAnswerCache(AnswerCache):
+    """Answer cache in a SQLite file, shared by every worker process on the host"""
+    
+    backend = "sqlite"
+    
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        super().__init__(max_entries, ttl_seconds)
+        self.db_path = str(db_path or settings.ANSWER_CACHE_PATH)
+    
+    def _connection(self):
+        """Get the cache database connection"""
+        return get_schema_connection(_SCHEMA, self.db_path)
+    
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT response, created_at FROM answer_cache WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row["created_at"] > self.ttl_seconds:
+            connection.execute("DELETE FROM answer_cache WHERE cache_key = ?", (key,))
+            return None
+        connection.execute(
+            "UPDATE answer_cache SET last_access = ? WHERE cache_key = ?", (now, key)
+        )
+        return json.loads(row["response"])
+    
+    def put(self, key: str, response: Dict[str, Any]):
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO answer_cache (cache_key, response, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response, default=str), now, now)
+            )
+            # Expired entries go first, then the least recently used ones
+            connection.execute(
+                "DELETE FROM answer_cache WHERE created_at < ?", (now - self.ttl_seconds,)
+            )
+            cursor = connection.execute(
+                "DELETE FROM answer_cache WHERE cache_key IN ("
+                "SELECT cache_key FROM answer_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            evicted = cursor.rowcount
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        if evicted > 0:
+            with self._lock:
+                self.evictions += evicted
+    
+    def count(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM answer_cache").fetchone()[0]
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> AnswerCache:
+    """Get the answer cache of the configured backend"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                if settings.ANSWER_CACHE_BACKEND == "sqlite":
+                    _cache = SQLiteAnswerCache()
+                elif settings.ANSWER_CACHE_BACKEND == "memory":
+                    _cache = MemoryAnswerCache()
+                else:
+                    raise ValueError(f"Unsupported answer cache backend: {settings.ANSWER_CACHE_BACKEND}")
+                register_metrics("answer_cache", _cache.stats)
+                logger.info(f"Answer cache initialized ({_cache.backend})")
+    return _cache
@@ -1,27 +1,172 @@
 """
 Text chunking service for document processing
 """
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from bisect import bisect_right
+from collections import deque
+from typing import Callable, List, Optional, Tuple
 from loguru import logger
 from app.core.config import settings
+from app.utils.tokens import get_encoding
+
+
+Span = Tuple[int, int]
+
+# Same separator hierarchy as LangChain's RecursiveCharacterTextSplitter
+DEFAULT_SEPARATORS = ["\n\n", "\n", " ", ""]
 
 
 class ChunkingService:
-    """Service for chunking text documents"""
+    """
+    Service for chunking text documents
+    
+    Chunks are computed as (start, end) spans over the source text, so no
+    text is copied until a chunk is actually needed. Boundaries follow
+    LangChain's RecursiveCharacterTextSplitter with its default separators,
+    keep_separator=True and strip_whitespace=True.
+    """
     
     def __init__(
         self,
         chunk_size: int = None,
-        chunk_overlap: int = None
+        chunk_overlap: int = None,
+        length_unit: str = None
     ):
         self.chunk_size = chunk_size or settings.CHUNK_SIZE
         self.chunk_overlap = chunk_overlap or settings.CHUNK_OVERLAP
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            length_function=len
-        )
+        self.length_unit = length_unit or settings.CHUNK_LENGTH_UNIT
+        self.separators = DEFAULT_SEPARATORS
+        
+        if self.chunk_overlap > self.chunk_size:
+            raise ValueError(
+                f"Chunk overlap ({self.chunk_overlap}) is larger than chunk size ({self.chunk_size})"
+            )
+        if self.length_unit not in ("chars", "tokens"):
+            raise ValueError(f"Unsupported chunk length unit: {self.length_unit}")
+    
+    def _length_function(self, text: str) -> Callable[[int, int], int]:
+        """Build the span length function for the configured unit"""
+        if self.length_unit == "chars":
+            return lambda start, end: end - start
+        
+        encoding = get_encoding(settings.OPENAI_EMBEDDING_MODEL)
+        return lambda start, end: len(encoding.encode(text[start:end], disallowed_special=()))
+    
+    def chunk_spans(self, text: str) -> List[Span]:
+        """
+        Split text into chunk spans
+        
+        Args:
+            text: Input text to chunk
+            
+        Returns:
+            List of (start, end) offsets of each chunk in text
+        """
+        length = self._length_function(text)
+        return self._split_spans(text, 0, len(text), self.separators, length)
+    
+    def _split_spans(
+        self,
+        text: str,
+        start: int,
+        end: int,
+        separators: List[str],
+        length: Callable[[int, int], int]
+    ) -> List[Span]:
+        """Recursively split text[start:end] on the first separator it contains"""
+        separator = separators[-1]
+        next_separators = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if text.find(candidate, start, end) != -1:
+                separator = candidate
+                next_separators = separators[i + 1:]
+                break
+        
+        chunks = []
+        good_splits = []
+        for split_start, split_end in self._split_on(text, start, end, separator):
+            split_length = length(split_start, split_end)
+            if split_length < self.chunk_size:
+                good_splits.append((split_start, split_end, split_length))
+                continue
+            
+            if good_splits:
+                chunks.extend(self._merge_splits(text, good_splits, length))
+                good_splits = []
+            if not next_separators:
+                chunks.append((split_start, split_end))
+            else:
+                chunks.extend(
+                    self._split_spans(text, split_start, split_end, next_separators, length)
+                )
+        
+        if good_splits:
+            chunks.extend(self._merge_splits(text, good_splits, length))
+        return chunks
+    
+    @staticmethod
+    def _split_on(text: str, start: int, end: int, separator: str) -> List[Span]:
+        """
+        Split text[start:end] before each occurrence of separator
+        
+        Each separator stays attached to the start of the following split.
+        """
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+        
+        bounds = [start]
+        position = text.find(separator, start, end)
+        while position != -1:
+            bounds.append(position)
+            position = text.find(separator, position + len(separator), end)
+        bounds.append(end)
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+    
+    def _merge_splits(
+        self,
+        text: str,
+        splits: List[Tuple[int, int, int]],
+        length: Callable[[int, int], int]
+    ) -> List[Span]:
+        """Merge adjacent splits into chunks of up to chunk_size with overlap"""
+        chunks = []
+        current = deque()
+        total = 0
+        for split_start, split_end, split_length in splits:
+            if total + split_length > self.chunk_size:
+                if total > self.chunk_size:
+                    logger.warning(
+                        f"Created a chunk of size {total}, "
+                        f"which is longer than the specified {self.chunk_size}"
+                    )
+                if current:
+                    chunk = self._strip_span(text, current[0][0], current[-1][1])
+                    if chunk is not None:
+                        chunks.append(chunk)
+                    # Drop splits from the front until only the overlap remains
+                    while total > self.chunk_overlap or (
+                        total + split_length > self.chunk_size and total > 0
+                    ):
+                        total -= current.popleft()[2]
+            current.append((split_start, split_end, split_length))
+            total += split_length
+        
+        if current:
+            chunk = self._strip_span(text, current[0][0], current[-1][1])
+            if chunk is not None:
+                chunks.append(chunk)
+        return chunks
+    
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+        """Trim surrounding whitespace from a span, None if nothing is left"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return (start, end) if end > start else None
     
     def chunk_text(self, text: str) -> List[str]:
         """
@@ -34,7 +179,7 @@ class ChunkingService:
             List of text chunks
         """
         try:
-            chunks = self.text_splitter.split_text(text)
+            chunks = [text[start:end] for start, end in self.chunk_spans(text)]
             logger.info(f"Created {len(chunks)} chunks from text")
             return chunks
         except Exception as e:
@@ -53,6 +198,34 @@ class ChunkingService:
         """
         all_chunks = []
         for doc in documents:
-            chunks = self.chunk_text(doc)
-            all_chunks.extend(chunks)
+            all_chunks.extend(doc[start:end] for start, end in self.chunk_spans(doc))
         return all_chunks
+    
+    def chunk_pages(self, pages: List[str]) -> List[Tuple[str, int, int]]:
+        """
+        Split page texts into chunks, tracking the pages each chunk spans
+        
+        Pages are joined once and chunked as a single text, so chunk
+        boundaries match chunk_text on the full document.
+        
+        Args:
+            pages: Text of each page, in page order
+            
+        Returns:
+            List of (chunk, first page, last page) with 1-based page numbers
+        """
+        page_offsets = []
+        offset = 0
+        for page in pages:
+            page_offsets.append(offset)
+            offset += len(page) + 1
+        text = "".join(f"{page}\n" for page in pages)
+        
+        return [
+            (
+                text[start:end],
+                bisect_right(page_offsets, start),
+                bisect_right(page_offsets, end - 1)
+            )
+            for start, end in self.chunk_spans(text)
+        ]
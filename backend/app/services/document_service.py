@@ -1,16 +1,101 @@
 """
 Document processing service - handles PDF and CSV uploads
 """
+import os
+import threading
 import uuid
+from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from datetime import datetime
 from loguru import logger
 from app.core.config import settings
-from app.utils.parsers import parse_pdf, parse_csv, get_file_type
+from app.utils.parsers import CsvRows, parse_pdf_pages, iter_csv_rows, get_file_type
 from app.services.chunking_service import ChunkingService
 from app.services.embedding_service import EmbeddingService
-from app.db.chroma import add_documents
+from app.services.ingestion_pipeline import ChunkBatch, IngestionPipeline
+from app.db.chroma import add_documents, upsert_documents, delete_documents, update_metadatas
+from app.db.chunk_index import (
+    hash_chunk,
+    find_existing_chunks,
+    register_chunks,
+    add_chunk_refs,
+    get_owned_chunk_ids,
+    find_shared_chunks,
+    remove_document_chunks
+)
+from app.db.document_registry import (
+    register_document,
+    add_document_chunks,
+    set_document_chunks,
+    set_document_total_chunks,
+    get_document,
+    list_documents as list_registered_documents,
+    remove_document
+)
+from app.db.facets import register_facet_values
+from app.db.row_index import (
+    get_fingerprints,
+    touch_rows,
+    upsert_rows,
+    find_stale_rows,
+    remove_stale_rows,
+    remove_document_rows,
+    get_document_chunk_ids,
+    count_document_rows
+)
+
+# Chroma deletes are sent in batches of this many IDs
+_DELETE_BATCH_SIZE = 1000
+
+
+def keyed_document_id(filename: str) -> str:
+    """Stable document ID of a keyed CSV dataset, derived from its filename"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"csv-dataset:{filename}"))
+
+
+class IngestionProgress:
+    """Running ingestion counters, reported to an optional callback"""
+    
+    def __init__(self, callback: Optional[Callable[[Dict[str, int]], None]] = None):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self.rows_parsed = 0
+        self.chunks_deduplicated = 0
+        self.chunks_embedded = 0
+        self.chunks_stored = 0
+        self.rows_unchanged = 0
+        self.rows_deleted = 0
+        self.rows_committed = 0
+    
+    def add(self, **counts: int):
+        """Increment counters and report the new totals"""
+        with self._lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+            totals = self.as_dict()
+        if self.callback:
+            self.callback(totals)
+    
+    def commit_through(self, chunk_index: int):
+        """Record that every CSV row up to chunk_index has been handled"""
+        with self._lock:
+            self.rows_committed = max(self.rows_committed, chunk_index + 1)
+            totals = self.as_dict()
+        if self.callback:
+            self.callback(totals)
+    
+    def as_dict(self) -> Dict[str, int]:
+        """Return the current counters"""
+        return {
+            "rows_parsed": self.rows_parsed,
+            "chunks_deduplicated": self.chunks_deduplicated,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_stored": self.chunks_stored,
+            "rows_unchanged": self.rows_unchanged,
+            "rows_deleted": self.rows_deleted,
+            "rows_committed": self.rows_committed
+        }
 
 
 class DocumentService:
@@ -22,19 +107,58 @@ class DocumentService:
         self.upload_dir = Path(settings.UPLOAD_DIR)
         self.upload_dir.mkdir(parents=True, exist_ok=True)
     
-    async def process_document(
+    def store_upload(
         self,
-        content: bytes,
+        temp_path: Path,
         filename: str,
-        document_type: Optional[str] = None
+        document_id: Optional[str] = None
+    ) -> Tuple[str, Path]:
+        """
+        Assign a document ID and move a spooled upload into the upload directory
+        
+        Args:
+            temp_path: Spooled upload file, on the same filesystem as UPLOAD_DIR
+            filename: Original filename
+            document_id: ID to store the file under, a new ID if None
+            
+        Returns:
+            Tuple of (document_id, saved file path)
+        """
+        document_id = document_id or str(uuid.uuid4())
+        file_path = self.upload_dir / f"{document_id}_{filename}"
+        os.replace(temp_path, file_path)
+        return document_id, file_path
+    
+    def ingest_file(
+        self,
+        file_path: Path,
+        filename: str,
+        document_id: str,
+        document_type: Optional[str] = None,
+        progress: Optional[Callable[[Dict[str, int]], None]] = None,
+        key_column: Optional[str] = None,
+        start_row: int = 0
     ) -> Dict:
         """
-        Process and store a document (PDF or CSV)
+        Parse, chunk, embed and store a saved document
+        
+        With a key_column, a CSV is ingested incrementally: rows are
+        fingerprinted and only new or changed rows are embedded and
+        upserted, while rows missing from the file are deleted. Callers
+        should use keyed_document_id so every version of a dataset shares
+        one document ID.
         
         Args:
-            content: File content as bytes
+            file_path: Path of the saved document
             filename: Original filename
+            document_id: ID assigned to the document
             document_type: Document type (pdf/csv), auto-detected if None
+            progress: Optional callback receiving rows_parsed,
+                chunks_deduplicated, chunks_embedded and chunks_stored totals
+                as ingestion advances
+            key_column: Primary-key column for incremental CSV ingestion
+            start_row: CSV row to resume from, skipping rows stored by an
+                interrupted run (rows_committed reports how far a run got)
             
         Returns:
             Dictionary with processing results
@@ -47,56 +171,65 @@ class DocumentService:
             if document_type not in settings.ALLOWED_EXTENSIONS:
                 raise ValueError(f"Unsupported file type: {document_type}")
             
-            # Generate document ID
-            document_id = str(uuid.uuid4())
+            if key_column and document_type != "csv":
+                raise ValueError("A key column is only supported for CSV files")
+            if start_row and (document_type != "csv" or key_column):
+                # Keyed CSVs must be read in full to detect deleted rows
+                raise ValueError("start_row is only supported for non-keyed CSV files")
+            
+            upload_date = datetime.now().isoformat()
+            run_id = str(uuid.uuid4())
+            counters = IngestionProgress(progress)
+            register_document(
+                document_id,
+                filename,
+                document_type,
+                size_bytes=Path(file_path).stat().st_size,
+                upload_date=upload_date,
+                keyed=bool(key_column)
+            )
             
-            # Parse document based on type
+            # Parse, chunk, embed and store as concurrent pipeline stages
             if document_type == "pdf":
-                text = parse_pdf(content)
-                documents = [text]
+                source = self._parse_pdf(file_path, counters)
+                chunk_stage = lambda pages: self._chunk_pdf_pages(pages, document_id)
+            elif document_type == "csv" and key_column:
+                source = self._parse_keyed_csv(file_path, key_column, counters)
+                chunk_stage = self._chunk_csv_rows()
             elif document_type == "csv":
-                documents = parse_csv(content)
+                source = self._parse_csv(file_path, counters, start_row)
+                chunk_stage = self._chunk_csv_rows(start_row)
             else:
                 raise ValueError(f"Unsupported document type: {document_type}")
             
-            # Chunk documents
-            if document_type == "pdf":
-                chunks = self.chunking_service.chunk_text(documents[0])
-            else:
-                # CSV rows are already chunked
-                chunks = documents
+            def store_stage(batch: ChunkBatch) -> List[ChunkBatch]:
+                self._store_batch(batch, document_id, document_type, run_id)
+                counters.add(chunks_stored=len(batch))
+                if not key_column:
+                    add_document_chunks(document_id, len(batch), batch.chunk_indexes[-1] + 1)
+                if document_type == "csv":
+                    counters.commit_through(batch.chunk_indexes[-1])
+                return []
             
-            # Generate embeddings
-            embeddings = self.embedding_service.generate_embeddings(chunks)
+            stages = [("chunk", chunk_stage)]
+            if key_column:
+                stages.append(("diff", self._diff_stage(document_id, run_id, counters)))
+            elif settings.DEDUPLICATE_CHUNKS:
+                stages.append(("dedup", self._deduplicate_stage(document_id, counters)))
+            stages += [
+                ("embed", lambda batch: self._embed_batch(batch, counters)),
+                ("store", store_stage)
+            ]
+            pipeline = IngestionPipeline(source_name="parse", stages=stages)
+            pipeline_stats = pipeline.run(source)
+            total_chunks = counters.chunks_stored
             
-            # Prepare metadata for each chunk
-            metadatas = []
-            ids = []
-            for i, chunk in enumerate(chunks):
-                metadatas.append({
-                    "source": filename,
-                    "document_id": document_id,
-                    "document_type": document_type,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "upload_date": datetime.now().isoformat()
-                })
-                ids.append(f"{document_id}_{i}")
-            
-            # Store in ChromaDB
-            add_documents(
-                documents=chunks,
-                embeddings=embeddings,
-                metadatas=metadatas,
-                ids=ids
-            )
-            
-            # Save original file
-            file_path = self.upload_dir / f"{document_id}_{filename}"
-            file_path.write_bytes(content)
+            if key_column:
+                self._delete_stale_rows(document_id, run_id, counters)
+                set_document_chunks(document_id, count_document_rows(document_id))
             
             logger.info(
-                f"Processed document {filename}: {len(chunks)} chunks, "
+                f"Processed document {filename}: {total_chunks} chunks, "
                 f"document_id: {document_id}"
             )
             
@@ -104,16 +237,308 @@ class DocumentService:
                 "document_id": document_id,
                 "filename": filename,
                 "document_type": document_type,
-                "chunks": len(chunks),
-                "file_path": str(file_path)
+                "chunks": total_chunks,
+                "deduplicated": counters.chunks_deduplicated,
+                "unchanged": counters.rows_unchanged,
+                "deleted": counters.rows_deleted,
+                "file_path": str(file_path),
+                "pipeline": pipeline_stats
             }
         
         except Exception as e:
             logger.error(f"Error processing document {filename}: {e}")
             raise
     
-    def list_documents(self) -> List[Dict]:
-        """List all processed documents"""
-        # This would typically query a metadata store
-        # For now, return empty list - can be enhanced with a metadata database
-        return []
+    def _parse_pdf(self, file_path: Path, counters: IngestionProgress) -> Iterator[List[str]]:
+        """Parse stage for PDFs - yields the text of all pages at once"""
+        pages = parse_pdf_pages(Path(file_path))
+        counters.add(rows_parsed=len(pages))
+        yield pages
+    
+    def _parse_csv(
+        self,
+        file_path: Path,
+        counters: IngestionProgress,
+        start_row: int = 0
+    ) -> Iterator[CsvRows]:
+        """Parse stage for CSVs - yields batches of row texts with their typed metadata"""
+        for rows in iter_csv_rows(
+            file_path,
+            skip_rows=start_row,
+            metadata_columns=settings.CSV_METADATA_COLUMNS
+        ):
+            counters.add(rows_parsed=len(rows))
+            yield rows
+    
+    def _parse_keyed_csv(
+        self,
+        file_path: Path,
+        key_column: str,
+        counters: IngestionProgress
+    ) -> Iterator[CsvRows]:
+        """Parse stage for keyed CSVs - yields batches of keyed row texts with their typed metadata"""
+        for rows in iter_csv_rows(
+            file_path,
+            key_column=key_column,
+            metadata_columns=settings.CSV_METADATA_COLUMNS
+        ):
+            counters.add(rows_parsed=len(rows))
+            yield rows
+    
+    def _chunk_pdf_pages(self, pages: List[str], document_id: str) -> Iterator[ChunkBatch]:
+        """
+        Chunk stage for PDFs - chunks pages and splits them into embedding batches
+        
+        The document's chunk total is recorded before deduplication can drop any.
+        """
+        page_chunks = self.chunking_service.chunk_pages(pages)
+        set_document_total_chunks(document_id, len(page_chunks))
+        batch_size = self.embedding_service.pipeline_batch_size
+        for start in range(0, len(page_chunks), batch_size):
+            batch = page_chunks[start:start + batch_size]
+            yield ChunkBatch(
+                chunk_indexes=list(range(start, start + len(batch))),
+                chunks=[chunk for chunk, _, _ in batch],
+                extra_metadatas=[
+                    {"page_start": page_start, "page_end": page_end}
+                    for _, page_start, page_end in batch
+                ]
+            )
+    
+    def _chunk_csv_rows(self, start_row: int = 0) -> Callable[[CsvRows], Iterator[ChunkBatch]]:
+        """
+        Chunk stage for CSVs - rows are already chunks, only batch and number them
+        
+        Row keys of keyed CSVs and typed row metadata are carried along.
+        """
+        next_index = start_row
+        batch_size = self.embedding_service.pipeline_batch_size
+        
+        def chunk_rows(rows: CsvRows) -> Iterator[ChunkBatch]:
+            nonlocal next_index
+            for start in range(0, len(rows), batch_size):
+                end = start + batch_size
+                batch = rows.texts[start:end]
+                yield ChunkBatch(
+                    chunk_indexes=list(range(next_index, next_index + len(batch))),
+                    chunks=batch,
+                    extra_metadatas=rows.metadatas[start:end] if rows.metadatas else None,
+                    row_keys=rows.keys[start:end] if rows.keys else None
+                )
+                next_index += len(batch)
+        
+        return chunk_rows
+    
+    def _deduplicate_stage(
+        self,
+        document_id: str,
+        counters: IngestionProgress
+    ) -> Callable[[ChunkBatch], Iterator[ChunkBatch]]:
+        """
+        Dedup stage - drops chunks whose content is already stored
+        
+        Chunks repeated within the current document are dropped as well.
+        The document is recorded as reusing chunks stored by other
+        documents, so deleting those documents keeps the chunks.
+        """
+        seen = set()
+        
+        def deduplicate(batch: ChunkBatch) -> Iterator[ChunkBatch]:
+            batch.content_hashes = [hash_chunk(chunk) for chunk in batch.chunks]
+            existing = find_existing_chunks(batch.content_hashes)
+            keep = []
+            for position, content_hash in enumerate(batch.content_hashes):
+                if content_hash not in existing and content_hash not in seen:
+                    seen.add(content_hash)
+                    keep.append(position)
+            
+            reused = [content_hash for content_hash in batch.content_hashes if content_hash in existing]
+            if reused:
+                add_chunk_refs(document_id, reused)
+            if len(keep) < len(batch):
+                counters.add(chunks_deduplicated=len(batch) - len(keep))
+            if keep:
+                yield batch.select(keep) if len(keep) < len(batch) else batch
+        
+        return deduplicate
+    
+    def _diff_stage(
+        self,
+        document_id: str,
+        run_id: str,
+        counters: IngestionProgress
+    ) -> Callable[[ChunkBatch], Iterator[ChunkBatch]]:
+        """
+        Diff stage for keyed CSVs - drops rows whose fingerprint is unchanged
+        
+        Unchanged rows are marked as seen by this run so they are not
+        treated as deleted. Repeated keys keep their first row.
+        """
+        seen_keys = set()
+        
+        def diff(batch: ChunkBatch) -> Iterator[ChunkBatch]:
+            batch.content_hashes = [hash_chunk(chunk) for chunk in batch.chunks]
+            stored = get_fingerprints(document_id, batch.row_keys)
+            keep = []
+            unchanged = []
+            for position, (row_key, fingerprint) in enumerate(
+                zip(batch.row_keys, batch.content_hashes)
+            ):
+                if row_key in seen_keys:
+                    logger.warning(f"Duplicate key '{row_key}' in keyed CSV, keeping first row")
+                    continue
+                seen_keys.add(row_key)
+                if stored.get(row_key) == fingerprint:
+                    unchanged.append(row_key)
+                else:
+                    keep.append(position)
+            
+            if unchanged:
+                touch_rows(document_id, unchanged, run_id)
+                counters.add(rows_unchanged=len(unchanged))
+            if keep:
+                yield batch.select(keep) if len(keep) < len(batch) else batch
+        
+        return diff
+    
+    def _delete_stale_rows(self, document_id: str, run_id: str, counters: IngestionProgress):
+        """Delete rows of a keyed CSV that are missing from the current file"""
+        stale_ids = find_stale_rows(document_id, run_id)
+        for start in range(0, len(stale_ids), _DELETE_BATCH_SIZE):
+            delete_documents(ids=stale_ids[start:start + _DELETE_BATCH_SIZE])
+        remove_stale_rows(document_id, run_id)
+        if stale_ids:
+            counters.add(rows_deleted=len(stale_ids))
+    
+    def _embed_batch(self, batch: ChunkBatch, counters: IngestionProgress) -> List[ChunkBatch]:
+        """Embed stage - generates embeddings for a batch of chunks"""
+        batch.embeddings = self.embedding_service.generate_embeddings(batch.chunks)
+        counters.add(chunks_embedded=len(batch.embeddings))
+        return [batch]
+    
+    def _register_facets(self, batch: ChunkBatch):
+        """Record the categorical metadata values of a CSV batch for query filter recognition"""
+        if not batch.extra_metadatas:
+            return
+        text_attributes = [
+            name for name, kind in settings.CSV_METADATA_COLUMNS.items() if kind == "text"
+        ]
+        register_facet_values(
+            (attribute, metadata[attribute])
+            for metadata in batch.extra_metadatas
+            for attribute in text_attributes
+            if attribute in metadata
+        )
+    
+    def _store_batch(
+        self,
+        batch: ChunkBatch,
+        document_id: str,
+        document_type: str,
+        run_id: str
+    ):
+        """
+        Store an embedded batch of chunks in ChromaDB
+        
+        Chunk metadata only holds what filters need: the document ID, the
+        chunk index and the chunk's own fields (PDF pages, typed CSV
+        columns). The filename, type and upload date live in the document
+        registry and are joined back onto search results. Rows of keyed
+        CSVs are upserted under IDs derived from their key.
+        
+        Args:
+            batch: Embedded chunk batch
+            document_id: ID of the document the chunks belong to
+            document_type: Document type (pdf/csv)
+            run_id: ID of the current ingestion run
+        """
+        metadatas = []
+        ids = []
+        for offset, i in enumerate(batch.chunk_indexes):
+            metadata = {"document_id": document_id, "chunk_index": i}
+            if batch.extra_metadatas:
+                metadata.update(batch.extra_metadatas[offset])
+            if batch.row_keys:
+                ids.append(f"{document_id}_{batch.row_keys[offset]}")
+            else:
+                ids.append(f"{document_id}_{i}")
+            metadatas.append(metadata)
+        
+        if document_type == "csv":
+            self._register_facets(batch)
+        
+        if batch.row_keys:
+            upsert_documents(
+                documents=batch.chunks,
+                embeddings=batch.embeddings,
+                metadatas=metadatas,
+                ids=ids
+            )
+            upsert_rows(document_id, zip(batch.row_keys, batch.content_hashes, ids), run_id)
+            return
+        
+        add_documents(
+            documents=batch.chunks,
+            embeddings=batch.embeddings,
+            metadatas=metadatas,
+            ids=ids
+        )
+        
+        if batch.content_hashes:
+            register_chunks(zip(batch.content_hashes, ids, [document_id] * len(ids)))
+    
+    def list_documents(self, limit: int = 100, offset: int = 0) -> List[Dict]:
+        """
+        List processed documents from the document registry, newest first
+        
+        Args:
+            limit: Maximum number of documents
+            offset: Documents to skip
+            
+        Returns:
+            Document records
+        """
+        return list_registered_documents(limit=limit, offset=offset)
+    
+    def delete_document(self, document_id: str):
+        """
+        Delete a document's chunks and index entries
+        
+        Chunk IDs come from the document registry (or the row index of keyed
+        CSVs), so ChromaDB deletes by ID in batches instead of scanning
+        metadata. Documents ingested before the registry existed fall back
+        to a metadata filter.
+        
+        Chunks that other documents reuse through deduplication are kept
+        and handed to one of those documents instead of being deleted.
+        
+        Args:
+            document_id: ID of the document to delete
+        """
+        inherited = find_shared_chunks(document_id)
+        if inherited:
+            chunk_ids = list(inherited)
+            update_metadatas(chunk_ids, [{"document_id": inherited[chunk_id]} for chunk_id in chunk_ids])
+            for heir, chunks in Counter(inherited.values()).items():
+                add_document_chunks(heir, chunks, 0)
+        
+        document = get_document(document_id)
+        if document is None:
+            delete_documents(where={"document_id": document_id})
+        else:
+            if document["keyed"]:
+                chunk_ids = get_document_chunk_ids(document_id)
+            else:
+                chunk_ids = [f"{document_id}_{i}" for i in range(document["chunk_index_end"])]
+            # Chunks inherited from deleted documents keep their original IDs
+            chunk_ids += [
+                chunk_id for chunk_id in get_owned_chunk_ids(document_id)
+                if not chunk_id.startswith(f"{document_id}_")
+            ]
+            chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id not in inherited]
+            for start in range(0, len(chunk_ids), _DELETE_BATCH_SIZE):
+                delete_documents(ids=chunk_ids[start:start + _DELETE_BATCH_SIZE])
+        
+        remove_document_chunks(document_id, inherited)
+        remove_document_rows(document_id)
+        remove_document(document_id)
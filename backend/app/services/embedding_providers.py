@@ -0,0 +1,203 @@
+"""
+Embedding providers - OpenAI API and local CPU model backends
+"""
+import asyncio
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+from loguru import logger
+from app.core.config import settings
+from app.utils.tokens import count_tokens
+from app.utils.workers import resolve_worker_count
+
+
+class EmbeddingProvider:
+    """Interface of an embedding backend"""
+    
+    model_id: str = ""
+    # Tokens allowed per embedding request, None when requests are not token-limited
+    max_batch_tokens: Optional[int] = None
+    
+    @property
+    def cache_key(self) -> str:
+        """Model name the embedding cache files this provider's vectors under"""
+        return self.model_id
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Count the tokens of each text with the provider's tokenizer"""
+        raise NotImplementedError
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts"""
+        raise NotImplementedError
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of texts without blocking the event loop"""
+        return await asyncio.to_thread(self.embed_documents, texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        return self.embed_documents([text])[0]
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """Embeddings from the OpenAI API"""
+    
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        http_client: Any = None,
+        http_async_client: Any = None
+    ):
+        from langchain_openai import OpenAIEmbeddings
+        
+        model = model or settings.OPENAI_EMBEDDING_MODEL
+        self.model = model
+        self.model_id = f"openai:{model}"
+        self.max_batch_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.client = OpenAIEmbeddings(
+            model=model,
+            openai_api_key=settings.OPENAI_API_KEY,
+            http_client=http_client,
+            http_async_client=http_async_client
+        )
+    
+    @property
+    def cache_key(self) -> str:
+        # Cached vectors written before providers existed are keyed by the bare model name
+        return self.model
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        return count_tokens(texts, self.model)
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed_documents(texts)
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.client.aembed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed_query(text)
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """
+    Embeddings from a sentence-transformers style ONNX model run on the CPU
+    
+    The model directory must contain model.onnx (or onnx/model.onnx) and
+    tokenizer.json. Token embeddings are mean-pooled over the attention
+    mask and L2-normalized, as sentence-transformers does. Requests are
+    batched by EMBEDDING_LOCAL_BATCH_SIZE only; long texts are truncated
+    to EMBEDDING_LOCAL_MAX_LENGTH tokens instead of counting against a
+    per-request token limit.
+    """
+    
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        threads: Optional[int] = None,
+        max_length: Optional[int] = None
+    ):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The local embedding provider requires onnxruntime and tokenizers"
+            ) from e
+        
+        model_dir = Path(model_path or settings.EMBEDDING_LOCAL_MODEL_PATH)
+        onnx_path = model_dir / "model.onnx"
+        if not onnx_path.exists():
+            onnx_path = model_dir / "onnx" / "model.onnx"
+        if not onnx_path.exists():
+            raise FileNotFoundError(f"No model.onnx found in {model_dir}")
+        
+        self.model_id = f"local:{model_dir.resolve().name}"
+        self.batch_size = batch_size or settings.EMBEDDING_LOCAL_BATCH_SIZE
+        max_length = max_length or settings.EMBEDDING_LOCAL_MAX_LENGTH
+        
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = resolve_worker_count(
+            threads if threads is not None else settings.EMBEDDING_LOCAL_THREADS
+        )
+        options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(
+            str(onnx_path), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        # The session already uses every intra-op thread, so run one batch at a time
+        self._lock = threading.Lock()
+        logger.info(
+            f"Local embedding model loaded from {onnx_path} "
+            f"({options.intra_op_num_threads} threads)"
+        )
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        
+        # Batch texts of similar length together to minimize padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            positions = order[start:start + self.batch_size]
+            batch_vectors = self._embed_batch([texts[i] for i in positions])
+            for position, vector in zip(positions, batch_vectors):
+                vectors[position] = vector.tolist()
+        return vectors
+    
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        """Run the model on one batch and pool the token embeddings"""
+        encodings = self.tokenizer.encode_batch(texts)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs: Dict[str, np.ndarray] = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": attention_mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+        }
+        inputs = {name: value for name, value in inputs.items() if name in self.input_names}
+        
+        with self._lock:
+            output = self.session.run(None, inputs)[0]
+        
+        if output.ndim == 3:
+            mask = attention_mask[:, :, None].astype(output.dtype)
+            output = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return (output / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+_providers: Dict[str, EmbeddingProvider] = {}
+_providers_lock = threading.Lock()
+
+
+def get_embedding_provider(name: Optional[str] = None) -> EmbeddingProvider:
+    """
+    Get the shared embedding provider
+    
+    Args:
+        name: Provider name, "openai" or "local" (defaults to EMBEDDING_PROVIDER)
+        
+    Returns:
+        Embedding provider, created once per name
+    """
+    name = name or settings.EMBEDDING_PROVIDER
+    with _providers_lock:
+        provider = _providers.get(name)
+        if provider is None:
+            if name == "openai":
+                provider = OpenAIEmbeddingProvider()
+            elif name == "local":
+                provider = LocalEmbeddingProvider()
+            else:
+                raise ValueError(f"Unsupported embedding provider: {name}")
+            _providers[name] = provider
+        return provider
@@ -1,49 +1,190 @@
 """
 Embedding generation service
 """
-from typing import List
-from langchain_openai import OpenAIEmbeddings
+import asyncio
+import time
+from typing import List, Optional, Tuple
 from loguru import logger
 from app.core.config import settings
+from app.db.embedding_cache import EmbeddingCache, get_embedding_cache, hash_text
+from app.services.embedding_providers import EmbeddingProvider, get_embedding_provider
+from app.services.query_batcher import get_query_batcher
+from app.utils.metrics import ThroughputCounter, register_metrics
+from app.utils.workers import run_coroutine
+
+
+_request_counter = ThroughputCounter()
+_retry_count = 0
+
+
+def get_request_totals() -> dict:
+    """Get process-wide embedding request totals"""
+    return {**_request_counter.snapshot(), "retries": _retry_count}
+
+
+register_metrics("embedding_requests", get_request_totals)
 
 
 class EmbeddingService:
     """Service for generating document embeddings"""
     
-    def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            model=settings.OPENAI_EMBEDDING_MODEL,
-            openai_api_key=settings.OPENAI_API_KEY
-        )
+    def __init__(
+        self,
+        provider: Optional[EmbeddingProvider] = None,
+        cache: Optional[EmbeddingCache] = None
+    ):
+        self.embeddings = provider or get_embedding_provider()
+        self.model = self.embeddings.cache_key
         self.batch_size = settings.EMBEDDING_BATCH_SIZE
+        self.max_concurrency = settings.EMBEDDING_CONCURRENCY
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES
+        if cache is None and settings.EMBEDDING_CACHE_ENABLED:
+            cache = get_embedding_cache()
+        self.cache = cache
+    
+    @property
+    def pipeline_batch_size(self) -> int:
+        """Texts per ingestion pipeline batch, enough to fill every request slot"""
+        return self.batch_size * self.max_concurrency
     
     def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for a list of texts
         
+        Runs agenerate_embeddings on the shared background event loop, so it
+        must not be called from async code; await agenerate_embeddings there.
+        
         Args:
             texts: List of text strings to embed
             
         Returns:
             List of embedding vectors
         """
+        return run_coroutine(self.agenerate_embeddings(texts))
+    
+    async def agenerate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for a list of texts with concurrent requests
+        
+        Texts found in the embedding cache are not sent to the provider,
+        and repeated texts within the list are embedded once. The remaining
+        texts are split into batches bounded by EMBEDDING_BATCH_SIZE texts
+        and the provider's token limit per request, and up to
+        EMBEDDING_CONCURRENCY batches are in flight at once. A failed
+        batch is retried on its own without resending the others; if it
+        still fails, the batches that succeeded are cached before the
+        error is raised.
+        
+        Args:
+            texts: List of text strings to embed
+            
+        Returns:
+            List of embedding vectors, in input order
+        """
         try:
-            # Generate embeddings in batches for efficiency
-            all_embeddings = []
+            text_hashes = [hash_text(text) for text in texts]
+            # Cache lookups block on SQLite, so keep them off the shared event loop
+            cached = await asyncio.to_thread(self.cache.get_many, self.model, text_hashes) if self.cache else {}
             
-            for i in range(0, len(texts), self.batch_size):
-                batch = texts[i:i + self.batch_size]
-                batch_embeddings = self.embeddings.embed_documents(batch)
-                all_embeddings.extend(batch_embeddings)
-                logger.debug(f"Generated embeddings for batch {i//self.batch_size + 1}")
+            # Embed each missing text once, in input order
+            missing = {}
+            for text, text_hash in zip(texts, text_hashes):
+                if text_hash not in cached and text_hash not in missing:
+                    missing[text_hash] = text
+            missing_hashes = list(missing)
+            missing_texts = list(missing.values())
             
-            logger.info(f"Generated {len(all_embeddings)} embeddings")
+            batches = self._token_batches(missing_texts)
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            results = await asyncio.gather(
+                *(
+                    self._embed_batch(missing_texts[start:end], semaphore)
+                    for start, end in batches
+                ),
+                return_exceptions=True
+            )
+            # Keep the batches that succeeded even if another one ran out of retries
+            failure = None
+            embedded = []
+            for (start, end), batch_embeddings in zip(batches, results):
+                if isinstance(batch_embeddings, BaseException):
+                    failure = failure or batch_embeddings
+                    continue
+                embedded.extend(zip(missing_hashes[start:end], batch_embeddings))
+            cached.update(embedded)
+            if self.cache and embedded:
+                await asyncio.to_thread(self.cache.put_many, self.model, embedded)
+            if failure is not None:
+                raise failure
+            
+            all_embeddings = [cached[text_hash] for text_hash in text_hashes]
+            logger.info(
+                f"Generated {len(missing_texts)} embeddings in {len(batches)} requests "
+                f"({len(texts) - len(missing_texts)} from cache)"
+            )
             return all_embeddings
         
         except Exception as e:
             logger.error(f"Error generating embeddings: {e}")
             raise
     
+    def _token_batches(self, texts: List[str]) -> List[Tuple[int, int]]:
+        """
+        Split texts into request batches bounded by text and token count
+        
+        Tokens are counted with the provider's tokenizer, and only for
+        providers whose requests are token-limited.
+        
+        Args:
+            texts: Texts to batch
+            
+        Returns:
+            List of (start, end) index ranges into texts
+        """
+        if not texts:
+            return []
+        
+        max_tokens = self.embeddings.max_batch_tokens
+        token_counts = self.embeddings.count_tokens(texts) if max_tokens else [0] * len(texts)
+        
+        batches = []
+        start = 0
+        batch_tokens = 0
+        for i, tokens in enumerate(token_counts):
+            full = i - start >= self.batch_size or (max_tokens and batch_tokens + tokens > max_tokens)
+            if full and i > start:
+                batches.append((start, i))
+                start = i
+                batch_tokens = 0
+            batch_tokens += tokens
+        batches.append((start, len(texts)))
+        return batches
+    
+    async def _embed_batch(
+        self,
+        batch: List[str],
+        semaphore: asyncio.Semaphore
+    ) -> List[List[float]]:
+        """Embed one request batch, retrying it with exponential backoff"""
+        global _retry_count
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with semaphore:
+                    started = time.perf_counter()
+                    embeddings = await self.embeddings.aembed_documents(batch)
+                    _request_counter.record(len(batch), time.perf_counter() - started)
+                return embeddings
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = settings.EMBEDDING_RETRY_BACKOFF_SECONDS * 2 ** attempt
+                _retry_count += 1
+                logger.warning(
+                    f"Embedding batch of {len(batch)} texts failed ({e}), "
+                    f"retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+    
     def generate_query_embedding(self, query: str) -> List[float]:
         """
         Generate embedding for a single query
@@ -55,7 +196,19 @@ class EmbeddingService:
             Embedding vector
         """
         try:
-            embedding = self.embeddings.embed_query(query)
+            text_hash = hash_text(query)
+            if self.cache:
+                embedding = self.cache.get(self.model, text_hash)
+                if embedding is not None:
+                    return embedding
+            
+            if settings.QUERY_EMBEDDING_BATCH_WINDOW_MS > 0:
+                # Coalesce with queries embedded concurrently by other requests
+                embedding = get_query_batcher(self.embeddings.embed_documents).embed(query)
+            else:
+                embedding = self.embeddings.embed_query(query)
+            if self.cache:
+                self.cache.put_many(self.model, [(text_hash, embedding)])
             return embedding
         except Exception as e:
             logger.error(f"Error generating query embedding: {e}")
@@ -0,0 +1,169 @@
+"""
+Staged ingestion pipeline - runs parse, chunk, embed and store concurrently
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from loguru import logger
+from app.core.config import settings
+from app.utils.metrics import ThroughputCounter, register_metrics
+
+
+_DONE = object()
+
+# Process-wide totals per stage, across all pipeline runs
+_stage_totals: Dict[str, ThroughputCounter] = {}
+_stage_totals_lock = threading.Lock()
+
+
+@dataclass
+class ChunkBatch:
+    """A batch of chunks flowing from the chunk stage to the store stage"""
+    chunk_indexes: List[int]
+    chunks: List[str]
+    extra_metadatas: Optional[List[Dict[str, Any]]] = None
+    content_hashes: Optional[List[str]] = None
+    row_keys: Optional[List[str]] = None
+    embeddings: Optional[List[List[float]]] = None
+    
+    def select(self, positions: List[int]) -> "ChunkBatch":
+        """Return a batch holding only the chunks at the given positions"""
+        return ChunkBatch(
+            chunk_indexes=[self.chunk_indexes[i] for i in positions],
+            chunks=[self.chunks[i] for i in positions],
+            extra_metadatas=[self.extra_metadatas[i] for i in positions]
+            if self.extra_metadatas else None,
+            content_hashes=[self.content_hashes[i] for i in positions]
+            if self.content_hashes else None,
+            row_keys=[self.row_keys[i] for i in positions]
+            if self.row_keys else None,
+            embeddings=[self.embeddings[i] for i in positions]
+            if self.embeddings else None
+        )
+    
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+
+class IngestionPipeline:
+    """
+    Runs ingestion stages in their own threads, connected by bounded queues
+    
+    The source iterator is the first stage. Each following stage receives
+    one item and returns an iterable of items for the next stage, so a
+    stage can split or drop work. Bounded queues apply back-pressure: a
+    fast parser blocks once the embedder falls queue_size items behind.
+    """
+    
+    def __init__(
+        self,
+        source_name: str,
+        stages: List[Tuple[str, Callable[[Any], Iterable[Any]]]],
+        queue_size: int = None
+    ):
+        self.source_name = source_name
+        self.stages = stages
+        self.queue_size = queue_size or settings.PIPELINE_QUEUE_SIZE
+    
+    def run(self, source: Iterable[Any]) -> Dict[str, Dict[str, float]]:
+        """
+        Drain the source through all stages
+        
+        Args:
+            source: Iterable producing the first stage's items
+            
+        Returns:
+            Throughput counters per stage
+        """
+        names = [self.source_name] + [name for name, _ in self.stages]
+        counters = {name: ThroughputCounter() for name in names}
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        
+        def put(target: queue.Queue, item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def get(source_queue: queue.Queue) -> Any:
+            while not stop.is_set():
+                try:
+                    return source_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _DONE
+        
+        def produce():
+            try:
+                iterator = iter(source)
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    counters[self.source_name].record(len(item), time.perf_counter() - started)
+                    if not put(queues[0], item):
+                        return
+                put(queues[0], _DONE)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        
+        def consume(index: int):
+            name, func = self.stages[index]
+            output = queues[index + 1] if index + 1 < len(queues) else None
+            try:
+                while True:
+                    item = get(queues[index])
+                    if item is _DONE:
+                        break
+                    started = time.perf_counter()
+                    results = list(func(item))
+                    counters[name].record(len(item), time.perf_counter() - started)
+                    if output is not None:
+                        for result in results:
+                            if not put(output, result):
+                                return
+                if output is not None:
+                    put(output, _DONE)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        
+        threads = [threading.Thread(target=produce, name=f"ingest-{self.source_name}", daemon=True)]
+        threads += [
+            threading.Thread(target=consume, args=(i,), name=f"ingest-{name}", daemon=True)
+            for i, (name, _) in enumerate(self.stages)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        with _stage_totals_lock:
+            for name, counter in counters.items():
+                _stage_totals.setdefault(name, ThroughputCounter()).merge(counter)
+        
+        if errors:
+            raise errors[0]
+        
+        stats = {name: counter.snapshot() for name, counter in counters.items()}
+        logger.info(f"Ingestion pipeline finished: {stats}")
+        return stats
+
+
+def get_stage_totals() -> Dict[str, Dict[str, float]]:
+    """Get process-wide throughput counters per ingestion stage"""
+    with _stage_totals_lock:
+        return {name: counter.snapshot() for name, counter in _stage_totals.items()}
+
+
+register_metrics("ingestion_pipeline", get_stage_totals)
@@ -0,0 +1,137 @@
+"""
+Background ingestion queue - drains persisted ingestion jobs
+"""
+import asyncio
+from typing import Dict, List, Optional
+from loguru import logger
+from app.core.config import settings
+from app.db.jobs import (
+    init_jobs_db,
+    create_job,
+    claim_next_job,
+    update_job_progress,
+    complete_job,
+    fail_job,
+    requeue_running_jobs
+)
+from app.services.document_service import DocumentService
+
+
+class IngestionQueue:
+    """Pool of asyncio workers that process queued ingestion jobs"""
+    
+    def __init__(self, document_service: Optional[DocumentService] = None):
+        self._document_service = document_service
+        self.num_workers = settings.INGESTION_WORKERS
+        self.poll_interval = settings.INGESTION_POLL_INTERVAL_SECONDS
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+    
+    @property
+    def document_service(self) -> DocumentService:
+        """Document service used by the workers, created on first use"""
+        if self._document_service is None:
+            self._document_service = DocumentService()
+        return self._document_service
+    
+    async def start(self):
+        """Initialize the job store and start the worker tasks"""
+        init_jobs_db()
+        requeue_running_jobs()
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"ingestion-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        logger.info(f"Ingestion queue started with {self.num_workers} workers")
+    
+    async def stop(self):
+        """Cancel the worker tasks"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Ingestion queue stopped")
+    
+    def enqueue(
+        self,
+        document_id: str,
+        filename: str,
+        document_type: str,
+        file_path: str,
+        key_column: Optional[str] = None
+    ) -> Dict:
+        """
+        Persist a new ingestion job and wake up an idle worker
+        
+        Args:
+            document_id: ID assigned to the document
+            filename: Original filename
+            document_type: Document type (pdf/csv)
+            file_path: Path of the saved document
+            key_column: Primary-key column for incremental CSV ingestion
+            
+        Returns:
+            The queued job
+        """
+        job = create_job(
+            document_id=document_id,
+            filename=filename,
+            document_type=document_type,
+            file_path=file_path,
+            key_column=key_column
+        )
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+    
+    async def _worker(self, worker_index: int):
+        """Claim and run jobs until cancelled"""
+        while True:
+            try:
+                job = await asyncio.to_thread(claim_next_job)
+            except Exception as e:
+                logger.error(f"Ingestion worker {worker_index} failed to claim a job: {e}")
+                job = None
+            
+            if job is None:
+                # Jobs may also be queued by other processes, so poll as well
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            
+            await self._run_job(job)
+    
+    async def _run_job(self, job: Dict):
+        """Run a single ingestion job and record its outcome"""
+        job_id = job["job_id"]
+        logger.info(f"Running ingestion job {job_id} for {job['filename']}")
+        try:
+            result = await asyncio.to_thread(
+                self.document_service.ingest_file,
+                file_path=job["file_path"],
+                filename=job["filename"],
+                document_id=job["document_id"],
+                document_type=job["document_type"],
+                key_column=job["key_column"],
+                progress=lambda progress: update_job_progress(job_id, progress)
+            )
+            await asyncio.to_thread(complete_job, job_id, result)
+            logger.info(f"Ingestion job {job_id} completed")
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {e}")
+            await asyncio.to_thread(fail_job, job_id, str(e))
+
+
+_queue: Optional[IngestionQueue] = None
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Get or create the application ingestion queue"""
+    global _queue
+    if _queue is None:
+        _queue = IngestionQueue()
+    return _queue
@@ -0,0 +1,152 @@
+"""
+Query embedding micro-batching - coalesces concurrent query embeddings
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from app.core.config import settings
+from app.utils.metrics import register_metrics
+
+
+EmbedFunction = Callable[[List[str]], List[List[float]]]
+
+
+class BatchStats:
+    """Thread-safe counters of dispatched batch sizes and added wait time"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+        self.max_batch_size = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+    
+    def record(self, batch_size: int, waits: List[float]):
+        """Record one dispatched batch and the wait of each of its queries"""
+        with self._lock:
+            self.batches += 1
+            self.queries += batch_size
+            self.max_batch_size = max(self.max_batch_size, batch_size)
+            self.wait_seconds += sum(waits)
+            self.max_wait_seconds = max(self.max_wait_seconds, max(waits))
+    
+    def snapshot(self) -> Dict[str, float]:
+        """Return batch size and wait time totals and averages"""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "queries": self.queries,
+                "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "avg_wait_ms": round(self.wait_seconds / self.queries * 1000, 3)
+                if self.queries else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3)
+            }
+
+
+class QueryEmbeddingBatcher:
+    """
+    Coalesces query embeddings requested at about the same time
+    
+    The first query of a batch opens a window of window_ms; queries that
+    arrive before it closes, up to max_batch, are embedded with a single
+    embed call and each caller receives its own vector. Batches are sent
+    from a small thread pool, so the next batch collects while the
+    previous request is in flight.
+    """
+    
+    def __init__(
+        self,
+        embed_fn: EmbedFunction,
+        window_ms: Optional[float] = None,
+        max_batch: Optional[int] = None,
+        max_in_flight: Optional[int] = None
+    ):
+        self.embed_fn = embed_fn
+        if window_ms is None:
+            window_ms = settings.QUERY_EMBEDDING_BATCH_WINDOW_MS
+        self.window = window_ms / 1000
+        self.max_batch = max_batch or settings.QUERY_EMBEDDING_MAX_BATCH
+        self.stats = BatchStats()
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_in_flight or settings.EMBEDDING_CONCURRENCY,
+            thread_name_prefix="query-embed"
+        )
+        self._thread = threading.Thread(target=self._collect, name="query-batcher", daemon=True)
+        self._thread.start()
+    
+    def embed(self, query: str) -> List[float]:
+        """
+        Embed a query as part of the next batch
+        
+        Args:
+            query: Query text
+            
+        Returns:
+            Embedding vector
+        """
+        future: Future = Future()
+        self._queue.put((query, future, time.perf_counter()))
+        return future.result()
+    
+    def _collect(self):
+        """Collect queued queries into batches until the window closes or the batch is full"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._executor.submit(self._dispatch, batch)
+    
+    def _dispatch(self, batch: List[Tuple[str, Future, float]]):
+        """Embed a batch with one call and resolve each caller's future"""
+        dispatched = time.perf_counter()
+        self.stats.record(len(batch), [dispatched - enqueued for _, _, enqueued in batch])
+        
+        # Identical concurrent queries are embedded once
+        unique_queries = list(dict.fromkeys(query for query, _, _ in batch))
+        try:
+            vectors = dict(zip(unique_queries, self.embed_fn(unique_queries)))
+        except Exception as e:
+            logger.error(f"Error embedding query batch of {len(batch)}: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        
+        for query, future, _ in batch:
+            future.set_result(vectors[query])
+
+
+_batcher: Optional[QueryEmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_query_batcher(embed_fn: EmbedFunction) -> QueryEmbeddingBatcher:
+    """
+    Get the process-wide query embedding batcher
+    
+    Args:
+        embed_fn: Batch embedding function, used when the batcher is created
+        
+    Returns:
+        Query embedding batcher
+    """
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = QueryEmbeddingBatcher(embed_fn)
+                register_metrics("query_embedding_batches", _batcher.stats.snapshot)
+    return _batcher
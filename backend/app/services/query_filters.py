@@ -0,0 +1,123 @@
+"""
+Structured filter extraction - turns constraints in a query into ChromaDB where filters
+"""
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+from app.core.config import settings
+from app.db.chroma import collection_version
+from app.db.facets import get_facet_values
+
+
+_NUMBER = r"\$?\s*(\d[\d,]*(?:\.\d+)?)\s*(k\b)?"
+
+# Comparison phrases and the operator they imply, tried in order
+_COMPARISONS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(rf"\b(?:up to|at most|no more than|max(?:imum)?(?: of)?)\s*{_NUMBER}"), "$lte"),
+    (re.compile(rf"\b(?:under|below|less than|cheaper than|lower than)\s*{_NUMBER}|<\s*{_NUMBER}"), "$lt"),
+    (re.compile(rf"\b(?:at least|no less than|min(?:imum)?(?: of)?)\s*{_NUMBER}"), "$gte"),
+    (re.compile(rf"\b(?:over|above|more than|greater than|pricier than|higher than)\s*{_NUMBER}|>\s*{_NUMBER}"), "$gt"),
+]
+_BETWEEN = re.compile(rf"\bbetween\s*{_NUMBER}\s*(?:and|to|-)\s*{_NUMBER}")
+_WORD = re.compile(r"[\w'&-]+")
+
+_facet_lock = threading.Lock()
+_facet_cache: Tuple[Optional[int], Dict[str, Set[str]]] = (None, {})
+
+
+def _parse_number(digits: str, thousands: Optional[str]) -> float:
+    value = float(digits.replace(",", ""))
+    return value * 1000 if thousands else value
+
+
+def _numeric_conditions(query: str, attribute: str) -> List[Dict[str, Any]]:
+    """Comparisons on a numeric attribute, e.g. "under $500" -> {"price": {"$lt": 500.0}}"""
+    between = _BETWEEN.search(query)
+    if between:
+        low = _parse_number(between.group(1), between.group(2))
+        high = _parse_number(between.group(3), between.group(4))
+        return [
+            {attribute: {"$gte": min(low, high)}},
+            {attribute: {"$lte": max(low, high)}}
+        ]
+    
+    conditions = []
+    for pattern, operator in _COMPARISONS:
+        match = pattern.search(query)
+        if match:
+            groups = match.groups()
+            digits, thousands = (groups[0], groups[1]) if groups[0] else (groups[2], groups[3])
+            conditions.append({attribute: {operator: _parse_number(digits, thousands)}})
+    return conditions
+
+
+def _facets() -> Dict[str, Set[str]]:
+    """Known categorical values, reloaded after every collection write"""
+    global _facet_cache
+    version = collection_version()
+    with _facet_lock:
+        if _facet_cache[0] != version:
+            _facet_cache = (version, get_facet_values())
+        return _facet_cache[1]
+
+
+def _variants(phrase: str) -> Set[str]:
+    """Singular and plural spellings of a phrase"""
+    variants = {phrase, phrase + "s", phrase + "es"}
+    if phrase.endswith("es"):
+        variants.add(phrase[:-2])
+    if phrase.endswith("s"):
+        variants.add(phrase[:-1])
+    return variants
+
+
+def _facet_conditions(query: str, facets: Dict[str, Set[str]]) -> List[Dict[str, Any]]:
+    """Membership tests for categorical values named in the query, e.g. {"brand": {"$in": ["dell"]}}"""
+    words = _WORD.findall(query)
+    phrases = {
+        " ".join(words[start:start + length])
+        for length in range(1, 4)
+        for start in range(len(words) - length + 1)
+    }
+    candidates = {variant for phrase in phrases for variant in _variants(phrase)}
+    
+    conditions = []
+    for attribute in sorted(facets):
+        matched = sorted(candidates & facets[attribute])
+        if matched:
+            conditions.append({attribute: {"$in": matched}})
+    return conditions
+
+
+def extract_metadata_filters(query: str) -> List[Dict[str, Any]]:
+    """
+    Recognize constraints on the typed CSV metadata attributes in a query
+    
+    Comparisons ("under $500", "between 100 and 200") apply to the first
+    "number" attribute of CSV_METADATA_COLUMNS. Categorical constraints match
+    the query's words against values seen during ingestion, so
+    "laptops under $500 from Dell or HP" yields category $in ["laptops"],
+    brand $in ["dell", "hp"] and price $lt 500.
+    
+    Args:
+        query: User query string
+        
+    Returns:
+        ChromaDB where conditions, to be combined with $and
+    """
+    query = query.lower()
+    conditions = []
+    numeric = [name for name, kind in settings.CSV_METADATA_COLUMNS.items() if kind == "number"]
+    if numeric:
+        conditions.extend(_numeric_conditions(query, numeric[0]))
+    conditions.extend(_facet_conditions(query, _facets()))
+    return conditions
+
+
+def combine_conditions(conditions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Combine where conditions with $and (ChromaDB needs at least two operands)"""
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
@@ -0,0 +1,56 @@
+"""
+Maximal Marginal Relevance re-ranking of retrieved chunks
+"""
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query_embedding: Sequence[float],
+    embeddings: Sequence[Sequence[float]],
+    k: int,
+    lambda_mult: float = 0.7,
+    relevance: Optional[Sequence[float]] = None
+) -> List[int]:
+    """
+    Pick k candidates that are relevant to the query but unlike each other
+    
+    Each step selects the candidate maximizing
+    lambda_mult * relevance - (1 - lambda_mult) * (max similarity to those selected).
+    The max similarity of every candidate is updated with one matrix-vector
+    product per step, so the cost is O(k * candidates * dimensions).
+    
+    Args:
+        query_embedding: Query vector; truncated to the candidates' dimensions
+        embeddings: Candidate vectors
+        k: Number of candidates to select
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+        relevance: Relevance of each candidate (defaults to cosine similarity to the query)
+        
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if not len(vectors) or k <= 0:
+        return []
+    vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    
+    if relevance is None:
+        query = np.asarray(query_embedding, dtype=np.float32)[:vectors.shape[1]]
+        scores = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    else:
+        scores = np.asarray(relevance, dtype=np.float32)
+    
+    selected = [int(np.argmax(scores))]
+    max_similarity = vectors @ vectors[selected[0]]
+    available = np.ones(len(vectors), dtype=bool)
+    available[selected[0]] = False
+    
+    for _ in range(min(k, len(vectors)) - 1):
+        marginal = lambda_mult * scores - (1 - lambda_mult) * max_similarity
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, vectors @ vectors[best], out=max_similarity)
+    return selected
@@ -0,0 +1,171 @@
+"""
+Semantic cache of retrieval results, keyed by query embedding similarity
+"""
+import json
+import threading
+from typing import Any, Dict, List, Optional
+import numpy as np
+from loguru import logger
+from app.core.config import settings
+from app.utils.metrics import register_metrics
+
+
+class RetrievalCache:
+    """
+    Bounded in-memory cache of retrieval results for recent queries
+    
+    Query vectors are kept unit-length in one preallocated matrix, so a
+    lookup is a single matrix-vector product over every cached query. A hit
+    needs the same search key (mode, result count and filters) and a cosine
+    similarity of at least the threshold. The oldest entry is overwritten
+    once the cache is full, and every entry is dropped when the collection
+    version changes.
+    """
+    
+    def __init__(self, max_entries: Optional[int] = None, threshold: Optional[float] = None):
+        self.max_entries = max_entries or settings.RETRIEVAL_CACHE_MAX_ENTRIES
+        self.threshold = settings.RETRIEVAL_CACHE_SIMILARITY if threshold is None else threshold
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._keys = np.full(self.max_entries, -1, dtype=np.int64)
+        self._key_ids: Dict[str, int] = {}
+        self._next_key_id = 0
+        self._results: List[Any] = [None] * self.max_entries
+        self._next = 0
+        self._size = 0
+        self._version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def make_key(
+        mode: str,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        lexical_terms: Optional[str] = None
+    ) -> str:
+        """
+        Build the exact-match part of a cache key
+        
+        Args:
+            mode: Search mode
+            n_results: Number of chunks returned
+            where: Metadata filter
+            lexical_terms: Normalized keyword query of hybrid searches, whose
+                BM25 half depends on the exact terms rather than the embedding
+        """
+        return json.dumps([mode, n_results, where, lexical_terms], sort_keys=True, default=str)
+    
+    def _sync_version(self, version: int):
+        """Drop every entry if the collection changed since they were cached"""
+        if version != self._version:
+            if self._size:
+                self.invalidations += 1
+                logger.debug(f"Retrieval cache cleared at collection version {version}")
+            self._keys.fill(-1)
+            self._key_ids.clear()
+            self._results = [None] * self.max_entries
+            self._next = 0
+            self._size = 0
+            self._version = version
+    
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+    
+    def get(self, embedding: List[float], key: str, version: int) -> Optional[Any]:
+        """
+        Look up the results of the most similar cached query
+        
+        Args:
+            embedding: Query embedding
+            key: Search key from make_key
+            version: Current collection version
+            
+        Returns:
+            Cached results, or None on a miss
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._sync_version(version)
+            key_id = self._key_ids.get(key)
+            if key_id is None or self._vectors is None or self._vectors.shape[1] != len(vector):
+                self.misses += 1
+                return None
+            
+            similarities = self._vectors[:self._size] @ vector
+            similarities[self._keys[:self._size] != key_id] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._results[best]
+    
+    def put(self, embedding: List[float], key: str, version: int, results: Any):
+        """
+        Cache the results of a query
+        
+        Args:
+            embedding: Query embedding
+            key: Search key from make_key
+            version: Collection version the results were read at
+            results: Results to cache
+        """
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._sync_version(version)
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                self._keys.fill(-1)
+                self._next = 0
+                self._size = 0
+            
+            slot = self._next
+            self._vectors[slot] = vector
+            self._keys[slot] = self._key_id(key)
+            self._results[slot] = results
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+    
+    def _key_id(self, key: str) -> int:
+        """Get the integer ID of a search key, forgetting keys no entry uses"""
+        key_id = self._key_ids.get(key)
+        if key_id is None:
+            if len(self._key_ids) >= self.max_entries:
+                live = set(self._keys[:self._size].tolist())
+                self._key_ids = {k: i for k, i in self._key_ids.items() if i in live}
+            key_id = self._key_ids[key] = self._next_key_id
+            self._next_key_id += 1
+        return key_id
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit, miss and size counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "collection_version": self._version
+            }
+
+
+_cache: Optional[RetrievalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Get the shared retrieval cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RetrievalCache()
+                register_metrics("retrieval_cache", _cache.stats)
+    return _cache
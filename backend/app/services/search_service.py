@@ -0,0 +1,260 @@
+"""
+Search service - vector, lexical (BM25) and hybrid retrieval
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from loguru import logger
+from app.core.config import settings
+from app.db import lexical_index
+from app.db.chroma import get_documents, query_documents
+from app.db.document_registry import get_document_fields
+from app.services.reranking import maximal_marginal_relevance
+
+
+SEARCH_MODES = ("vector", "hybrid", "lexical")
+
+# Runs lexical searches while the calling thread embeds the query
+_lexical_executor = ThreadPoolExecutor(thread_name_prefix="lexical-search")
+
+
+@dataclass
+class SearchResults:
+    """Ranked chunks of a search and the query embedding, if one was made"""
+    chunks: List[Dict[str, Any]]
+    query_embedding: List[float] = field(default_factory=list)
+    # Stored vectors of the chunks, by chunk ID, when they were requested
+    embeddings: Dict[str, List[float]] = field(default_factory=dict)
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """
+    Fuse ranked chunk lists with reciprocal rank fusion
+    
+    Each chunk scores the sum of 1 / (k + rank) over the lists it appears in.
+    
+    Args:
+        result_lists: Ranked chunk lists, best first
+        k: Rank smoothing constant
+        
+    Returns:
+        Chunks ordered by fused score, each with its "score"
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, chunk in enumerate(results, start=1):
+            chunk_id = chunk["id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1 / (k + rank)
+            if chunk_id not in fused:
+                fused[chunk_id] = dict(chunk)
+            elif fused[chunk_id].get("distance") is None:
+                fused[chunk_id]["distance"] = chunk.get("distance")
+    
+    ranked = sorted(fused, key=scores.__getitem__, reverse=True)
+    return [{**fused[chunk_id], "score": scores[chunk_id]} for chunk_id in ranked]
+
+
+def join_document_fields(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Add the document-level fields (source, type, upload date) to chunk metadata
+    
+    Fields already in the metadata, as on chunks stored before metadata
+    was slimmed, are kept.
+    
+    Args:
+        chunks: Chunks with their metadata
+        
+    Returns:
+        The chunks, with joined metadata
+    """
+    fields = get_document_fields(
+        chunk["metadata"]["document_id"] for chunk in chunks if "document_id" in chunk["metadata"]
+    )
+    for chunk in chunks:
+        document = fields.get(chunk["metadata"].get("document_id"))
+        if document:
+            chunk["metadata"] = {**document, **chunk["metadata"]}
+    return chunks
+
+
+class SearchService:
+    """Service for retrieving chunks relevant to a query"""
+    
+    def __init__(self, embedding_service=None):
+        if embedding_service is None:
+            from app.core.clients import get_client_registry
+            embedding_service = get_client_registry().embedding_service
+        self.embedding_service = embedding_service
+    
+    def search(
+        self,
+        query: str,
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> SearchResults:
+        """
+        Search for chunks relevant to a query
+        
+        With MMR_ENABLED, vector and hybrid searches fetch MMR_OVERSAMPLE
+        times more candidates and keep the n_results most relevant ones
+        that are not near-duplicates of each other.
+        
+        Args:
+            query: Query text
+            n_results: Number of chunks to return
+            where: Optional metadata filter
+            mode: "vector", "hybrid" or "lexical" (defaults to DEFAULT_SEARCH_MODE)
+            query_embedding: Embedding of the query, if already computed
+            
+        Returns:
+            Ranked chunks with their document fields joined, and the query
+            embedding unless the mode is lexical
+        """
+        mode = mode or settings.DEFAULT_SEARCH_MODE
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported search mode: {mode}")
+        if mode != "vector" and not settings.LEXICAL_INDEX_ENABLED:
+            logger.warning("Lexical index is disabled, falling back to vector search")
+            mode = "vector"
+        
+        if mode == "lexical":
+            return SearchResults(chunks=join_document_fields(self._lexical_search(query, n_results, where)))
+        
+        diversify = settings.MMR_ENABLED
+        fetch = n_results * settings.MMR_OVERSAMPLE if diversify else n_results
+        
+        if mode == "vector":
+            results = self._vector_search(query, fetch, where, query_embedding, include_embeddings=diversify)
+        else:
+            candidates = max(fetch, settings.HYBRID_CANDIDATES)
+            lexical_future = _lexical_executor.submit(self._lexical_search, query, candidates, where)
+            vector = self._vector_search(query, candidates, where, query_embedding, include_embeddings=diversify)
+            lexical = lexical_future.result()
+            
+            fused = reciprocal_rank_fusion([vector.chunks, lexical], k=settings.RRF_K)
+            logger.debug(
+                f"Hybrid search fused {len(vector.chunks)} vector and {len(lexical)} lexical results"
+            )
+            results = SearchResults(
+                chunks=fused[:fetch],
+                query_embedding=vector.query_embedding,
+                embeddings=vector.embeddings
+            )
+        
+        if diversify:
+            results.chunks = self._diversify(results, n_results, use_scores=mode == "hybrid")
+        results.chunks = join_document_fields(results.chunks)
+        return results
+    
+    def _diversify(self, results: SearchResults, n_results: int, use_scores: bool) -> List[Dict[str, Any]]:
+        """
+        Re-rank candidates with Maximal Marginal Relevance
+        
+        Args:
+            results: Oversampled candidates with the query embedding
+            n_results: Number of chunks to keep
+            use_scores: Use the candidates' fused scores as relevance instead of
+                cosine similarity, so keyword matches keep their rank
+                
+        Returns:
+            The selected chunks
+        """
+        chunks = results.chunks
+        if len(chunks) <= n_results:
+            return chunks
+        
+        # Lexical-only hits of a hybrid search come without their vectors
+        missing = [chunk["id"] for chunk in chunks if chunk["id"] not in results.embeddings]
+        if missing:
+            stored = get_documents(missing, include_embeddings=True)
+            results.embeddings.update(zip(stored["ids"], stored["embeddings"]))
+        
+        relevance = None
+        if use_scores:
+            best = max(chunk["score"] for chunk in chunks)
+            relevance = [chunk["score"] / best for chunk in chunks]
+        
+        order = maximal_marginal_relevance(
+            results.query_embedding,
+            [results.embeddings[chunk["id"]] for chunk in chunks],
+            n_results,
+            lambda_mult=settings.MMR_LAMBDA,
+            relevance=relevance
+        )
+        return [chunks[i] for i in order]
+    
+    def _vector_search(
+        self,
+        query: str,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        query_embedding: Optional[List[float]] = None,
+        include_embeddings: bool = False
+    ) -> SearchResults:
+        """Dense similarity search in ChromaDB"""
+        if query_embedding is None:
+            query_embedding = self.embedding_service.generate_query_embedding(query)
+        results = query_documents(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=where,
+            include_embeddings=include_embeddings
+        )
+        
+        documents = results.get("documents", [])[0] if results.get("documents") else []
+        metadatas = results.get("metadatas", [])[0] if results.get("metadatas") else []
+        distances = results.get("distances", [])[0] if results.get("distances") else []
+        ids = results.get("ids", [])[0] if results.get("ids") else []
+        
+        chunks = [
+            {
+                "content": doc,
+                "metadata": metadatas[i] if i < len(metadatas) else {},
+                "distance": distances[i] if i < len(distances) else None,
+                "id": ids[i] if i < len(ids) else None
+            }
+            for i, doc in enumerate(documents)
+        ]
+        embeddings = {}
+        if include_embeddings and results.get("embeddings"):
+            embeddings = dict(zip(ids, results["embeddings"][0]))
+        return SearchResults(chunks=chunks, query_embedding=query_embedding, embeddings=embeddings)
+    
+    def _lexical_search(
+        self,
+        query: str,
+        n_results: int,
+        where: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """BM25 keyword search, with the metadata filter applied through ChromaDB"""
+        # Oversample when filtering, since some hits will not match the filter
+        hits = lexical_index.search(query, n_results * 4 if where else n_results)
+        if not hits:
+            return []
+        
+        results = get_documents([chunk_id for chunk_id, _ in hits], where=where)
+        found = {
+            chunk_id: (document, metadata)
+            for chunk_id, document, metadata in zip(
+                results["ids"], results["documents"], results["metadatas"]
+            )
+        }
+        
+        chunks = []
+        for chunk_id, score in hits:
+            if chunk_id not in found:
+                continue
+            document, metadata = found[chunk_id]
+            chunks.append({
+                "content": document,
+                "metadata": metadata or {},
+                "distance": None,
+                "id": chunk_id,
+                "score": score
+            })
+            if len(chunks) == n_results:
+                break
+        return chunks
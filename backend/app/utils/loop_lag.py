@@ -0,0 +1,90 @@
+"""
+Event loop lag monitor - measures how long blocking calls hold up the event loop
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+from loguru import logger
+from app.core.config import settings
+from app.utils.metrics import register_metrics
+
+
+class EventLoopLagMonitor:
+    """
+    Samples event loop lag with a periodic timer
+    
+    A task sleeps for a fixed interval and records how much later than
+    scheduled it wakes up; any blocking call on the loop shows up as lag.
+    """
+    
+    def __init__(self, interval_seconds: float, warn_ms: float, window: int = 1200):
+        self.interval_seconds = interval_seconds
+        self.warn_ms = warn_ms
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.samples = 0
+        self.slow_samples = 0
+        self.max_ms = 0.0
+    
+    async def start(self):
+        """Start sampling on the running loop"""
+        if self._task is None and self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._sample())
+    
+    async def stop(self):
+        """Stop sampling"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+    
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            self.record(max(loop.time() - expected, 0.0) * 1000)
+    
+    def record(self, lag_ms: float):
+        """Record one lag sample in milliseconds"""
+        with self._lock:
+            self.samples += 1
+            self._recent.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+            if lag_ms >= self.warn_ms:
+                self.slow_samples += 1
+        if lag_ms >= self.warn_ms:
+            logger.warning(f"Event loop blocked for {lag_ms:.0f} ms")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Lag over the recent window and since startup"""
+        with self._lock:
+            recent = sorted(self._recent)
+            return {
+                "samples": self.samples,
+                "slow_samples": self.slow_samples,
+                "last_ms": round(self._recent[-1], 2) if recent else 0.0,
+                "p50_ms": round(recent[len(recent) // 2], 2) if recent else 0.0,
+                "p99_ms": round(recent[int(len(recent) * 0.99)], 2) if recent else 0.0,
+                "max_ms": round(self.max_ms, 2)
+            }
+
+
+_monitor: Optional[EventLoopLagMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_loop_lag_monitor() -> EventLoopLagMonitor:
+    """Get the event loop lag monitor of the API process"""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = EventLoopLagMonitor(
+                    interval_seconds=settings.EVENT_LOOP_LAG_INTERVAL_SECONDS,
+                    warn_ms=settings.EVENT_LOOP_LAG_WARN_MS
+                )
+                register_metrics("event_loop", _monitor.stats)
+    return _monitor
@@ -0,0 +1,67 @@
+"""
+Lightweight in-process metrics
+"""
+import threading
+from typing import Any, Callable, Dict
+from loguru import logger
+
+
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+class ThroughputCounter:
+    """Thread-safe counter of items, batches and busy time"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+    
+    def record(self, items: int, seconds: float):
+        """Record one processed batch"""
+        with self._lock:
+            self.items += items
+            self.batches += 1
+            self.busy_seconds += seconds
+    
+    def merge(self, other: "ThroughputCounter"):
+        """Add the totals of another counter"""
+        with self._lock:
+            self.items += other.items
+            self.batches += other.batches
+            self.busy_seconds += other.busy_seconds
+    
+    def snapshot(self) -> Dict[str, float]:
+        """Return totals and items per busy second"""
+        with self._lock:
+            return {
+                "items": self.items,
+                "batches": self.batches,
+                "busy_seconds": round(self.busy_seconds, 4),
+                "items_per_second": round(self.items / self.busy_seconds, 2)
+                if self.busy_seconds else 0.0
+            }
+
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, Any]]):
+    """
+    Register a metrics provider
+    
+    Args:
+        name: Section name in the metrics report
+        provider: Callable returning the current metrics of the section
+    """
+    _providers[name] = provider
+
+
+def collect_metrics() -> Dict[str, Any]:
+    """Collect the current metrics of every registered provider"""
+    metrics = {}
+    for name, provider in list(_providers.items()):
+        try:
+            metrics[name] = provider()
+        except Exception as e:
+            logger.error(f"Error collecting metrics for {name}: {e}")
+            metrics[name] = {"error": str(e)}
+    return metrics
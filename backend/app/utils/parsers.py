@@ -1,62 +1,247 @@
 """
 Document parsers for PDF and CSV files
 """
+import mmap
+import re
 import pandas as pd
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
 from pypdf import PdfReader
 from io import BytesIO
-from typing import List, Dict
+from typing import Any, Iterator, List, Dict, Optional, Union
 from loguru import logger
+from app.core.config import settings
+from app.utils.workers import get_process_pool, resolve_worker_count
 
 
-def parse_pdf(content: bytes) -> str:
+PdfSource = Union[str, Path, bytes]
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-z0-9]")
+
+
+@contextmanager
+def open_pdf(source: PdfSource) -> Iterator[PdfReader]:
     """
-    Parse PDF file and extract text
+    Open a PDF for reading
+    
+    Files are memory-mapped rather than read into memory, so pages are
+    loaded from the OS page cache as they are accessed.
     
     Args:
-        content: PDF file content as bytes
+        source: PDF file path or PDF content as bytes
+        
+    Yields:
+        PDF reader
+    """
+    if isinstance(source, bytes):
+        yield PdfReader(BytesIO(source))
+        return
+    
+    with open(source, "rb") as handle:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PdfReader(mapped)
+
+
+def _extract_page_range(source: PdfSource, start: int, end: int) -> List[str]:
+    """Extract the text of pages [start, end) from a PDF"""
+    with open_pdf(source) as pdf_reader:
+        return [pdf_reader.pages[i].extract_text() for i in range(start, end)]
+
+
+def parse_pdf_pages(source: PdfSource, workers: int = None) -> List[str]:
+    """
+    Parse PDF file and extract text page by page
+    
+    Large PDFs are split into contiguous page ranges that are extracted
+    in parallel on a process pool. When given a path, each worker opens
+    the file itself instead of receiving a copy of its content.
+    
+    Args:
+        source: PDF file path or PDF content as bytes
+        workers: Number of extraction processes (defaults to PDF_EXTRACT_WORKERS)
         
     Returns:
-        Extracted text from PDF
+        Extracted text of each page, in page order
     """
     try:
-        pdf_reader = PdfReader(BytesIO(content))
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        if isinstance(source, Path):
+            source = str(source)
+        with open_pdf(source) as pdf_reader:
+            page_count = len(pdf_reader.pages)
+        workers = resolve_worker_count(
+            workers if workers is not None else settings.PDF_EXTRACT_WORKERS
+        )
+        ranges = min(workers, page_count // settings.PDF_PARALLEL_MIN_PAGES)
         
-        if not text.strip():
+        if ranges <= 1:
+            pages = _extract_page_range(source, 0, page_count)
+        else:
+            pool = get_process_pool("pdf", workers)
+            bounds = [page_count * i // ranges for i in range(ranges + 1)]
+            futures = [
+                pool.submit(_extract_page_range, source, bounds[i], bounds[i + 1])
+                for i in range(ranges)
+            ]
+            pages = []
+            for future in futures:
+                pages.extend(future.result())
+        
+        if not any(page.strip() for page in pages):
             raise ValueError("No text extracted from PDF")
         
-        logger.info(f"Extracted {len(text)} characters from PDF")
-        return text
+        logger.info(f"Extracted {page_count} pages from PDF using {max(ranges, 1)} workers")
+        return pages
     
     except Exception as e:
         logger.error(f"Error parsing PDF: {e}")
         raise
 
 
-def parse_csv(content: bytes) -> List[str]:
+def parse_pdf(content: bytes) -> str:
     """
-    Parse CSV file and convert rows to text chunks
+    Parse PDF file and extract text
     
     Args:
-        content: CSV file content as bytes
+        content: PDF file content as bytes
         
     Returns:
-        List of text chunks, each representing a row with column context
+        Extracted text from PDF
     """
-    try:
-        df = pd.read_csv(BytesIO(content))
+    text = "".join(f"{page}\n" for page in parse_pdf_pages(content))
+    logger.info(f"Extracted {len(text)} characters from PDF")
+    return text
+
+
+def rows_to_text(df: pd.DataFrame) -> List[str]:
+    """
+    Convert DataFrame rows to text, one string per row
+    
+    Builds "Column1: value1, Column2: value2, ..." column-wise with
+    vectorized string operations instead of iterating over rows.
+    
+    Args:
+        df: DataFrame holding a batch of CSV rows
+        
+    Returns:
+        List of row texts in row order
+    """
+    if df.empty or len(df.columns) == 0:
+        return []
+    
+    columns = [f"{col}: " + df[col].astype(str) for col in df.columns]
+    row_text = columns[0]
+    for column in columns[1:]:
+        row_text = row_text + ", " + column
+    return row_text.tolist()
+
+
+@dataclass
+class CsvRows:
+    """A batch of CSV rows as text, with their keys and typed metadata when requested"""
+    texts: List[str]
+    keys: Optional[List[str]] = None
+    metadatas: Optional[List[Dict[str, Any]]] = None
+    
+    def __len__(self) -> int:
+        return len(self.texts)
+
+
+def _normalize_column(name: str) -> str:
+    """Normalize a column name for matching ("Product Category" -> "productcategory")"""
+    return _NON_ALPHANUMERIC.sub("", str(name).lower())
+
+
+def row_metadata(df: pd.DataFrame, columns: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Extract typed metadata attributes from a batch of CSV rows
+    
+    Attributes are matched to CSV columns ignoring case, spaces and
+    punctuation. "number" values are parsed after stripping currency symbols
+    and thousands separators; "text" values are stripped and lowercased so
+    filters match regardless of case. Missing or unparsable values are left
+    out, since ChromaDB metadata cannot hold nulls.
+    
+    Args:
+        df: DataFrame holding a batch of CSV rows
+        columns: Attribute name -> "number" or "text"
+        
+    Returns:
+        Metadata dict of each row, in row order
+    """
+    metadatas = [{} for _ in range(len(df))]
+    by_name = {_normalize_column(column): column for column in df.columns}
+    for attribute, kind in columns.items():
+        column = by_name.get(_normalize_column(attribute))
+        if column is None:
+            continue
+        if kind == "number":
+            values = pd.to_numeric(
+                df[column].astype(str).str.replace(r"[^0-9.\-]", "", regex=True),
+                errors="coerce"
+            )
+            valid = values.notna()
+            values = values.astype(float)
+        elif kind == "text":
+            values = df[column].astype(str).str.strip().str.lower()
+            valid = df[column].notna() & (values != "")
+        else:
+            raise ValueError(f"Unsupported metadata column type for '{attribute}': {kind}")
+        for position, value, keep in zip(range(len(df)), values.tolist(), valid.tolist()):
+            if keep:
+                metadatas[position][attribute] = value
+    return metadatas
+
+
+def iter_csv_rows(
+    source,
+    chunk_rows: int = None,
+    skip_rows: int = 0,
+    key_column: Optional[str] = None,
+    metadata_columns: Optional[Dict[str, str]] = None
+) -> Iterator[CsvRows]:
+    """
+    Stream a CSV file as batches of rows
+    
+    Only one batch of rows is held in memory at a time, so peak memory
+    depends on ``chunk_rows`` rather than on the size of the file. Each
+    row's text is its literal cell text, whatever batch it falls in.
+    
+    Args:
+        source: CSV file path or binary file-like object
+        chunk_rows: Number of rows per batch (defaults to CSV_CHUNK_ROWS)
+        skip_rows: Number of data rows to skip after the header
+        key_column: Column holding each row's primary key, if keys are needed
+        metadata_columns: Typed attributes to extract (see row_metadata)
         
-        # Convert each row to a text chunk with column names as context
-        chunks = []
-        for _, row in df.iterrows():
-            # Create a text representation: "Column1: value1, Column2: value2, ..."
-            row_text = ", ".join([f"{col}: {row[col]}" for col in df.columns])
-            chunks.append(row_text)
+    Yields:
+        Batches of row texts, each representing a row with column context
+    """
+    chunk_rows = chunk_rows or settings.CSV_CHUNK_ROWS
+    total_rows = 0
+    try:
+        skiprows = range(1, skip_rows + 1) if skip_rows else None
+        # Cells are read as their literal text: inferring dtypes per batch
+        # would render a row differently depending on its neighbours
+        with pd.read_csv(
+            source,
+            chunksize=chunk_rows,
+            skiprows=skiprows,
+            dtype=str,
+            keep_default_na=False
+        ) as reader:
+            for df in reader:
+                rows = CsvRows(texts=rows_to_text(df))
+                if key_column:
+                    if key_column not in df.columns:
+                        raise ValueError(f"Key column '{key_column}' not found in CSV")
+                    rows.keys = df[key_column].astype(str).tolist()
+                if metadata_columns:
+                    rows.metadatas = row_metadata(df, metadata_columns)
+                total_rows += len(rows)
+                yield rows
         
-        logger.info(f"Parsed CSV with {len(chunks)} rows")
-        return chunks
+        logger.info(f"Streamed {'keyed ' if key_column else ''}CSV with {total_rows} rows")
     
     except Exception as e:
         logger.error(f"Error parsing CSV: {e}")
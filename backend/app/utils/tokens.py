@@ -0,0 +1,30 @@
+"""
+Token counting for chunk and embedding batch sizing
+"""
+from functools import lru_cache
+from typing import List
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Get the tiktoken encoding of a model, cl100k_base for unknown models"""
+    import tiktoken
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(texts: List[str], model: str) -> List[int]:
+    """
+    Count the tokens of each text
+    
+    Args:
+        texts: Texts to count
+        model: Model whose tokenizer is used
+        
+    Returns:
+        Token count of each text
+    """
+    encoding = get_encoding(model)
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
@@ -0,0 +1,90 @@
+"""
+Shared process pools for CPU-bound work and a background event loop for I/O
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Coroutine, Dict, Optional
+from loguru import logger
+
+
+_pools: Dict[str, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def resolve_worker_count(workers: int) -> int:
+    """Resolve a configured worker count, where 0 means one per CPU"""
+    if workers and workers > 0:
+        return workers
+    return os.cpu_count() or 1
+
+
+def get_process_pool(name: str, max_workers: int) -> ProcessPoolExecutor:
+    """
+    Get or create a named, long-lived process pool
+    
+    Args:
+        name: Pool name, one pool is kept per name
+        max_workers: Worker count used when the pool is created
+        
+    Returns:
+        Process pool executor
+    """
+    with _pools_lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=max_workers)
+            _pools[name] = pool
+            logger.info(f"Process pool '{name}' started with {max_workers} workers")
+        return pool
+
+
+def shutdown_process_pools():
+    """Shut down all process pools"""
+    with _pools_lock:
+        for name, pool in _pools.items():
+            pool.shutdown(wait=True, cancel_futures=True)
+            logger.info(f"Process pool '{name}' shut down")
+        _pools.clear()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Get the shared background event loop, starting it on first use
+    
+    Async clients keep connections bound to the loop that opened them, so
+    synchronous callers share one long-lived loop instead of asyncio.run.
+    
+    Returns:
+        Event loop running in a daemon thread
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="background-loop", daemon=True
+            )
+            thread.start()
+            _loop = loop
+            logger.info("Background event loop started")
+        return _loop
+
+
+def run_coroutine(coroutine: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Run a coroutine on the background event loop and wait for its result
+    
+    Must not be called from the background loop's own thread.
+    
+    Args:
+        coroutine: Coroutine to run
+        
+    Returns:
+        The coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coroutine, get_background_loop()).result()
@@ -0,0 +1,246 @@
+"""
+Benchmark recall@k and memory of reduced-dimension and quantized vector storage
+
+For each stored dimension and rescore dtype, searches the truncated vectors
+for --oversample * k candidates, rescores them with the quantized full
+vectors, and compares the top k with an exact full-precision search. Search
+is brute force, so the numbers isolate storage precision from HNSW recall.
+
+Vectors come from the application's Chroma collection (which must hold full
+vectors), or are synthetic with variance decaying over the dimensions, a
+rough stand-in for Matryoshka embeddings.
+
+Run from the backend directory so the application settings resolve as they
+do for the API server.
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.db.rescore_vectors import dequantize, quantize, reduce_dimensions  # noqa: E402
+
+
+def load_collection_vectors(limit: int) -> np.ndarray:
+    """Load full embeddings from the application's Chroma collection"""
+    from app.core.config import settings
+    from app.db.chroma import get_chroma_collections
+    
+    if settings.EMBEDDING_STORED_DIMENSIONS:
+        raise SystemExit(
+            "The collection stores truncated vectors; benchmark on a collection "
+            "ingested with EMBEDDING_STORED_DIMENSIONS=0"
+        )
+    embeddings = []
+    for collection in get_chroma_collections():
+        if len(embeddings) >= limit:
+            break
+        embeddings.extend(collection.get(include=["embeddings"], limit=limit - len(embeddings))["embeddings"])
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def synthetic_vectors(count: int, dimensions: int, seed: int = 0) -> np.ndarray:
+    """Generate clustered unit vectors whose leading dimensions carry most variance"""
+    rng = np.random.default_rng(seed)
+    scales = 1 / np.sqrt(1 + np.arange(dimensions) / 32)
+    centers = rng.normal(size=(max(count // 50, 1), dimensions)) * scales
+    vectors = centers[rng.integers(len(centers), size=count)]
+    vectors += 0.5 * rng.normal(size=(count, dimensions)) * scales
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def top_k(index: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k by squared L2 distance"""
+    distances = (
+        (queries ** 2).sum(axis=1, keepdims=True)
+        - 2 * queries @ index.T
+        + (index ** 2).sum(axis=1)
+    )
+    candidates = np.argpartition(distances, k, axis=1)[:, :k]
+    rows = np.arange(len(queries))[:, None]
+    return candidates[rows, np.argsort(distances[rows, candidates], axis=1)]
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    """Mean fraction of the true top k found"""
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def run_setting(
+    index: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    dimensions: int,
+    dtype: str,
+    k: int,
+    oversample: int
+) -> dict:
+    """
+    Measure one storage setting
+    
+    Args:
+        index: Full indexed vectors
+        queries: Full query vectors
+        truth: Exact full-precision top k of each query
+        dimensions: Stored dimensions
+        dtype: Rescore vector dtype, or "none" for no rescoring
+        k: Results per query
+        oversample: Candidate multiplier when rescoring
+        
+    Returns:
+        Recall, memory and timing of the setting
+    """
+    full_dimensions = index.shape[1]
+    stored = reduce_dimensions(index, dimensions)
+    reduced_queries = reduce_dimensions(queries, dimensions)
+    
+    side_bytes = 0
+    if dtype != "none":
+        packed = [quantize(vector, dtype) for vector in index]
+        side_bytes = sum(len(data) + 4 for data, _ in packed)
+        full = np.stack([dequantize(data, dtype, scale) for data, scale in packed])
+    
+    started = time.perf_counter()
+    if dtype == "none":
+        found = top_k(stored, reduced_queries, k)
+    else:
+        candidates = top_k(stored, reduced_queries, min(k * oversample, len(index) - 1))
+        found = []
+        for query, ids in zip(queries, candidates):
+            distances = ((full[ids] - query) ** 2).sum(axis=1)
+            found.append(ids[np.argsort(distances)[:k]])
+        found = np.asarray(found)
+    elapsed = time.perf_counter() - started
+    
+    index_bytes = len(index) * dimensions * 4
+    return {
+        "dimensions": dimensions if dimensions < full_dimensions else "full",
+        "rescore": dtype,
+        "recall": recall_at_k(found, truth),
+        "index_mb": index_bytes / 1024 ** 2,
+        "side_mb": side_bytes / 1024 ** 2,
+        "ratio": (len(index) * full_dimensions * 4) / index_bytes,
+        "query_ms": elapsed / len(queries) * 1000
+    }
+
+
+def benchmark(
+    vectors: np.ndarray,
+    dimensions: list,
+    dtypes: list,
+    k: int = 10,
+    oversample: int = 4,
+    query_count: int = 200
+) -> list:
+    """
+    Benchmark every combination of stored dimensions and rescore dtype
+    
+    Args:
+        vectors: Full embedding vectors; query_count of them are held out as queries
+        dimensions: Stored dimensions to test
+        dtypes: Rescore dtypes to test ("none", "float16", "int8")
+        k: Results per query
+        oversample: Candidate multiplier when rescoring
+        query_count: Number of held-out query vectors
+        
+    Returns:
+        One result row per setting
+    """
+    queries, index = vectors[:query_count], vectors[query_count:]
+    truth = top_k(index, queries, k)
+    full_dimensions = index.shape[1]
+    
+    rows = []
+    for dimension in sorted({min(d, full_dimensions) for d in dimensions}):
+        for dtype in dtypes:
+            if dimension == full_dimensions and dtype != "none":
+                continue
+            rows.append(run_setting(index, queries, truth, dimension, dtype, k, oversample))
+    return rows
+
+
+def print_rows(rows: list, k: int, vector_count: int):
+    """Print benchmark results as a table"""
+    print(f"\n{vector_count:,} indexed vectors, recall@{k} against exact full-precision search\n")
+    print(f"{'dims':>6} {'rescore':>8} {'recall':>8} {'index MB':>9} {'side MB':>8} {'index cut':>9} {'ms/query':>9}")
+    for row in rows:
+        print(
+            f"{row['dimensions']:>6} {row['rescore']:>8} {row['recall']:>8.3f} "
+            f"{row['index_mb']:>9.1f} {row['side_mb']:>8.1f} {row['ratio']:>8.1f}x "
+            f"{row['query_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark reduced-dimension and quantized vector storage")
+    parser.add_argument(
+        "--source",
+        choices=["collection", "synthetic"],
+        default="collection",
+        help="Vectors from the Chroma collection or synthetic (default: collection)"
+    )
+    parser.add_argument(
+        "-n", "--count",
+        type=int,
+        default=20000,
+        help="Number of vectors to load or generate (default: 20000)"
+    )
+    parser.add_argument(
+        "--full-dimensions",
+        type=int,
+        default=1536,
+        help="Dimensions of synthetic vectors (default: 1536)"
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        nargs="+",
+        default=[256, 512, 1536],
+        help="Stored dimensions to test (default: 256 512 1536)"
+    )
+    parser.add_argument(
+        "--dtypes",
+        nargs="+",
+        choices=["none", "float16", "int8"],
+        default=["none", "float16", "int8"],
+        help="Rescore vector dtypes to test (default: all)"
+    )
+    parser.add_argument("-k", type=int, default=10, help="Results per query (default: 10)")
+    parser.add_argument(
+        "--oversample",
+        type=int,
+        default=4,
+        help="Candidate multiplier when rescoring (default: 4)"
+    )
+    parser.add_argument(
+        "--queries",
+        type=int,
+        default=200,
+        help="Held-out query vectors (default: 200)"
+    )
+    
+    args = parser.parse_args()
+    
+    if args.source == "collection":
+        vectors = load_collection_vectors(args.count)
+    else:
+        vectors = synthetic_vectors(args.count, args.full_dimensions)
+    if len(vectors) <= args.queries + args.k * args.oversample:
+        raise SystemExit(f"Not enough vectors to benchmark ({len(vectors)})")
+    
+    rows = benchmark(
+        vectors,
+        dimensions=args.dimensions,
+        dtypes=args.dtypes,
+        k=args.k,
+        oversample=args.oversample,
+        query_count=args.queries
+    )
+    print_rows(rows, args.k, len(vectors) - args.queries)
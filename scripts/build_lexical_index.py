@@ -0,0 +1,57 @@
+"""
+Build the BM25 lexical index from chunks already stored in ChromaDB
+
+New chunks are indexed as they are ingested; run this once for collections
+ingested before hybrid search was enabled, or to rebuild the index.
+
+Run from the backend directory so the application settings resolve as they
+do for the API server.
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.db.chroma import get_chroma_collections  # noqa: E402
+from app.db.lexical_index import index_chunks  # noqa: E402
+
+
+def build_lexical_index(page_size: int = 5000) -> int:
+    """
+    Index every stored chunk, page by page and shard by shard
+    
+    Args:
+        page_size: Chunks read from ChromaDB per page
+        
+    Returns:
+        Number of chunks indexed
+    """
+    indexed = 0
+    for collection in get_chroma_collections():
+        offset = 0
+        while True:
+            page = collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            index_chunks(zip(page["ids"], page["documents"]))
+            offset += len(page["ids"])
+            indexed += len(page["ids"])
+            print(f"Indexed {indexed:,} chunks")
+    return indexed
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Build the BM25 lexical index from the Chroma collection")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=5000,
+        help="Chunks read from ChromaDB per page (default: 5000)"
+    )
+    
+    args = parser.parse_args()
+    total = build_lexical_index(args.page_size)
+    print(f"Lexical index holds {total:,} chunks")
@@ -0,0 +1,330 @@
+"""
+Bulk-load folders of documents and multi-GB files into the RAG vector store
+
+Calls DocumentService directly instead of going through the HTTP upload
+endpoint. Progress is recorded in a checkpoint file, so an interrupted run
+picks up where it stopped: finished files are skipped and large CSVs resume
+from the last stored row.
+
+Run from the backend directory so the application settings and data paths
+resolve as they do for the API server.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.document_service import DocumentService, keyed_document_id  # noqa: E402
+
+SUPPORTED_SUFFIXES = {".pdf", ".csv"}
+
+
+class Checkpoint:
+    """JSON checkpoint of finished files and partially ingested CSVs"""
+    
+    def __init__(self, path: Path, save_interval: float = 2.0):
+        self.path = path
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        if path.exists():
+            self.data = json.loads(path.read_text())
+        else:
+            self.data = {"files": {}}
+    
+    def get(self, key: str) -> dict:
+        """Get the checkpoint entry of a file"""
+        with self._lock:
+            return dict(self.data["files"].get(key, {}))
+    
+    def update(self, key: str, force_save: bool = False, **fields):
+        """Update the checkpoint entry of a file and save periodically"""
+        with self._lock:
+            self.data["files"].setdefault(key, {}).update(fields)
+            if force_save or time.monotonic() - self._last_save >= self.save_interval:
+                self._save()
+    
+    def save(self):
+        """Write the checkpoint to disk"""
+        with self._lock:
+            self._save()
+    
+    def _save(self):
+        # Write to a temp file and rename, so a crash never leaves a torn checkpoint
+        temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        temp_path.write_text(json.dumps(self.data, indent=2))
+        os.replace(temp_path, self.path)
+        self._last_save = time.monotonic()
+
+
+class ThroughputReporter:
+    """Prints aggregate rows/sec and chunks/sec while files are ingested"""
+    
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._per_file = {}
+        self._finished_rows = 0
+        self._finished_chunks = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._started = time.monotonic()
+    
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._print()
+    
+    def update(self, key: str, totals: dict):
+        """Record the latest counters of a file being ingested"""
+        with self._lock:
+            self._per_file[key] = (totals["rows_parsed"], totals["chunks_stored"])
+    
+    def finish(self, key: str):
+        """Fold the counters of a finished file into the totals"""
+        with self._lock:
+            rows, chunks = self._per_file.pop(key, (0, 0))
+            self._finished_rows += rows
+            self._finished_chunks += chunks
+    
+    def _totals(self):
+        with self._lock:
+            rows = self._finished_rows + sum(rows for rows, _ in self._per_file.values())
+            chunks = self._finished_chunks + sum(chunks for _, chunks in self._per_file.values())
+        return rows, chunks
+    
+    def _print(self):
+        rows, chunks = self._totals()
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        print(
+            f"  {rows:,} rows ({rows / elapsed:,.0f} rows/sec), "
+            f"{chunks:,} chunks stored ({chunks / elapsed:,.0f} chunks/sec), "
+            f"{elapsed:,.0f}s elapsed",
+            flush=True
+        )
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._print()
+
+
+def discover_files(inputs: list) -> list:
+    """
+    Expand input paths into the list of supported files
+    
+    Args:
+        inputs: Files and directories; directories are searched recursively
+        
+    Returns:
+        Sorted list of PDF and CSV file paths
+    """
+    files = []
+    for item in inputs:
+        path = Path(item).resolve()
+        if path.is_dir():
+            files.extend(
+                p for p in path.rglob("*")
+                if p.is_file() and p.suffix.lower() in SUPPORTED_SUFFIXES
+            )
+        elif path.is_file() and path.suffix.lower() in SUPPORTED_SUFFIXES:
+            files.append(path)
+        else:
+            print(f"⚠ Skipping unsupported or missing path: {item}")
+    return sorted(set(files))
+
+
+def ingest_file(
+    service: DocumentService,
+    path: Path,
+    checkpoint: Checkpoint,
+    reporter: ThroughputReporter,
+    key_column: str = None
+) -> dict:
+    """
+    Ingest one file, resuming from its checkpoint entry when possible
+    
+    Args:
+        service: Document service used for ingestion
+        path: File to ingest
+        checkpoint: Run checkpoint
+        reporter: Throughput reporter
+        key_column: Primary-key column for incremental CSV ingestion
+        
+    Returns:
+        Processing result, or None when the file was already done
+    """
+    key = str(path)
+    stat = path.stat()
+    entry = checkpoint.get(key)
+    unchanged = entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+    
+    if unchanged and entry.get("status") == "done":
+        return None
+    
+    is_csv = path.suffix.lower() == ".csv"
+    if is_csv and key_column:
+        document_id = keyed_document_id(path.name)
+    elif unchanged and entry.get("document_id"):
+        document_id = entry["document_id"]
+    else:
+        document_id = str(uuid.uuid4())
+    
+    # Keyed CSVs are always read in full so deleted rows can be detected
+    start_row = entry.get("rows_committed", 0) if unchanged and is_csv and not key_column else 0
+    if start_row:
+        print(f"↻ Resuming {path.name} from row {start_row:,}")
+    
+    checkpoint.update(
+        key,
+        force_save=True,
+        status="running",
+        document_id=document_id,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        rows_committed=start_row
+    )
+    
+    def progress(totals: dict):
+        reporter.update(key, totals)
+        if totals["rows_committed"]:
+            checkpoint.update(key, rows_committed=totals["rows_committed"])
+    
+    try:
+        result = service.ingest_file(
+            file_path=path,
+            filename=path.name,
+            document_id=document_id,
+            key_column=key_column if is_csv else None,
+            start_row=start_row,
+            progress=progress
+        )
+    finally:
+        reporter.finish(key)
+    
+    checkpoint.update(key, force_save=True, status="done", chunks=result["chunks"])
+    return result
+
+
+def bulk_ingest(
+    inputs: list,
+    checkpoint_path: str,
+    workers: int = 4,
+    batch_size: int = None,
+    key_column: str = None,
+    report_interval: float = 5.0
+) -> int:
+    """
+    Ingest every PDF and CSV under the given paths
+    
+    Args:
+        inputs: Files and directories to ingest
+        checkpoint_path: Checkpoint file used to resume interrupted runs
+        workers: Number of files parsed and ingested concurrently
+        batch_size: Embedding batch size (defaults to EMBEDDING_BATCH_SIZE)
+        key_column: Primary-key column for incremental CSV ingestion
+        report_interval: Seconds between throughput reports
+        
+    Returns:
+        Number of files that failed
+    """
+    files = discover_files(inputs)
+    checkpoint = Checkpoint(Path(checkpoint_path))
+    print(f"Found {len(files)} files, checkpoint: {checkpoint_path}")
+    
+    service = DocumentService()
+    if batch_size:
+        service.embedding_service.batch_size = batch_size
+    
+    reporter = ThroughputReporter(interval=report_interval)
+    reporter.start()
+    failed = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(ingest_file, service, path, checkpoint, reporter, key_column): path
+                for path in files
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    result = future.result()
+                    if result is None:
+                        print(f"- Skipped {path.name} (already ingested)")
+                    else:
+                        print(f"✓ {path.name}: {result['chunks']} chunks stored")
+                except Exception as e:
+                    failed += 1
+                    checkpoint.update(str(path), force_save=True, status="failed", error=str(e))
+                    print(f"✗ {path.name}: {e}")
+    finally:
+        reporter.stop()
+        checkpoint.save()
+    
+    print(f"\nDone: {len(files) - failed} succeeded, {failed} failed")
+    return failed
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Bulk-load documents into the RAG vector store")
+    parser.add_argument(
+        "inputs",
+        type=str,
+        nargs="+",
+        help="PDF/CSV files or directories (searched recursively)"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default="data/bulk_ingest_checkpoint.json",
+        help="Checkpoint file used to resume interrupted runs"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=4,
+        help="Number of files ingested concurrently (default: 4)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=None,
+        help="Embedding batch size (default: EMBEDDING_BATCH_SIZE)"
+    )
+    parser.add_argument(
+        "--key-column",
+        type=str,
+        default=None,
+        help="Primary-key column for incremental CSV ingestion"
+    )
+    parser.add_argument(
+        "--report-interval",
+        type=float,
+        default=5.0,
+        help="Seconds between throughput reports (default: 5)"
+    )
+    
+    args = parser.parse_args()
+    
+    Path(args.checkpoint).parent.mkdir(parents=True, exist_ok=True)
+    failures = bulk_ingest(
+        inputs=args.inputs,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        key_column=args.key_column,
+        report_interval=args.report_interval
+    )
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,164 @@
+"""
+Load-test query throughput of the API, optionally across reader pool sizes
+
+Sends queries from a fixed number of concurrent clients for a set time and
+reports queries/sec and latency percentiles. By default it calls the
+retrieval-only endpoint, which exercises query embedding, vector and
+keyword search and re-ranking without paying for LLM generation.
+
+With --readers, a cluster (Chroma server, writer, reader pool) is started
+for each reader count in turn, so the table shows how throughput scales
+with the number of query worker processes.
+
+Run from the backend directory so the application settings and data paths
+resolve as they do for the API server.
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from serve_cluster import start_cluster, stop_cluster  # noqa: E402
+from app.core.config import settings  # noqa: E402
+
+SAMPLE_QUERIES = [
+    "wireless headphones with noise cancelling",
+    "laptops under $800",
+    "stainless steel water bottle",
+    "what is the return policy",
+    "running shoes for trail",
+    "4k monitor for photo editing",
+    "organic cotton t-shirt",
+    "budget mechanical keyboard"
+]
+
+ENDPOINTS = {"retrieve": "/api/v1/query/retrieve", "query": "/api/v1/query"}
+
+
+async def run_load(
+    base_url: str,
+    queries: List[str],
+    concurrency: int,
+    duration: float,
+    endpoint: str = "retrieve"
+) -> dict:
+    """
+    Send queries from concurrent clients for a fixed duration
+    
+    Args:
+        base_url: API base URL
+        queries: Query texts, sent round-robin
+        concurrency: Clients with one request in flight each
+        duration: Seconds to send requests for
+        endpoint: "retrieve" (no LLM) or "query" (full RAG workflow)
+        
+    Returns:
+        Throughput, latency percentiles and error count
+    """
+    latencies = []
+    errors = 0
+    sent = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        deadline = time.perf_counter() + duration
+        
+        async def worker():
+            nonlocal errors, sent
+            while time.perf_counter() < deadline:
+                query = queries[sent % len(queries)]
+                sent += 1
+                started = time.perf_counter()
+                try:
+                    # Repeated queries would otherwise be served from the answer and retrieval caches
+                    response = await client.post(
+                        ENDPOINTS[endpoint],
+                        json={"query": query, "bypass_cache": True}
+                    )
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except httpx.HTTPError:
+                    errors += 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "qps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    }
+
+
+def print_row(label: str, result: dict):
+    print(
+        f"{label:>8} {result['qps']:>9.1f} {result['p50_ms']:>9.1f} "
+        f"{result['p95_ms']:>9.1f} {result['requests']:>9} {result['errors']:>7}"
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Load-test query throughput")
+    parser.add_argument(
+        "--url",
+        default=f"http://127.0.0.1:{settings.READER_PORT}",
+        help="API to test when --readers is not given (default: the reader pool)"
+    )
+    parser.add_argument(
+        "--readers",
+        type=int,
+        nargs="+",
+        help="Start a cluster with each number of query workers and test it, e.g. 1 2 4"
+    )
+    parser.add_argument(
+        "--endpoint",
+        choices=sorted(ENDPOINTS),
+        default="retrieve",
+        help="retrieve (search only) or query (with LLM generation) (default: retrieve)"
+    )
+    parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=32,
+        help="Concurrent clients (default: 32)"
+    )
+    parser.add_argument(
+        "-d", "--duration",
+        type=float,
+        default=20.0,
+        help="Seconds per test (default: 20)"
+    )
+    parser.add_argument(
+        "--queries-file",
+        type=Path,
+        help="Text file with one query per line (default: built-in samples)"
+    )
+    
+    args = parser.parse_args()
+    queries = SAMPLE_QUERIES
+    if args.queries_file:
+        queries = [line.strip() for line in args.queries_file.read_text().splitlines() if line.strip()]
+    
+    print(f"\n{args.concurrency} clients, {args.duration:.0f}s per test, /{args.endpoint}\n")
+    print(f"{'readers':>8} {'qps':>9} {'p50 ms':>9} {'p95 ms':>9} {'requests':>9} {'errors':>7}")
+    if not args.readers:
+        print_row("-", asyncio.run(run_load(args.url, queries, args.concurrency, args.duration, args.endpoint)))
+    for readers in args.readers or []:
+        cluster = start_cluster(readers, settings.READER_PORT)
+        try:
+            url = f"http://127.0.0.1:{settings.READER_PORT}"
+            print_row(str(readers), asyncio.run(run_load(url, queries, args.concurrency, args.duration, args.endpoint)))
+        finally:
+            stop_cluster(cluster)
@@ -0,0 +1,252 @@
+"""
+Slim the metadata of chunks stored before document-level fields moved out of ChromaDB
+
+Older chunks repeat their document's filename, type, upload date, chunk
+count and (for keyed CSVs) row key in every chunk's metadata. This records
+their documents in the document registry, where search results now get
+those fields from, and rewrites each chunk's metadata down to its document
+ID, chunk index and chunk-level fields (PDF pages, typed CSV columns).
+
+ChromaDB merges metadata on update, so chunks are re-added page by page
+with their stored embeddings; no embeddings are recomputed and the lexical
+index is left as is. Each page is written to a journal file before it is
+deleted, and a journal left by an interrupted run is replayed first, so a
+crash never loses chunks and the migration can simply be run again. Stop
+the API while it runs.
+
+Run from the backend directory so the application settings resolve as they
+do for the API server.
+"""
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core.config import settings  # noqa: E402
+from app.db.chroma import get_chroma_client, get_chroma_collections  # noqa: E402
+from app.db.collection_version import bump_collection_version  # noqa: E402
+from app.db.document_registry import (  # noqa: E402
+    add_document_chunks,
+    get_document,
+    register_document,
+    set_document_chunks,
+    set_document_total_chunks
+)
+
+# Metadata fields that now come from the document registry
+DOCUMENT_FIELDS = ("source", "document_type", "upload_date", "total_chunks", "row_key")
+
+# Page being rewritten, kept until it is stored again
+DEFAULT_JOURNAL = Path(settings.METADATA_DB_PATH).parent / "chunk_metadata_migration.journal"
+
+
+def slim_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Chunk metadata without the document-level fields"""
+    return {key: value for key, value in metadata.items() if key not in DOCUMENT_FIELDS}
+
+
+def _collect_documents(collection, page_size: int, documents: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Find the chunks to migrate in a collection, tallying their documents
+    
+    Args:
+        collection: Chroma collection
+        page_size: Chunks read per page
+        documents: Document records by ID, updated in place
+        
+    Returns:
+        IDs of the chunks with document-level fields in their metadata
+    """
+    chunk_ids = []
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            return chunk_ids
+        offset += len(page["ids"])
+        for chunk_id, metadata in zip(page["ids"], page["metadatas"]):
+            metadata = metadata or {}
+            if "document_id" not in metadata or not any(key in metadata for key in DOCUMENT_FIELDS):
+                continue
+            chunk_ids.append(chunk_id)
+            document = documents.setdefault(metadata["document_id"], {
+                "filename": metadata.get("source", "unknown"),
+                "document_type": metadata.get("document_type", "unknown"),
+                "upload_date": metadata.get("upload_date", ""),
+                "keyed": False,
+                "chunks": 0,
+                "chunk_index_end": 0,
+                "total_chunks": metadata.get("total_chunks")
+            })
+            document["keyed"] = document["keyed"] or "row_key" in metadata
+            document["chunks"] += 1
+            document["chunk_index_end"] = max(
+                document["chunk_index_end"], metadata.get("chunk_index", -1) + 1
+            )
+
+
+def _register_documents(documents: Dict[str, Dict[str, Any]]) -> int:
+    """Add the documents missing from the registry, returning how many were added"""
+    registered = 0
+    for document_id, document in documents.items():
+        if get_document(document_id) is not None:
+            continue
+        # The original file size is not kept in chunk metadata
+        register_document(
+            document_id,
+            document["filename"],
+            document["document_type"],
+            size_bytes=0,
+            upload_date=document["upload_date"],
+            keyed=document["keyed"]
+        )
+        if document["keyed"]:
+            set_document_chunks(document_id, document["chunks"])
+        else:
+            add_document_chunks(document_id, document["chunks"], document["chunk_index_end"])
+        if document["total_chunks"] is not None:
+            set_document_total_chunks(document_id, document["total_chunks"])
+        registered += 1
+    return registered
+
+
+def _write_journal(journal: Path, page: Dict[str, Any]):
+    """Durably record a page before its chunks are deleted"""
+    temp_path = journal.with_suffix(".tmp")
+    with open(temp_path, "w") as f:
+        json.dump(page, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, journal)
+
+
+def _store_page(collection, page: Dict[str, Any]):
+    """Replace the page's chunks with their journaled slim version"""
+    stored = collection.get(ids=page["ids"], include=[])["ids"]
+    if stored:
+        collection.delete(ids=stored)
+    collection.add(
+        ids=page["ids"],
+        embeddings=page["embeddings"],
+        documents=page["documents"],
+        metadatas=page["metadatas"]
+    )
+
+
+def replay_journal(journal: Path) -> int:
+    """
+    Finish the page an interrupted run was rewriting
+    
+    Args:
+        journal: Journal file path
+        
+    Returns:
+        Number of chunks restored
+    """
+    if not journal.exists():
+        return 0
+    page = json.loads(journal.read_text())
+    _store_page(get_chroma_client().get_collection(page["collection"]), page)
+    journal.unlink()
+    print(f"Restored {len(page['ids']):,} chunks of an interrupted page in {page['collection']}")
+    return len(page["ids"])
+
+
+def _rewrite_chunks(collection, chunk_ids: List[str], page_size: int, journal: Path) -> int:
+    """Re-add chunks with slim metadata, page by page"""
+    rewritten = 0
+    for start in range(0, len(chunk_ids), page_size):
+        page = collection.get(
+            ids=chunk_ids[start:start + page_size],
+            include=["embeddings", "documents", "metadatas"]
+        )
+        _write_journal(journal, {
+            "collection": collection.name,
+            "ids": page["ids"],
+            "embeddings": [[float(value) for value in embedding] for embedding in page["embeddings"]],
+            "documents": page["documents"],
+            "metadatas": [slim_metadata(metadata) for metadata in page["metadatas"]]
+        })
+        _store_page(collection, json.loads(journal.read_text()))
+        journal.unlink()
+        rewritten += len(page["ids"])
+        print(f"Rewrote {rewritten:,}/{len(chunk_ids):,} chunks in {collection.name}")
+    return rewritten
+
+
+def migrate_chunk_metadata(
+    page_size: int = 1000,
+    dry_run: bool = False,
+    journal: Optional[Path] = None
+) -> Dict[str, int]:
+    """
+    Register the documents of stored chunks and slim the chunks' metadata
+    
+    Args:
+        page_size: Chunks read and rewritten per page
+        dry_run: Only count what would be migrated
+        journal: File holding the page being rewritten (default: next to METADATA_DB_PATH)
+        
+    Returns:
+        Counts of chunks to migrate, documents registered, chunks rewritten
+        and chunks restored from an interrupted run
+    """
+    journal = Path(journal or DEFAULT_JOURNAL)
+    restored = 0 if dry_run else replay_journal(journal)
+    collections = get_chroma_collections()
+    documents: Dict[str, Dict[str, Any]] = {}
+    chunk_ids = {
+        collection.name: _collect_documents(collection, page_size, documents)
+        for collection in collections
+    }
+    stats = {
+        "chunks": sum(len(ids) for ids in chunk_ids.values()),
+        "documents": len(documents),
+        "registered": 0,
+        "rewritten": 0,
+        "restored": restored
+    }
+    if dry_run:
+        return stats
+    
+    # Register first, so search results keep their fields while chunks are rewritten
+    stats["registered"] = _register_documents(documents)
+    for collection in collections:
+        stats["rewritten"] += _rewrite_chunks(collection, chunk_ids[collection.name], page_size, journal)
+    if stats["rewritten"] or restored:
+        bump_collection_version(settings.CHROMA_COLLECTION_NAME)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Move document-level fields out of chunk metadata")
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Chunks read and rewritten per page (default: 1000)"
+    )
+    parser.add_argument(
+        "--journal",
+        type=Path,
+        default=DEFAULT_JOURNAL,
+        help=f"File holding the page being rewritten, replayed after a crash (default: {DEFAULT_JOURNAL})"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report how many chunks and documents would be migrated"
+    )
+    
+    args = parser.parse_args()
+    result = migrate_chunk_metadata(args.page_size, args.dry_run, args.journal)
+    print(
+        f"{result['chunks']:,} chunks of {result['documents']:,} documents to migrate; "
+        f"registered {result['registered']:,} documents, rewrote {result['rewritten']:,} chunks"
+    )
@@ -0,0 +1,135 @@
+"""
+Run the API as one writer process and a pool of read-only query workers
+
+Starts a local Chroma server on CHROMA_DB_PATH, a writer API process that
+owns ingestion (uploads, deletes, the job queue) on API_PORT, and
+READER_WORKERS query processes sharing READER_PORT. Every process talks to
+ChromaDB through the server, so readers see new chunks as soon as the
+writer stores them; the SQLite stores (lexical index, caches, job queue)
+are shared files on the same host.
+
+Run from the backend directory so the application settings and data paths
+resolve as they do for the API server.
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.core.config import settings  # noqa: E402
+
+
+def wait_until_ready(url: str, timeout: float = 60.0):
+    """Poll a URL until it answers with a success status"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).is_success:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def _api_process(role: str, port: int, workers: int = 1) -> subprocess.Popen:
+    """Start uvicorn with the given deployment role"""
+    env = dict(os.environ, DEPLOYMENT_ROLE=role, CHROMA_MODE="http")
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", settings.API_HOST,
+            "--port", str(port),
+            "--workers", str(workers)
+        ],
+        cwd=BACKEND_DIR,
+        env=env
+    )
+
+
+def start_cluster(readers: int, reader_port: int) -> List[subprocess.Popen]:
+    """
+    Start the Chroma server, the writer and the reader pool
+    
+    Args:
+        readers: Query worker processes
+        reader_port: Port shared by the query workers
+        
+    Returns:
+        Started processes, in start order
+    """
+    processes = []
+    try:
+        processes.append(subprocess.Popen(
+            [
+                sys.executable, "-m", "chromadb.cli.cli", "run",
+                "--path", settings.CHROMA_DB_PATH,
+                "--host", settings.CHROMA_HOST,
+                "--port", str(settings.CHROMA_PORT)
+            ],
+            cwd=BACKEND_DIR
+        ))
+        wait_until_ready(f"http://{settings.CHROMA_HOST}:{settings.CHROMA_PORT}/api/v1/heartbeat")
+        
+        # The writer creates the collection before readers look it up
+        processes.append(_api_process("writer", settings.API_PORT))
+        wait_until_ready(f"http://127.0.0.1:{settings.API_PORT}/health")
+        
+        processes.append(_api_process("reader", reader_port, readers))
+        wait_until_ready(f"http://127.0.0.1:{reader_port}/health")
+    except BaseException:
+        stop_cluster(processes)
+        raise
+    return processes
+
+
+def stop_cluster(processes: List[subprocess.Popen], timeout: float = 30.0):
+    """Stop the processes in reverse start order"""
+    for process in reversed(processes):
+        if process.poll() is None:
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run a writer process and read-only query workers")
+    parser.add_argument(
+        "-n", "--readers",
+        type=int,
+        default=settings.READER_WORKERS,
+        help=f"Query worker processes (default: READER_WORKERS = {settings.READER_WORKERS})"
+    )
+    parser.add_argument(
+        "--reader-port",
+        type=int,
+        default=settings.READER_PORT,
+        help=f"Port of the query workers (default: READER_PORT = {settings.READER_PORT})"
+    )
+    
+    args = parser.parse_args()
+    cluster = start_cluster(args.readers, args.reader_port)
+    print(
+        f"Writer on :{settings.API_PORT}, {args.readers} readers on :{args.reader_port}, "
+        f"Chroma server on {settings.CHROMA_HOST}:{settings.CHROMA_PORT} (Ctrl+C to stop)"
+    )
+    try:
+        while all(process.poll() is None for process in cluster):
+            time.sleep(1)
+        print("A process exited, stopping the cluster")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_cluster(cluster)
@@ -2,8 +2,12 @@
 Tests for Langgraph agents
 """
 import pytest
+from app.core.clients import get_client_registry
+from app.core.config import settings
+from app.agents import orchestrator, retrieval_agent
 from app.agents.query_agent import classify_query, QueryState
-from app.agents.retrieval_agent import retrieve_context, RetrievalState
+from app.agents.retrieval_agent import aretrieve_context, retrieve_context, RetrievalState
+from app.services.answer_cache import MemoryAnswerCache
 
 
 @pytest.mark.asyncio
@@ -31,13 +35,49 @@ async def test_retrieve_context():
         "query": "test query",
         "intent": "document_search",
         "filters": {},
+        "n_results": 5,
+        "search_mode": "hybrid",
         "query_embedding": [],
         "retrieved_chunks": [],
         "context": "",
-        "sources": []
+        "sources": [],
+        "error": ""
     }
     
     result = retrieve_context(state)
     assert "retrieved_chunks" in result
     assert "context" in result
     assert "sources" in result
+
+
+def test_client_registry_reuses_chat_models():
+    """Test chat models are shared per temperature and use the pooled HTTP client"""
+    registry = get_client_registry()
+    assert registry.chat_model(temperature=0.1) is registry.chat_model(temperature=0.1)
+    assert registry.chat_model(temperature=0.1) is not registry.chat_model(temperature=0.2)
+    assert registry.embedding_service is registry.embedding_service
+    assert "connections" in registry.stats()["sync"]
+
+
+@pytest.mark.asyncio
+async def test_failed_retrieval_is_not_cached(tmp_path, monkeypatch):
+    """Test an answer given without context because retrieval failed is not cached"""
+    def unavailable(*args, **kwargs):
+        raise ConnectionError("vector store unavailable")
+    
+    class AnswerWithoutContext:
+        async def ainvoke(self, state):
+            state = await aretrieve_context(state)
+            return {**state, "answer": "No information found.", "metadata": {}}
+    
+    cache = MemoryAnswerCache()
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(settings, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(retrieval_agent, "cached_search", unavailable)
+    monkeypatch.setattr(orchestrator, "rag_workflow", AnswerWithoutContext())
+    monkeypatch.setattr(orchestrator, "get_answer_cache", lambda: cache)
+    
+    response = await orchestrator.process_query("What is the return policy?")
+    assert response["retrieved_chunks"] == []
+    assert response["metadata"]["cache"] == "miss"
+    assert cache.count() == 0
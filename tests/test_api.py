@@ -3,11 +3,22 @@ Tests for API endpoints
 """
 import pytest
 from fastapi.testclient import TestClient
+from app.core.config import settings
 from app.main import app
+from app.services import ingestion_queue
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    """Keep job rows and uploaded files out of the real data directory"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path / "documents"))
+    # The queue's document service holds the upload directory it was created with
+    monkeypatch.setattr(ingestion_queue, "_queue", None)
+
+
 def test_root_endpoint():
     """Test root endpoint"""
     response = client.get("/")
@@ -33,3 +44,55 @@ def test_query_endpoint_valid():
     response = client.post("/api/v1/query", json={"query": "What is this?"})
     # May return 200 or 500 depending on ChromaDB state
     assert response.status_code in [200, 500]
+
+
+def test_query_endpoints_reject_out_of_range_n_results():
+    """Test n_results outside 1..MAX_N_RESULTS is rejected before searching"""
+    for n_results in (0, -1, settings.MAX_N_RESULTS + 1):
+        for path in ("/api/v1/query", "/api/v1/query/retrieve"):
+            response = client.post(path, json={"query": "laptops", "n_results": n_results})
+            assert response.status_code == 422
+
+
+def test_upload_returns_queued_job():
+    """Test document upload is queued and its job can be polled"""
+    response = client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("products.csv", b"name,price\nLaptop,999\n", "text/csv")}
+    )
+    assert response.status_code == 202
+    job = response.json()
+    assert job["status"] == "queued"
+    
+    status = client.get(f"/api/v1/documents/jobs/{job['job_id']}")
+    assert status.status_code == 200
+    assert status.json()["job_id"] == job["job_id"]
+
+
+def test_unknown_job_not_found():
+    """Test polling an unknown ingestion job"""
+    response = client.get("/api/v1/documents/jobs/does-not-exist")
+    assert response.status_code == 404
+
+
+def test_upload_rejects_oversized_file(monkeypatch):
+    """Test uploads above MAX_FILE_SIZE_MB are rejected"""
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE_MB", 0)
+    response = client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("products.csv", b"name,price\nLaptop,999\n", "text/csv")}
+    )
+    assert response.status_code == 400
+
+
+def test_reader_rejects_document_writes(monkeypatch):
+    """Test query-only workers refuse uploads and deletes"""
+    monkeypatch.setattr(settings, "DEPLOYMENT_ROLE", "reader")
+    
+    response = client.post(
+        "/api/v1/documents/upload",
+        files={"file": ("products.csv", b"name,price\nLaptop,999\n", "text/csv")}
+    )
+    assert response.status_code == 405
+    assert client.delete("/api/v1/documents/some-id").status_code == 405
+    assert client.post("/api/v1/query/retrieve", json={"query": ""}).status_code == 400
@@ -1,9 +1,39 @@
 """
 Tests for service layer
 """
+import asyncio
+import threading
+import chromadb
+import numpy as np
 import pytest
+from io import BytesIO
+from app.core.config import settings
 from app.services.chunking_service import ChunkingService
-from app.utils.parsers import parse_csv, get_file_type
+from app.services.embedding_providers import EmbeddingProvider, OpenAIEmbeddingProvider, get_embedding_provider
+from app.services.embedding_service import EmbeddingService
+from app.services.query_batcher import QueryEmbeddingBatcher
+from app.services.ingestion_pipeline import ChunkBatch, IngestionPipeline
+from app.services.answer_cache import MemoryAnswerCache, SQLiteAnswerCache, answer_cache_key
+from app.services import query_filters
+from app.services.reranking import maximal_marginal_relevance
+from app.services.retrieval_cache import RetrievalCache
+from app.services.search_service import join_document_fields, reciprocal_rank_fusion
+from app.agents.retrieval_agent import source_condition
+from app.services import document_service
+from app.db import chroma, lexical_index
+from app.db.chroma_async import VectorStoreExecutor
+from app.db.document_registry import add_document_chunks, get_document, list_documents, register_document
+from app.db.collection_version import bump_collection_version, get_collection_version
+from app.db.facets import register_facet_values
+from app.db.jobs import create_job, get_job
+from app.db.row_index import get_document_chunk_ids
+from app.db.sqlite import get_sqlite_connection
+from app.db.chroma import EmbeddingModelMismatchError, _check_embedding_model
+from app.db.chunk_index import get_owned_chunk_ids, hash_chunk
+from app.db.embedding_cache import EmbeddingCache, hash_text
+from app.db.rescore_vectors import dequantize, quantize, reduce_dimensions
+from app.utils.loop_lag import EventLoopLagMonitor
+from app.utils.parsers import iter_csv_rows, get_file_type
 
 
 def test_chunking_service():
@@ -15,8 +45,732 @@ def test_chunking_service():
     assert all(isinstance(chunk, str) for chunk in chunks)
 
 
+def test_chunk_spans_match_chunk_text():
+    """Test chunk spans slice back to the chunk texts"""
+    service = ChunkingService(chunk_size=50, chunk_overlap=10)
+    text = "Intro paragraph.\n\n" + "Some words in a sentence. " * 8 + "\n" + "x" * 120
+    spans = service.chunk_spans(text)
+    assert [text[start:end] for start, end in spans] == service.chunk_text(text)
+    assert all(end - start <= 50 for start, end in spans[:-1])
+
+
+def test_chunking_matches_langchain_splitter():
+    """Test chunk boundaries match LangChain's RecursiveCharacterTextSplitter"""
+    text_splitter = pytest.importorskip("langchain.text_splitter")
+    text = ("Header line\n\n" + "alpha beta gamma delta. " * 20 + "\n") * 5 + "y" * 300
+    for chunk_size, chunk_overlap in [(100, 20), (60, 30), (250, 1)]:
+        expected = text_splitter.RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap
+        ).split_text(text)
+        service = ChunkingService(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        assert service.chunk_text(text) == expected
+
+
 def test_get_file_type():
     """Test file type detection"""
     assert get_file_type("document.pdf") == "pdf"
     assert get_file_type("data.csv") == "csv"
     assert get_file_type("file.txt") == "txt"
+
+
+def test_iter_csv_rows_converts_rows_to_text():
+    """Test CSV rows are converted to text with column context"""
+    content = b"name,price\nLaptop,999\nMouse,25\n"
+    texts = [text for rows in iter_csv_rows(BytesIO(content)) for text in rows.texts]
+    assert texts == ["name: Laptop, price: 999", "name: Mouse, price: 25"]
+
+
+def test_iter_csv_rows_batches():
+    """Test CSV streaming yields bounded batches"""
+    content = b"sku,qty\n" + b"".join(f"A{i},{i}\n".encode() for i in range(10))
+    batches = list(iter_csv_rows(BytesIO(content), chunk_rows=4))
+    assert [len(rows) for rows in batches] == [4, 4, 2]
+    assert batches[0].texts[0] == "sku: A0, qty: 0"
+
+
+def test_iter_csv_rows_text_independent_of_batch_size():
+    """Test row texts are the literal cells whatever batch a row falls in"""
+    content = b"sku,qty\nA,5\nB,\nC,7\n"
+    for chunk_rows in (1, 2, 10):
+        texts = [text for rows in iter_csv_rows(BytesIO(content), chunk_rows=chunk_rows) for text in rows.texts]
+        assert texts == ["sku: A, qty: 5", "sku: B, qty: ", "sku: C, qty: 7"]
+
+
+def test_chunk_pages_tracks_page_numbers():
+    """Test page-aware chunking reports the pages each chunk spans"""
+    service = ChunkingService(chunk_size=40, chunk_overlap=5)
+    pages = ["First page text. " * 3, "Second page text. " * 3]
+    chunks = service.chunk_pages(pages)
+    assert [chunk for chunk, _, _ in chunks] == service.chunk_text("".join(f"{p}\n" for p in pages))
+    assert chunks[0][1] == 1
+    assert chunks[-1][2] == 2
+    assert all(start <= end for _, start, end in chunks)
+
+
+def test_ingestion_pipeline_preserves_order():
+    """Test pipelined stages deliver every batch in order"""
+    stored = []
+    pipeline = IngestionPipeline(
+        source_name="parse",
+        stages=[
+            ("chunk", lambda rows: [rows[i:i + 3] for i in range(0, len(rows), 3)]),
+            ("embed", lambda batch: [[value * 2 for value in batch]]),
+            ("store", lambda batch: stored.extend(batch) or [])
+        ],
+        queue_size=1
+    )
+    stats = pipeline.run([list(range(i * 10, (i + 1) * 10)) for i in range(4)])
+    assert stored == [value * 2 for value in range(40)]
+    assert stats["store"]["items"] == 40
+
+
+def test_ingestion_pipeline_propagates_errors():
+    """Test a failing stage stops the pipeline and raises"""
+    def fail(batch):
+        raise RuntimeError("embedding failed")
+    
+    pipeline = IngestionPipeline(source_name="parse", stages=[("embed", fail)])
+    with pytest.raises(RuntimeError):
+        pipeline.run([[1, 2, 3]] * 10)
+
+
+def test_chunk_batch_select_keeps_alignment():
+    """Test filtering a batch keeps chunk indexes, hashes and metadata aligned"""
+    chunks = ["alpha", "beta", "alpha"]
+    batch = ChunkBatch(
+        chunk_indexes=[10, 11, 12],
+        chunks=chunks,
+        extra_metadatas=[{"page_start": i} for i in range(3)],
+        content_hashes=[hash_chunk(chunk) for chunk in chunks]
+    )
+    selected = batch.select([1])
+    assert selected.chunk_indexes == [11]
+    assert selected.chunks == ["beta"]
+    assert selected.extra_metadatas == [{"page_start": 1}]
+    assert batch.content_hashes[0] == batch.content_hashes[2]
+
+
+def test_iter_csv_rows_keys_rows():
+    """Test keyed CSV streaming pairs each row text with its primary key"""
+    content = b"product_id,name\n007,Laptop\n42,Mouse\n"
+    rows = next(iter_csv_rows(BytesIO(content), key_column="product_id"))
+    assert rows.keys == ["007", "42"]
+    assert rows.texts == ["product_id: 007, name: Laptop", "product_id: 42, name: Mouse"]
+
+
+def test_iter_csv_rows_missing_key_column():
+    """Test keyed CSV streaming rejects an unknown key column"""
+    with pytest.raises(ValueError):
+        list(iter_csv_rows(BytesIO(b"name\nLaptop\n"), key_column="product_id"))
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    """Test cached embeddings round-trip and the LRU entry is evicted"""
+    cache = EmbeddingCache(db_path=str(tmp_path / "cache.db"), max_entries=2)
+    cache.put_many("model", [(hash_text("a"), [0.5, 1.0]), (hash_text("b"), [2.0, 4.0])])
+    cache._connection().execute("UPDATE embedding_cache SET last_access = 0 WHERE text_hash = ?", (hash_text("b"),))
+    assert cache.get("model", hash_text("a")) == [0.5, 1.0]
+    assert cache.get("other-model", hash_text("a")) is None
+    
+    cache.put_many("model", [(hash_text("c"), [3.0, 6.0])])
+    assert cache.count() == 2
+    assert cache.get("model", hash_text("b")) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_embedding_cache_refreshes_only_stale_access_times(tmp_path):
+    """Test a hit rewrites the access time only once it is older than the refresh interval"""
+    cache = EmbeddingCache(db_path=str(tmp_path / "cache.db"), max_entries=10)
+    cache.put_many("model", [(hash_text("a"), [0.5, 1.0]), (hash_text("b"), [2.0, 4.0])])
+    cache._connection().execute("UPDATE embedding_cache SET last_access = 1 WHERE text_hash = ?", (hash_text("a"),))
+    
+    def last_access(text):
+        return cache._connection().execute(
+            "SELECT last_access FROM embedding_cache WHERE text_hash = ?", (hash_text(text),)
+        ).fetchone()[0]
+    
+    fresh = last_access("b")
+    assert set(cache.get_many("model", [hash_text("a"), hash_text("b")])) == {hash_text("a"), hash_text("b")}
+    assert last_access("a") > 1
+    assert last_access("b") == fresh
+
+
+class FlakyEmbeddings(EmbeddingProvider):
+    """Fake token-limited embeddings provider whose first request fails"""
+    
+    model_id = "fake:flaky"
+    max_batch_tokens = 6
+    
+    def __init__(self):
+        self.requests = []
+    
+    def count_tokens(self, texts):
+        return [len(text) for text in texts]
+    
+    async def aembed_documents(self, texts):
+        self.requests.append(list(texts))
+        first = len(self.requests) == 1
+        # Other batches are sent while this one is in flight
+        await asyncio.sleep(0)
+        if first:
+            raise RuntimeError("rate limited")
+        return [[float(len(text))] for text in texts]
+
+
+def test_generate_embeddings_batches_and_retries(monkeypatch):
+    """Test embeddings come back in order and only the failed batch is resent"""
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "EMBEDDING_RETRY_BACKOFF_SECONDS", 0)
+    service = EmbeddingService(provider=FlakyEmbeddings())
+    
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    assert service.generate_embeddings(texts) == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+    # [a, bb], [ccc], [dddd], [eeeee] and the resent first batch
+    assert len(service.embeddings.requests) == 5
+    assert all(len(request) <= 2 for request in service.embeddings.requests)
+    assert all(sum(map(len, request)) <= 6 for request in service.embeddings.requests)
+
+
+class FailingBatchEmbeddings(EmbeddingProvider):
+    """Fake embeddings provider that always fails on one text"""
+    
+    model_id = "fake:failing"
+    
+    def __init__(self, poison):
+        self.poison = poison
+    
+    async def aembed_documents(self, texts):
+        await asyncio.sleep(0)
+        if self.poison in texts:
+            raise RuntimeError("bad input")
+        return [[float(len(text))] for text in texts]
+
+
+def test_generate_embeddings_caches_successful_batches_before_failing(tmp_path, monkeypatch):
+    """Test a batch that exhausts its retries does not discard the other batches"""
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "EMBEDDING_MAX_RETRIES", 1)
+    monkeypatch.setattr(settings, "EMBEDDING_RETRY_BACKOFF_SECONDS", 0)
+    cache = EmbeddingCache(db_path=str(tmp_path / "cache.db"))
+    service = EmbeddingService(provider=FailingBatchEmbeddings("eeeee"), cache=cache)
+    
+    texts = ["a", "bb", "ccc", "dddd", "eeeee"]
+    with pytest.raises(RuntimeError):
+        service.generate_embeddings(texts)
+    cached = cache.get_many(service.model, [hash_text(text) for text in texts])
+    assert sorted(cached.values()) == [[1.0], [2.0], [3.0], [4.0]]
+
+
+def test_query_batcher_coalesces_concurrent_queries():
+    """Test concurrent queries share embed calls and get their own vectors"""
+    calls = []
+    
+    def embed(texts):
+        calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+    
+    batcher = QueryEmbeddingBatcher(embed, window_ms=50, max_batch=8)
+    results = {}
+    threads = [
+        threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.embed("q" * i)))
+        for i in range(1, 9)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert results == {i: [float(i)] for i in range(1, 9)}
+    assert len(calls) < 8
+    assert batcher.stats.snapshot()["queries"] == 8
+
+
+def test_unknown_embedding_provider():
+    """Test an unknown provider name is rejected"""
+    with pytest.raises(ValueError):
+        get_embedding_provider("unknown")
+
+
+def test_openai_provider_keeps_embedding_cache_key():
+    """Test OpenAI vectors stay cached under the bare model name used before providers existed"""
+    provider = OpenAIEmbeddingProvider(model="text-embedding-3-small")
+    assert provider.cache_key == "text-embedding-3-small"
+    assert provider.model_id == "openai:text-embedding-3-small"
+    assert EmbeddingService(provider=provider, cache=None).model == "text-embedding-3-small"
+
+
+def test_collection_rejects_other_embedding_model(tmp_path, monkeypatch):
+    """Test a collection holding vectors of another model is rejected"""
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.create_collection(
+        name="model-check",
+        metadata={"embedding_model": "openai:text-embedding-3-small"}
+    )
+    collection.add(ids=["a"], embeddings=[[0.1, 0.2]], documents=["text"])
+    
+    monkeypatch.setattr(settings, "EMBEDDING_PROVIDER", "local")
+    with pytest.raises(EmbeddingModelMismatchError):
+        _check_embedding_model(collection)
+    
+    collection.delete(ids=["a"])
+    _check_embedding_model(collection)
+    assert collection.metadata["embedding_model"] == settings.embedding_model_id
+
+
+def test_reduce_dimensions_normalizes():
+    """Test truncated vectors keep the leading dimensions at unit length"""
+    reduced = reduce_dimensions([[3.0, 4.0, 12.0], [0.0, 2.0, 1.0]], 2)
+    assert reduced.shape == (2, 2)
+    assert reduced[0].tolist() == pytest.approx([0.6, 0.8])
+    assert reduced[1].tolist() == pytest.approx([0.0, 1.0])
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float16", 1e-3), ("int8", 1e-2)])
+def test_quantized_vectors_round_trip(dtype, tolerance):
+    """Test quantized rescore vectors stay close to the originals"""
+    vector = np.random.default_rng(0).normal(size=64).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    data, scale = quantize(vector, dtype)
+    assert np.abs(dequantize(data, dtype, scale) - vector).max() < tolerance
+
+
+def test_lexical_index_ranks_exact_terms(tmp_path, monkeypatch):
+    """Test keyword search finds identifiers and forgets removed chunks"""
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_PATH", str(tmp_path / "lexical.db"))
+    lexical_index.index_chunks([
+        ("a", "Replacement filter for model XR-2000 vacuum"),
+        ("b", "General vacuum cleaning tips"),
+        ("c", "Garden hose with brass fittings")
+    ])
+    lexical_index.index_chunks([("c", "Garden hose, XR-2000 compatible")])
+    
+    hits = lexical_index.search("XR-2000 filter", limit=5)
+    assert [chunk_id for chunk_id, _ in hits] == ["a", "c"]
+    assert hits[0][1] > hits[1][1]
+    assert lexical_index.search('"OR NOT"*', limit=5) == []
+    
+    assert lexical_index.remove_chunks(["a"]) == 1
+    assert [chunk_id for chunk_id, _ in lexical_index.search("XR-2000", limit=5)] == ["c"]
+
+
+def test_reciprocal_rank_fusion_prefers_shared_results():
+    """Test chunks ranked by both retrievers come first after fusion"""
+    vector = [{"id": "a", "distance": 0.1}, {"id": "b", "distance": 0.2}, {"id": "c", "distance": 0.3}]
+    lexical = [{"id": "c", "distance": None}, {"id": "d", "distance": None}]
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+    
+    assert [chunk["id"] for chunk in fused] == ["c", "a", "b", "d"]
+    assert fused[0]["distance"] == 0.3
+    assert fused[0]["score"] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_retrieval_cache_matches_similar_queries():
+    """Test near-identical queries with the same filters share cached results"""
+    cache = RetrievalCache(max_entries=2, threshold=0.95)
+    key = RetrievalCache.make_key("hybrid", 5, {"source": "a.pdf"})
+    cache.put([1.0, 0.0, 0.0], key, 1, ["cached"])
+    
+    assert cache.get([0.99, 0.05, 0.0], key, 1) == ["cached"]
+    assert cache.get([0.0, 1.0, 0.0], key, 1) is None
+    assert cache.get([1.0, 0.0, 0.0], RetrievalCache.make_key("hybrid", 5, None), 1) is None
+    assert cache.get([1.0, 0.0, 0.0], key, 2) is None
+    assert cache.stats()["invalidations"] == 1
+    
+    cache.put([1.0, 0.0, 0.0], key, 2, ["first"])
+    cache.put([0.0, 1.0, 0.0], key, 2, ["second"])
+    cache.put([0.0, 0.0, 1.0], key, 2, ["third"])
+    assert cache.get([1.0, 0.0, 0.0], key, 2) is None
+    assert cache.get([0.0, 0.0, 1.0], key, 2) == ["third"]
+
+
+def test_hybrid_cache_keys_separate_different_terms():
+    """Test hybrid queries differing in an identifier never share cached results"""
+    def hybrid_key(query):
+        return RetrievalCache.make_key("hybrid", 5, None, lexical_index.build_match_query(query))
+    
+    assert hybrid_key("XR-2000 filter") != hybrid_key("XR-2001 filter")
+    assert hybrid_key("XR-2000 filter") == hybrid_key("xr-2000  FILTER")
+
+
+def test_collection_version_increments(tmp_path, monkeypatch):
+    """Test every write bumps the collection version"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    assert get_collection_version("products") == 0
+    assert bump_collection_version("products") == 1
+    assert bump_collection_version("products") == 2
+    assert get_collection_version("products") == 2
+    assert get_collection_version("other") == 0
+
+
+def test_answer_cache_key_normalizes_query():
+    """Test case and whitespace differences share a key, other options do not"""
+    key = answer_cache_key("What is  RAG?", {"source": "a.pdf"}, 5, "hybrid", 3)
+    assert answer_cache_key(" what is rag? ", {"source": "a.pdf"}, 5, "hybrid", 3) == key
+    assert answer_cache_key("What is RAG?", {"source": "a.pdf"}, 5, "hybrid", 4) != key
+    assert answer_cache_key("What is RAG?", None, 5, "hybrid", 3) != key
+
+
+def test_memory_answer_cache_evicts_and_expires():
+    """Test the least recently used answer is evicted and copies are returned"""
+    cache = MemoryAnswerCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", {"answer": "A", "metadata": {}})
+    cache.put("b", {"answer": "B", "metadata": {}})
+    cache.get("a")["metadata"]["cache"] = "hit"
+    cache.put("c", {"answer": "C", "metadata": {}})
+    
+    assert cache.get("b") is None
+    assert cache.get("a") == {"answer": "A", "metadata": {}}
+    assert cache.stats()["evictions"] == 1
+    
+    expired = MemoryAnswerCache(max_entries=2, ttl_seconds=-1)
+    expired.put("a", {"answer": "A", "metadata": {}})
+    assert expired.get("a") is None
+
+
+def test_sqlite_answer_cache_is_shared(tmp_path):
+    """Test answers cached by one process are visible to another"""
+    db_path = str(tmp_path / "answers.db")
+    writer = SQLiteAnswerCache(db_path=db_path, max_entries=2, ttl_seconds=60)
+    reader = SQLiteAnswerCache(db_path=db_path, max_entries=2, ttl_seconds=60)
+    for key in ("a", "b", "c"):
+        writer.put(key, {"answer": key.upper(), "metadata": {}})
+    
+    assert reader.get("c") == {"answer": "C", "metadata": {}}
+    assert reader.count() == 2
+    assert reader.get("a") is None
+
+
+def test_mmr_skips_near_duplicates():
+    """Test MMR prefers a different relevant chunk over a near-duplicate"""
+    query = [1.0, 0.2, 0.0]
+    candidates = [[1.0, 0.2, 0.0], [0.99, 0.21, 0.0], [0.6, 0.8, 0.0]]
+    
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=1.0) == [0, 1]
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=0.3) == [0, 2]
+    assert sorted(maximal_marginal_relevance(query, candidates, 10)) == [0, 1, 2]
+    assert maximal_marginal_relevance(query, candidates, 2, lambda_mult=0.5, relevance=[1.0, 0.9, 0.1]) == [0, 1]
+
+
+def test_iter_csv_rows_extracts_typed_metadata():
+    """Test configured columns become typed metadata and blanks are left out"""
+    content = b"SKU,Name,Price,Category,Brand\n1,XPS 13,\"$1,299.00\",Laptops, Dell \n2,Mouse,25,Accessories,\n"
+    rows = next(iter_csv_rows(
+        BytesIO(content),
+        key_column="SKU",
+        metadata_columns={"price": "number", "category": "text", "brand": "text"}
+    ))
+    assert rows.keys == ["1", "2"]
+    assert rows.metadatas == [
+        {"price": 1299.0, "category": "laptops", "brand": "dell"},
+        {"price": 25.0, "category": "accessories"}
+    ]
+
+
+def test_extract_metadata_filters(tmp_path, monkeypatch):
+    """Test price comparisons and known categorical values become where conditions"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(settings, "CSV_METADATA_COLUMNS", {"price": "number", "category": "text", "brand": "text"})
+    monkeypatch.setattr(query_filters, "_facet_cache", (None, {}))
+    register_facet_values([("brand", "dell"), ("brand", "hp"), ("brand", "apple"), ("category", "laptops")])
+    
+    assert query_filters.extract_metadata_filters("Laptops under $500 from Dell or HP") == [
+        {"price": {"$lt": 500.0}},
+        {"brand": {"$in": ["dell", "hp"]}},
+        {"category": {"$in": ["laptops"]}}
+    ]
+    assert query_filters.extract_metadata_filters("a laptop between $1,000 and 1.5k") == [
+        {"price": {"$gte": 1000.0}},
+        {"price": {"$lte": 1500.0}},
+        {"category": {"$in": ["laptops"]}}
+    ]
+    assert query_filters.extract_metadata_filters("What is machine learning?") == []
+    assert query_filters.combine_conditions([{"brand": {"$in": ["hp"]}}]) == {"brand": {"$in": ["hp"]}}
+
+
+def test_sharded_collections_route_and_merge(tmp_path, monkeypatch):
+    """Test chunks are stored per document type and queries merge shards by distance"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_ENABLED", False)
+    monkeypatch.setattr(settings, "EMBEDDING_STORED_DIMENSIONS", 0)
+    monkeypatch.setattr(settings, "CHROMA_SHARDING", "document_type")
+    monkeypatch.setattr(chroma, "_client", chromadb.PersistentClient(path=str(tmp_path / "chroma")))
+    monkeypatch.setattr(chroma, "_shards", {})
+    monkeypatch.setattr(chroma, "_shards_version", None)
+    
+    chroma.add_documents(
+        documents=["pdf near", "csv nearest", "pdf far", "csv far"],
+        embeddings=[[1.0, 0.1], [1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]],
+        metadatas=[{"document_type": "pdf"}, {"document_type": "csv"}, {"document_type": "pdf"}, {"document_type": "csv"}],
+        ids=["p1", "c1", "p2", "c2"]
+    )
+    assert len(chroma.get_chroma_collections()) == 2
+    assert chroma.route_shards({"$and": [{"document_type": {"$eq": "pdf"}}, {"price": {"$lt": 5}}]}) == {"pdf"}
+    assert chroma.route_shards({"$or": [{"document_type": "pdf"}, {"document_type": {"$in": ["csv"]}}]}) == {"pdf", "csv"}
+    assert chroma.route_shards({"$or": [{"document_type": "pdf"}, {"price": {"$lt": 5}}]}) is None
+    
+    merged = chroma.query_documents([[1.0, 0.0]], n_results=3)
+    assert merged["ids"] == [["c1", "p1", "p2"]]
+    assert merged["distances"][0] == sorted(merged["distances"][0])
+    
+    routed = chroma.query_documents([[1.0, 0.0]], n_results=3, where={"document_type": "pdf"})
+    assert routed["ids"] == [["p1", "p2"]]
+    assert chroma.get_collection_count() == 4
+    
+    chroma.delete_documents(ids=["p1", "c2"])
+    assert sorted(chroma.get_documents(["p1", "p2", "c1", "c2"])["ids"]) == ["c1", "p2"]
+
+
+def test_reads_do_not_queue_behind_writes():
+    """Test a read completes while the write pool is busy, without blocking the loop"""
+    readers = VectorStoreExecutor("read", 1)
+    writers = VectorStoreExecutor("write", 1)
+    release = threading.Event()
+    monitor = EventLoopLagMonitor(interval_seconds=0.01, warn_ms=1000)
+    
+    async def scenario():
+        await monitor.start()
+        write = asyncio.create_task(writers.run(release.wait, 5))
+        queued_write = asyncio.create_task(writers.run(lambda: "written"))
+        assert await asyncio.wait_for(readers.run(lambda: "read"), timeout=2) == "read"
+        assert writers.stats()["pending"] == 2
+        await asyncio.sleep(0.05)
+        release.set()
+        assert await queued_write == "written"
+        await write
+        await monitor.stop()
+    
+    asyncio.run(scenario())
+    assert readers.stats()["completed"] == 1
+    assert writers.stats()["completed"] == 2
+    assert monitor.stats()["samples"] > 0
+    assert monitor.stats()["max_ms"] < 1000
+    readers.shutdown()
+    writers.shutdown()
+
+
+def test_document_registry_lists_and_deletes_by_chunk_id(tmp_path, monkeypatch):
+    """Test documents are listed newest first and deleted by explicit chunk IDs"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    register_document("doc-a", "a.pdf", "pdf", size_bytes=1234, upload_date="2024-01-01T00:00:00")
+    add_document_chunks("doc-a", 3, 3)
+    add_document_chunks("doc-a", 1, 5)
+    register_document("doc-b", "b.csv", "csv", size_bytes=10, upload_date="2024-01-02T00:00:00")
+    
+    assert [document["document_id"] for document in list_documents(limit=1)] == ["doc-b"]
+    assert list_documents(limit=1, offset=1)[0]["chunks"] == 4
+    
+    deleted = []
+    monkeypatch.setattr(document_service, "delete_documents", lambda ids=None, where=None: deleted.append((ids, where)))
+    monkeypatch.setattr(document_service, "_DELETE_BATCH_SIZE", 2)
+    service = document_service.DocumentService.__new__(document_service.DocumentService)
+    service.delete_document("doc-a")
+    assert deleted == [
+        (["doc-a_0", "doc-a_1"], None),
+        (["doc-a_2", "doc-a_3"], None),
+        (["doc-a_4"], None)
+    ]
+    assert get_document("doc-a") is None
+    
+    service.delete_document("legacy")
+    assert deleted[-1] == (None, {"document_id": "legacy"})
+
+
+def test_slim_chunks_join_document_fields_from_registry(tmp_path, monkeypatch):
+    """Test chunks without document fields are sharded, filtered and joined via the registry"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_ENABLED", False)
+    monkeypatch.setattr(settings, "EMBEDDING_STORED_DIMENSIONS", 0)
+    monkeypatch.setattr(settings, "CHROMA_SHARDING", "source")
+    monkeypatch.setattr(chroma, "_client", chromadb.PersistentClient(path=str(tmp_path / "chroma")))
+    monkeypatch.setattr(chroma, "_shards", {})
+    monkeypatch.setattr(chroma, "_shards_version", None)
+    register_document("doc-a", "a.pdf", "pdf", size_bytes=10, upload_date="2024-01-01T00:00:00")
+    add_document_chunks("doc-a", 2, 2)
+    
+    chroma.add_documents(
+        documents=["first", "second"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]],
+        metadatas=[{"document_id": "doc-a", "chunk_index": i, "page_start": 1} for i in range(2)],
+        ids=["doc-a_0", "doc-a_1"]
+    )
+    assert source_condition("a.pdf") == {"document_id": {"$in": ["doc-a"]}}
+    assert source_condition("legacy.pdf") == {"source": "legacy.pdf"}
+    assert chroma.route_shards(source_condition("a.pdf")) == {chroma.shard_key({"source": "a.pdf"})}
+    
+    results = chroma.query_documents([[1.0, 0.0]], n_results=1, where=source_condition("a.pdf"))
+    [chunk] = join_document_fields([{"metadata": results["metadatas"][0][0]}])
+    assert chunk["metadata"] == {
+        "document_id": "doc-a",
+        "chunk_index": 0,
+        "page_start": 1,
+        "source": "a.pdf",
+        "document_type": "pdf",
+        "upload_date": "2024-01-01T00:00:00",
+        "total_chunks": 2
+    }
+
+
+class StubEmbeddingService:
+    """Embeds chunks offline as fixed vectors, recording what it was asked to embed"""
+    
+    pipeline_batch_size = 2
+    
+    def __init__(self):
+        self.embedded = []
+    
+    def generate_embeddings(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def stub_document_service(tmp_path, monkeypatch):
+    """A document service storing in tmp_path, with a stub embedder"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    monkeypatch.setattr(settings, "LEXICAL_INDEX_ENABLED", False)
+    monkeypatch.setattr(settings, "EMBEDDING_STORED_DIMENSIONS", 0)
+    monkeypatch.setattr(settings, "CHROMA_SHARDING", "none")
+    monkeypatch.setattr(settings, "CSV_METADATA_COLUMNS", {})
+    monkeypatch.setattr(chroma, "_client", chromadb.PersistentClient(path=str(tmp_path / "chroma")))
+    monkeypatch.setattr(chroma, "_collection", None)
+    service = document_service.DocumentService.__new__(document_service.DocumentService)
+    service.chunking_service = ChunkingService()
+    service.embedding_service = StubEmbeddingService()
+    service.upload_dir = tmp_path
+    return service
+
+
+def test_reuploaded_content_is_deduplicated_and_survives_original_delete(tmp_path, monkeypatch):
+    """Test a copy embeds only new rows, finds only the chunks it shares and keeps them when the original goes"""
+    monkeypatch.setattr(settings, "DEDUPLICATE_CHUNKS", True)
+    service = stub_document_service(tmp_path, monkeypatch)
+    products = tmp_path / "products.csv"
+    products.write_text("name,price\nLaptop,999\nMouse,25\nDesk,300\n")
+    first = service.ingest_file(products, "products.csv", "doc-1", "csv")
+    assert first["chunks"] == 3
+    
+    service.embedding_service.embedded.clear()
+    copy_path = tmp_path / "copy.csv"
+    copy_path.write_text("name,price\nLaptop,999\nChair,80\n")
+    copy = service.ingest_file(copy_path, "copy.csv", "doc-2", "csv")
+    assert (copy["chunks"], copy["deduplicated"]) == (1, 1)
+    assert service.embedding_service.embedded == ["name: Chair, price: 80"]
+    
+    def copy_chunks():
+        results = chroma.query_documents([[20.0, 1.0]], n_results=10, where=source_condition("copy.csv"))
+        return sorted(results["documents"][0])
+    
+    assert copy_chunks() == ["name: Chair, price: 80", "name: Laptop, price: 999"]
+    
+    service.delete_document("doc-1")
+    assert chroma.get_collection_count() == 2
+    stored = chroma.get_documents(get_owned_chunk_ids("doc-2"))
+    assert {metadata["document_id"] for metadata in stored["metadatas"]} == {"doc-2"}
+    assert source_condition("copy.csv") == {"document_id": {"$in": ["doc-2"]}}
+    assert copy_chunks() == ["name: Chair, price: 80", "name: Laptop, price: 999"]
+    assert get_document("doc-2")["chunks"] == 2
+    
+    service.delete_document("doc-2")
+    assert chroma.get_collection_count() == 0
+
+
+def test_job_store_upgrades_tables_without_key_column(tmp_path, monkeypatch):
+    """Test a metadata database created before keyed CSV ingestion still accepts jobs"""
+    monkeypatch.setattr(settings, "METADATA_DB_PATH", str(tmp_path / "metadata.db"))
+    get_sqlite_connection().executescript("""
+        CREATE TABLE ingestion_jobs (
+            job_id TEXT PRIMARY KEY,
+            document_id TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            document_type TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            status TEXT NOT NULL,
+            rows_parsed INTEGER NOT NULL DEFAULT 0,
+            chunks_embedded INTEGER NOT NULL DEFAULT 0,
+            chunks_stored INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT
+        );
+    """)
+    
+    job = create_job("doc-1", "products.csv", "csv", "/tmp/products.csv", key_column="sku")
+    assert get_job(job["job_id"])["key_column"] == "sku"
+
+
+def test_keyed_csv_version_embeds_changed_rows_and_deletes_missing(tmp_path, monkeypatch):
+    """Test a new keyed CSV version skips unchanged rows, upserts changed ones and drops missing ones"""
+    service = stub_document_service(tmp_path, monkeypatch)
+    document_id = document_service.keyed_document_id("catalog.csv")
+    catalog = tmp_path / "catalog.csv"
+    catalog.write_text("sku,name\nA,Laptop\nB,Mouse\nC,Desk\n")
+    first = service.ingest_file(catalog, "catalog.csv", document_id, "csv", key_column="sku")
+    assert first["chunks"] == 3
+    
+    service.embedding_service.embedded.clear()
+    catalog.write_text("sku,name\nA,Laptop\nB,Wireless mouse\nD,Chair\n")
+    second = service.ingest_file(catalog, "catalog.csv", document_id, "csv", key_column="sku")
+    
+    assert (second["chunks"], second["unchanged"], second["deleted"]) == (2, 1, 1)
+    assert len(service.embedding_service.embedded) == 2
+    assert not any("Laptop" in text for text in service.embedding_service.embedded)
+    
+    chunk_ids = sorted(get_document_chunk_ids(document_id))
+    assert chunk_ids == [f"{document_id}_A", f"{document_id}_B", f"{document_id}_D"]
+    stored = chroma.get_documents(chunk_ids + [f"{document_id}_C"])
+    assert sorted(stored["ids"]) == chunk_ids
+    assert "Wireless mouse" in stored["documents"][stored["ids"].index(f"{document_id}_B")]
+    assert get_document(document_id)["chunks"] == 3
+
+
+def test_keyed_csv_blank_cell_does_not_change_neighbouring_rows(tmp_path, monkeypatch):
+    """Test a blank cell appearing in one parse batch leaves the other rows unchanged"""
+    service = stub_document_service(tmp_path, monkeypatch)
+    monkeypatch.setattr(settings, "CSV_CHUNK_ROWS", 2)
+    document_id = document_service.keyed_document_id("stock.csv")
+    stock = tmp_path / "stock.csv"
+    stock.write_text("sku,qty\nA,5\nB,6\nC,7\nD,8\n")
+    service.ingest_file(stock, "stock.csv", document_id, "csv", key_column="sku")
+    
+    service.embedding_service.embedded.clear()
+    stock.write_text("sku,qty\nA,5\nB,6\nC,\nD,8\n")
+    second = service.ingest_file(stock, "stock.csv", document_id, "csv", key_column="sku")
+    
+    assert (second["chunks"], second["unchanged"]) == (1, 3)
+    assert service.embedding_service.embedded == ["sku: C, qty: "]
+
+
+def test_dedup_matches_rows_parsed_in_different_batches(tmp_path, monkeypatch):
+    """Test rows re-read with another CSV batch size still hash to the stored chunks"""
+    monkeypatch.setattr(settings, "DEDUPLICATE_CHUNKS", True)
+    service = stub_document_service(tmp_path, monkeypatch)
+    stock = tmp_path / "stock.csv"
+    stock.write_text("sku,qty\nA,5\nB,\nC,7\n")
+    
+    monkeypatch.setattr(settings, "CSV_CHUNK_ROWS", 2)
+    service.ingest_file(stock, "stock.csv", "doc-1", "csv")
+    monkeypatch.setattr(settings, "CSV_CHUNK_ROWS", 10)
+    copy = service.ingest_file(stock, "stock-copy.csv", "doc-2", "csv")
+    
+    assert (copy["chunks"], copy["deduplicated"]) == (0, 3)
+
+
+def test_pdf_total_chunks_counts_deduplicated_trailing_chunks(tmp_path, monkeypatch):
+    """Test a PDF whose last chunk was deduplicated still reports every chunk it has"""
+    monkeypatch.setattr(settings, "DEDUPLICATE_CHUNKS", True)
+    service = stub_document_service(tmp_path, monkeypatch)
+    service.chunking_service = ChunkingService(chunk_size=30, chunk_overlap=1)
+    pdf_pages = {"closing.pdf": ["Shared closing text."], "report.pdf": ["Unique opening paragraph.", "Shared closing text."]}
+    monkeypatch.setattr(document_service, "parse_pdf_pages", lambda path: pdf_pages[path.name])
+    for filename in pdf_pages:
+        (tmp_path / filename).write_bytes(b"%PDF")
+    
+    service.ingest_file(tmp_path / "closing.pdf", "closing.pdf", "doc-1", "pdf")
+    report = service.ingest_file(tmp_path / "report.pdf", "report.pdf", "doc-2", "pdf")
+    
+    assert (report["chunks"], report["deduplicated"]) == (1, 1)
+    [chunk] = join_document_fields([{"metadata": {"document_id": "doc-2", "chunk_index": 0}}])
+    assert chunk["metadata"]["total_chunks"] == 2